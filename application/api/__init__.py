@@ -2,6 +2,8 @@ from fastapi import APIRouter
 from api.hashers import router as hash_router
 from api.keys import router as keys_router
 from api.files import router as files_router
+from api.jobs import router as jobs_router
+from api.sessions import router as sessions_router
 from core.config import settings
 
 router = APIRouter(
@@ -11,3 +13,6 @@ router = APIRouter(
 router.include_router(hash_router)
 router.include_router(keys_router)
 router.include_router(files_router)
+router.include_router(jobs_router)
+if settings.sessions.enabled:
+    router.include_router(sessions_router)
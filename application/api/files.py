@@ -1,14 +1,36 @@
+from contextlib import AsyncExitStack
+
 from fastapi import (
-    UploadFile,
     APIRouter,
-    status,
     HTTPException,
+    Query,
+    Request,
+    status,
 )
 from opentelemetry import trace
+from starlette.background import BackgroundTask
 
-from response_docs import TOO_LARGE_FILE
+from response_docs import (
+    FILE_UPLOAD_BODY,
+    SERVER_BUSY,
+    TOO_LARGE_FILE,
+    VERIFY_BODY,
+    VERIFY_RESULTS,
+)
+from core.admission import admission
+from core.batch import BatchStreamingResponse
+from core.config import settings
+from core.metrics import FILE_SUM_BYTES, FILE_SUM_THROUGHPUT
 from core.schemas import FileHashedResponse
-from core.hashengine import HashLibEnum, HashLib
+from core.hashengine import (
+    HashLibEnum,
+    HashModeEnum,
+    MultiHash,
+    TreeHash,
+)
+from core.manifest import read_manifest, verify_files
+from core.stages import DIGEST, UPLOAD, StageTimer
+from core.uploads import MultipartStream, stream_upload
 
 MiB_512 = 512 * 1024 * 1024  # Max size 512 MiB
 router = APIRouter(tags=["Files"])
@@ -16,17 +38,19 @@ router = APIRouter(tags=["Files"])
 tracer = trace.get_tracer(__name__)
 
 
-@tracer.start_as_current_span(__name__)
 @router.post(
     "/file-sum",
     status_code=status.HTTP_200_OK,
     summary="Upload a file",
     response_model=FileHashedResponse,
-    responses=TOO_LARGE_FILE,
+    responses={**TOO_LARGE_FILE, **SERVER_BUSY},
+    openapi_extra=FILE_UPLOAD_BODY,
 )
 async def upload_file(
-    algorithm: HashLibEnum,
-    file: UploadFile,
+    request: Request,
+    algorithm: list[HashLibEnum] = Query(...),
+    mode: HashModeEnum = HashModeEnum.SEQUENTIAL,
+    filename: str | None = None,
 ) -> FileHashedResponse:
     """Calculate and return a cryptographic hash for the uploaded file.
 
@@ -34,21 +58,43 @@ async def upload_file(
     (checksum) of its contents using a specified algorithm. This can be used to verify
     file integrity or detect file modifications.
 
+    The file is hashed while it streams in: nothing is spooled to disk and
+    the digest is ready as soon as the last byte arrives. The body can either
+    be a ``multipart/form-data`` form with a ``file`` field, or the raw file
+    content sent as ``application/octet-stream``.
+
+    Several algorithms can be requested at once (``?algorithm=sha256&algorithm=md5``):
+    all the digests are computed in a single pass over the upload.
+
+    With ``mode=tree`` the digest is the root of a Merkle tree over 1 MiB
+    leaves hashed in parallel, so large files are hashed on all cores. It is
+    NOT the digest printed by sha256sum & co; the layout is documented in
+    ``core.hashengine.TreeHash`` and in the README.
+
     Args:
-        algorithm (HashLibEnum): The hashing algorithm to use.
-            Supported algorithms include sha256, sha384, sha512, and md5.
-        file (UploadFile): The file to be hashed, with a maximum size of 512 MiB.
-            Files exceeding this limit will be rejected with a 413 error.
+        request (Request): The request whose body holds the file to be hashed,
+            with a maximum size of 512 MiB. Files exceeding this limit will be
+            rejected with a 413 error.
+        algorithm (list[HashLibEnum]): The hashing algorithms to use.
+            Supported algorithms include sha256, sha384, sha512, md5,
+            blake2b, blake2s, sha3_256 and sha3_512.
+        mode (HashModeEnum): 'sequential' (default) or 'tree'.
+        filename (str, optional): File name reported for raw
+            ``application/octet-stream`` bodies.
 
     Returns:
         FileHashedResponse: An object containing:
             - filename: Original name of the uploaded file
-            - algorithm: The algorithm used for hashing
+            - algorithm: The (first) algorithm used for hashing
             - hash: The calculated hash value (hex-encoded)
             - size: Size of the file in bytes
+            - hashes: The hash value of every requested algorithm
+            - mode: The hashing mode used
+            - leaf_size: The leaf size in bytes in tree mode
 
     Raises:
         HTTPException (413): If the file size exceeds 512 MiB.
+        HTTPException (503): If too many files are being hashed.
 
     Examples:
         A typical request would upload a file and specify an algorithm, receiving
@@ -60,26 +106,136 @@ async def upload_file(
             "filename": "example.txt",
             "algorithm": "sha256",
             "hash": "e3b0c44298fc1c149afbf4c8996fb92427ae41e4649b934ca495991b7852b855",
-            "size": 1024
+            "size": 1024,
+            "hashes": {
+                "sha256": "e3b0c44298fc1c149afbf4c8996fb92427ae41e4649b934ca495991b7852b855"
+            },
+            "mode": "sequential",
+            "leaf_size": null
         }
         ```
     """
-    if file.size > MiB_512:
-        raise HTTPException(
-            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-            detail="File is too large. Exceeds 512 MiB",
+    algorithms = [item.value for item in algorithm]
+    with (
+        tracer.start_as_current_span("file-sum") as span,
+        StageTimer("file-sum", mode.value) as stages,
+    ):
+        span.set_attributes({"algorithm": algorithms, "mode": mode.value})
+        async with stages.queued(admission.acquire("file-sum")):
+            if mode is HashModeEnum.TREE:
+                hasher = TreeHash(algorithms=algorithms)
+            else:
+                hasher = MultiHash(
+                    algorithms=algorithms,
+                    block_size=settings.hashing.block_size,
+                )
+            with stages.stage(UPLOAD) as upload_stage:
+                upload = await stream_upload(
+                    request=request,
+                    sink=hasher.aupdate,
+                    limit=MiB_512,
+                    filename=filename,
+                )
+            with stages.stage(DIGEST):
+                hashes = await hasher.ahexdigests()
+        span.set_attribute("file_size", upload.size)
+        FILE_SUM_BYTES.labels(mode.value).inc(upload.size)
+        if upload_stage.seconds:
+            FILE_SUM_THROUGHPUT.labels(mode.value).observe(
+                upload.size / upload_stage.seconds
+            )
+        return FileHashedResponse(
+            filename=upload.filename,
+            algorithm=algorithms[0],
+            hash=hashes[algorithms[0]],
+            size=upload.size,
+            hashes=hashes,
+            mode=mode.value,
+            leaf_size=hasher.leaf_size if mode is HashModeEnum.TREE else None,
         )
-    with tracer.start_span(name=__name__) as span:
-        span.set_attributes(
-            {
-                "file_size": file.size,
-                "algorithm": algorithm.value,
-            }
+
+
+@router.post(
+    "/file-sum/verify",
+    status_code=status.HTTP_200_OK,
+    summary="Verify files against a manifest",
+    response_class=BatchStreamingResponse,
+    responses={**VERIFY_RESULTS, **SERVER_BUSY},
+    openapi_extra=VERIFY_BODY,
+)
+async def verify_manifest(
+    request: Request,
+    algorithm: HashLibEnum = HashLibEnum.SHA256,
+    fail_fast: bool = False,
+) -> BatchStreamingResponse:
+    """Check many uploaded files against a manifest of expected digests.
+
+    The body is a ``multipart/form-data`` stream whose first part,
+    ``manifest``, lists the expected digests, followed by one part per file
+    (``files``), each named by its filename. The manifest is either in the
+    sha256sum format (``<digest>  <name>`` lines, or ``sha256sum --tag``
+    lines naming their algorithm) or JSON: an object mapping names to
+    digests, or an array of /file-sum responses such as the output of
+    ``keyforge-hash --json``.
+
+    Files are hashed while they stream in and a result line is streamed
+    back for every file as soon as it is checked, while the next files are
+    still being received. Memory does not depend on the number or the size
+    of the files.
+
+    Args:
+        request (Request): The request whose multipart body holds the
+            manifest (at most 1 MiB) and the files (16 GiB in total).
+        algorithm (HashLibEnum): Algorithm of the manifest lines that do
+            not name one, and of the files missing from the manifest.
+            Default: sha256
+        fail_fast (bool): Stop at the first file that does not match the
+            manifest, without receiving the rest of the body.
+
+    Returns:
+        BatchStreamingResponse: NDJSON lines, a ``FileHashedResponse`` per
+            file plus its ``status`` ('ok', 'mismatch', or 'unexpected' for
+            a file that is not in the manifest) and the ``expected``
+            digests, in completion order. The last line is
+            ``{"summary": {"ok": int, "mismatch": int, "unexpected": int,
+            "missing": list[str], "aborted": bool, "passed": bool}}``. A
+            malformed body ends the stream with ``{"error": str}``.
+
+    Raises:
+        HTTPException (400): If the multipart body is malformed.
+        HTTPException (413): If the manifest is too large.
+        HTTPException (415): If the body is not ``multipart/form-data``.
+        HTTPException (422): If the first part is not a valid manifest.
+        HTTPException (503): If too many files are being hashed.
+    """
+    content_type = request.headers.get("content-type", "")
+    if not content_type.startswith("multipart/form-data"):
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Body must be multipart/form-data.",
         )
-        hashed = HashLib(algorithm=algorithm).hash_file(file=file)
-        return FileHashedResponse(
-            filename=file.filename,
+    with tracer.start_as_current_span("file-sum-verify") as span:
+        events = MultipartStream(content_type, request.stream()).__aiter__()
+        manifest = await read_manifest(
+            events,
             algorithm=algorithm.value,
-            hash=hashed,
-            size=file.size,
+            limit=settings.hashing.max_manifest_kib * 1024,
+        )
+        span.set_attributes({"files": len(manifest), "fail_fast": fail_fast})
+        # The slot is held until the response is over, not until we return
+        slot = AsyncExitStack()
+        await slot.enter_async_context(admission.acquire("file-sum"))
+        return BatchStreamingResponse(
+            verify_files(
+                events,
+                manifest=manifest,
+                algorithm=algorithm.value,
+                block_size=settings.hashing.block_size,
+                limit=settings.hashing.max_verify_gib << 30,
+                fail_fast=fail_fast,
+            ),
+            # Otherwise uvicorn keeps receiving, and discarding, the rest of
+            # the body after an early end of the stream
+            headers={"Connection": "close"} if fail_fast else None,
+            background=BackgroundTask(slot.aclose),
         )
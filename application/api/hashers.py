@@ -1,10 +1,31 @@
-from fastapi import APIRouter, status
-import secrets
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+import orjson
+
+from core.admission import admission
+from core.batch import BatchStreamingResponse, hash_batch
+from core.calibration import (
+    ARGON2_MAX_MEMORY_COST,
+    ARGON2_MAX_TIME_COST,
+    BCRYPT_MAX_ROUNDS,
+    BCRYPT_MIN_ROUNDS,
+    Calibration,
+    calibrator,
+)
+from core.entropy import TokenEncodingEnum, entropy_pool
+from core.membudget import argon2_budget
+from core.responses import encoded_json
+from core.stages import COMPUTE, SERIALIZE, StageTimer, argon2_class
 from core.schemas import (
     Argon2HashParams,
     BasePayload,
     BcryptHashParams,
+    CalibrationOut,
     HashOut,
+    HashParamsOut,
+    PasswordVerifyIn,
+    VerifyOut,
 )
 
 from core.hashengine import (
@@ -12,55 +33,92 @@ from core.hashengine import (
     rand_integer,
     HashLibEnum,
     argon2hash,
+    argon2_parameters,
+    argon2_verify,
     bcrypt_hash,
+    bcrypt_rounds,
+    bcrypt_verify,
+    run_password_task,
 )
 from opentelemetry import trace
 
+from response_docs import (
+    HASHLIB_BATCH_BODY,
+    NDJSON_RESULTS,
+    RANDOM_TOKENS,
+    SERVER_BUSY,
+)
+
 
 tracer = trace.get_tracer(__name__)
 
 router = APIRouter(tags=["Hash"])
 
 
-# @tracer.start_as_current_span(__name__)
 @router.get(
     "/random-token",
     status_code=status.HTTP_200_OK,
+    response_model=str,
     summary="Get a random token",
+    responses=RANDOM_TOKENS,
 )
-async def random_hash() -> str:
-    """Generate a cryptographically secure random token.
+async def random_hash(
+        length: int | None = Query(default=None, ge=16, le=512),
+        count: int = Query(default=1, ge=1, le=1_000_000),
+        encoding: TokenEncodingEnum = TokenEncodingEnum.HEX,
+) -> Response:
+    """Generate cryptographically secure random tokens.
+
+    This endpoint produces random tokens suitable for use in security contexts
+    like session identifiers, CSRF tokens, or password reset tokens.
 
-    This endpoint produces a random hexadecimal token suitable for use in security
-    contexts like session identifiers, CSRF tokens, or password reset tokens.
+    Tokens are sliced from a per-worker entropy pool refilled with large reads
+    from the OS (one read per 64 KiB instead of one per token), and the pool
+    bytes are wiped as soon as they are handed out. A batch of tokens is
+    streamed while it is generated, so minting many tokens costs one round trip.
 
-    The generated token has a random length between 32 and 128 characters (16-64 bytes),
-    providing strong unpredictability and sufficient entropy for security purposes.
+    Args:
+        length (int, optional): Random bytes per token, 16 to 512.
+            Default: a random length between 32 and 128 bytes.
+        count (int, optional): Number of tokens, up to 1000000. Default: 1
+        encoding (TokenEncodingEnum, optional): 'hex' (default),
+            'base64url' or 'base32' (both without padding).
 
     Returns:
-        str: A random hexadecimal string with length between 32 and 128 characters.
+        str: The token, when count is 1.
+        Otherwise an NDJSON stream with one JSON string per line.
 
     Example:
         ```
-        GET /random-token
+        GET /random-token?length=16&encoding=base64url
 
-        Response: "7b3f8b3f7a9c7d3e7a8c7d3e7a8c7d3e7a8c7d3e7a8c7d3e7a8c7d3e7a8c"
+        Response: "3q2-7wAAAAC6vK_M3e7_AA"
         ```
     """
     with tracer.start_as_current_span("random_token"):
-        return secrets.token_hex(rand_integer())
+        if length is None:
+            length = rand_integer()
+        if count == 1:
+            return encoded_json(entropy_pool.token(length, encoding))
+        return StreamingResponse(
+            (
+                b"".join(orjson.dumps(token) + b"\n" for token in tokens)
+                for tokens in entropy_pool.tokens(length, count, encoding)
+            ),
+            media_type="application/x-ndjson",
+        )
 
 
-@tracer.start_as_current_span(__name__)
 @router.post(
     "/argon2-hash",
     status_code=status.HTTP_201_CREATED,
     response_model=HashOut,
     summary="Create Argon2 Hash",
+    responses=SERVER_BUSY,
 )
 async def create_argon2_hash(
         params: Argon2HashParams,
-) -> HashOut:
+) -> Response:
     """Create a secure password hash using the Argon2 algorithm.
 
     Argon2 is a modern password-hashing function designed to be resistant to
@@ -75,12 +133,22 @@ async def create_argon2_hash(
             - memory_cost (int, optional): Memory usage in KiB.
               Default: 65536 (64 MiB), Max: 244141 (~238 MiB)
               Higher values increase resistance to GPU attacks.
+            - time_cost (int, optional): Number of passes over the memory.
+              Default: 3, Min: 1, Max: 10
+            - target_ms (float, optional): Per-hash latency to aim for. When
+              given, memory_cost and time_cost are replaced by the values
+              calibrated on this host (see /hash-calibration).
 
     Returns:
         HashOut: An object containing:
             - hash (str): The Argon2 hash string in the format:
               $argon2id$v=19$m=[memory],t=[time],p=[parallelism]$[salt]$[hash]
 
+    Raises:
+        HTTPException (503): If too many Argon2 hashes are being computed, or
+            if the requested memory does not fit in the worker memory budget
+            in time.
+
     Example:
         Request:
         ```json
@@ -98,25 +166,42 @@ async def create_argon2_hash(
         }
         ```
     """
-    with tracer.start_as_current_span("create-argon2-hash"):
-        hashed = argon2hash(
-            payload=params.payload,
-            length=params.length,
-            memory_cost=params.memory_cost,
-        )
-        return HashOut(
-            hash=hashed,
-        )
+    memory_cost, time_cost = params.memory_cost, params.time_cost
+    if params.target_ms is not None:
+        recommended = await calibrator.recommend(params.target_ms)
+        memory_cost = recommended.argon2_memory_cost
+        time_cost = recommended.argon2_time_cost
+    with (
+        tracer.start_as_current_span("create-argon2-hash"),
+        StageTimer("create-argon2-hash", argon2_class(memory_cost)) as stages,
+    ):
+        async with stages.queued(
+            admission.acquire("argon2"),
+            argon2_budget.reserve(memory_cost),
+        ):
+            with stages.stage(COMPUTE):
+                hashed = await run_in_threadpool(
+                    argon2hash,
+                    payload=params.payload,
+                    length=params.length,
+                    memory_cost=memory_cost,
+                    time_cost=time_cost,
+                )
+        with stages.stage(SERIALIZE):
+            return encoded_json(
+                {"hash": hashed},
+                status_code=status.HTTP_201_CREATED,
+            )
 
 
-@tracer.start_as_current_span(__name__)
 @router.post(
     "/bcrypt-hash",
     status_code=status.HTTP_201_CREATED,
     response_model=HashOut,
     summary="Create Bcrypt Hash",
+    responses=SERVER_BUSY,
 )
-async def create_bcrypt_hash(params: BcryptHashParams) -> HashOut:
+async def create_bcrypt_hash(params: BcryptHashParams) -> Response:
     """Create a secure password hash using the bcrypt algorithm.
 
     Bcrypt is a password-hashing function designed to be slow and difficult to crack,
@@ -127,14 +212,20 @@ async def create_bcrypt_hash(params: BcryptHashParams) -> HashOut:
         params (BcryptHashParams): Parameters for the bcrypt hash function:
             - payload (str): The string to hash (e.g., a password)
             - rounds (int, optional): Work factor/cost factor that determines
-              the computational complexity. Default: 12, Min: 8, Max: 32
-              Higher values increase security but also increase hashing time.
+              the computational complexity. Default: 12, Min: 8, Max: 16
+              Every extra round doubles the hashing time.
+            - target_ms (float, optional): Per-hash latency to aim for. When
+              given, rounds is replaced by the cost factor calibrated on this
+              host (see /hash-calibration).
 
     Returns:
         HashOut: An object containing:
             - hash (str): The bcrypt hash string in the format:
               $2b$[rounds]$[22 character salt][31 character hash]
 
+    Raises:
+        HTTPException (503): If too many bcrypt hashes are being computed.
+
     Example:
         Request:
         ```json
@@ -151,27 +242,198 @@ async def create_bcrypt_hash(params: BcryptHashParams) -> HashOut:
         }
         ```
     """
-    with tracer.start_as_current_span("create-bcrypt-hash"):
-        hashed = bcrypt_hash(
-            payload=params.payload,
-            rounds=params.rounds,
+    rounds = params.rounds
+    if params.target_ms is not None:
+        rounds = (await calibrator.recommend(params.target_ms)).bcrypt_rounds
+    with (
+        tracer.start_as_current_span("create-bcrypt-hash"),
+        StageTimer("create-bcrypt-hash", f"bcrypt-{rounds}") as stages,
+    ):
+        async with stages.queued(admission.acquire("bcrypt")):
+            with stages.stage(COMPUTE):
+                hashed = await run_in_threadpool(
+                    bcrypt_hash,
+                    payload=params.payload,
+                    rounds=rounds,
+                )
+        with stages.stage(SERIALIZE):
+            return encoded_json(
+                {"hash": hashed},
+                status_code=status.HTTP_201_CREATED,
+            )
+
+
+@router.post(
+    "/argon2-verify",
+    status_code=status.HTTP_200_OK,
+    response_model=VerifyOut,
+    summary="Verify an Argon2 Hash",
+    responses=SERVER_BUSY,
+)
+async def verify_argon2_hash(params: PasswordVerifyIn) -> Response:
+    """Verify a password against an Argon2 hash.
+
+    Verification costs as much as hashing, and it is what an authentication
+    service spends most of its password CPU on. It runs on a thread pool of
+    one thread per CPU, never on the event loop, within the Argon2 memory
+    budget of the worker.
+
+    ``needs_rehash`` tells whether the hash was created with other costs
+    than the ones currently recommended for this server (see
+    /hash-calibration). A client that gets ``valid`` and ``needs_rehash``
+    should store a new hash of the password, so stored hashes migrate to
+    the current parameters over time.
+
+    Args:
+        params (PasswordVerifyIn): Verification request:
+            - payload (str): The password to verify.
+            - hash (str): The argon2id hash to verify against.
+            - target_ms (float, optional): Latency target of the recommended
+              parameters. Default: APP_CONFIG__CALIBRATION__TARGET_MS
+
+    Returns:
+        VerifyOut: Object containing:
+            - valid (bool): Whether the password matches the hash.
+            - needs_rehash (bool): Whether a valid hash should be replaced.
+
+    Raises:
+        HTTPException (503): If too many Argon2 hashes are being verified,
+            or if their memory does not fit in the worker memory budget.
+        HTTPException (422): If the hash is not an argon2id hash, or if its
+            costs exceed the limits of /argon2-hash.
+
+    Example:
+        Request:
+        ```json
+        {
+            "payload": "mySecurePassword",
+            "hash": "$argon2id$v=19$m=65536,t=3,p=4$..."
+        }
+        ```
+
+        Response:
+        ```json
+        {
+            "valid": true,
+            "needs_rehash": false
+        }
+        ```
+    """
+    parameters = argon2_parameters(params.hash)
+    if (
+        parameters.memory_cost > ARGON2_MAX_MEMORY_COST
+        or parameters.time_cost > ARGON2_MAX_TIME_COST
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Hash costs exceed the limits of this server.",
         )
-        return HashOut(
-            hash=hashed,
+    recommended = await calibrator.recommend(params.target_ms)
+    with (
+        tracer.start_as_current_span("verify-argon2-hash"),
+        StageTimer(
+            "verify-argon2-hash", argon2_class(parameters.memory_cost)
+        ) as stages,
+    ):
+        async with stages.queued(
+            admission.acquire("argon2-verify"),
+            argon2_budget.reserve(parameters.memory_cost),
+        ):
+            with stages.stage(COMPUTE):
+                valid, needs_rehash = await run_password_task(
+                    argon2_verify,
+                    payload=params.payload,
+                    hashed=params.hash,
+                    memory_cost=recommended.argon2_memory_cost,
+                    time_cost=recommended.argon2_time_cost,
+                )
+        with stages.stage(SERIALIZE):
+            return encoded_json({"valid": valid, "needs_rehash": needs_rehash})
+
+
+@router.post(
+    "/bcrypt-verify",
+    status_code=status.HTTP_200_OK,
+    response_model=VerifyOut,
+    summary="Verify a Bcrypt Hash",
+    responses=SERVER_BUSY,
+)
+async def verify_bcrypt_hash(params: PasswordVerifyIn) -> Response:
+    """Verify a password against a bcrypt hash.
+
+    Runs on a thread pool of one thread per CPU, never on the event loop.
+    ``needs_rehash`` tells whether the hash was created with another cost
+    factor than the one currently recommended for this server (see
+    /hash-calibration); a client that gets ``valid`` and ``needs_rehash``
+    should store a new hash of the password.
+
+    Args:
+        params (PasswordVerifyIn): Verification request:
+            - payload (str): The password to verify.
+            - hash (str): The bcrypt hash to verify against.
+            - target_ms (float, optional): Latency target of the recommended
+              parameters. Default: APP_CONFIG__CALIBRATION__TARGET_MS
+
+    Returns:
+        VerifyOut: Object containing:
+            - valid (bool): Whether the password matches the hash.
+            - needs_rehash (bool): Whether a valid hash should be replaced.
+
+    Raises:
+        HTTPException (503): If too many bcrypt hashes are being verified.
+        HTTPException (422): If the hash is not a bcrypt hash, or if its
+            cost factor exceeds the limit of /bcrypt-hash.
+
+    Example:
+        Request:
+        ```json
+        {
+            "payload": "mySecurePassword",
+            "hash": "$2b$12$..."
+        }
+        ```
+
+        Response:
+        ```json
+        {
+            "valid": true,
+            "needs_rehash": true
+        }
+        ```
+    """
+    rounds = bcrypt_rounds(params.hash)
+    if rounds > BCRYPT_MAX_ROUNDS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Hash costs exceed the limits of this server.",
         )
+    recommended = await calibrator.recommend(params.target_ms)
+    with (
+        tracer.start_as_current_span("verify-bcrypt-hash"),
+        StageTimer("verify-bcrypt-hash", f"bcrypt-{rounds}") as stages,
+    ):
+        async with stages.queued(admission.acquire("bcrypt-verify")):
+            with stages.stage(COMPUTE):
+                valid, needs_rehash = await run_password_task(
+                    bcrypt_verify,
+                    payload=params.payload,
+                    hashed=params.hash,
+                    rounds=recommended.bcrypt_rounds,
+                )
+        with stages.stage(SERIALIZE):
+            return encoded_json({"valid": valid, "needs_rehash": needs_rehash})
 
 
-@tracer.start_as_current_span(__name__)
 @router.post(
     "/hashlib",
     status_code=status.HTTP_201_CREATED,
     response_model=HashOut,
-    summary="Create hash based on sha256, sha384, sha512, md5",
+    summary="Create hash based on sha256, sha384, sha512, md5, blake2, sha3",
 )
 async def create_hashlib_hash(
         algorithm: HashLibEnum,
         payload: BasePayload,
-) -> HashOut:
+) -> Response:
     """Create a cryptographic hash of a given payload using standard algorithms.
 
     This endpoint uses Python's hashlib to generate cryptographic hashes with
@@ -188,6 +450,8 @@ async def create_hashlib_hash(
             - sha384: SHA-2 family hash with 384-bit output
             - sha512: SHA-2 family hash with 512-bit output
             - md5: MD5 algorithm (128-bit output, considered cryptographically weak)
+            - blake2b / blake2s: BLAKE2 hashes with 512/256-bit output
+            - sha3_256 / sha3_512: SHA-3 family hashes with 256/512-bit output
         payload (BasePayload): Object containing:
             - payload (str): The string to hash
 
@@ -212,14 +476,176 @@ async def create_hashlib_hash(
         }
         ```
     """
-    with tracer.start_span(name="create-hashlib-hash") as span:
+    with (
+        tracer.start_as_current_span("create-hashlib-hash") as span,
+        StageTimer("create-hashlib-hash", algorithm.value) as stages,
+    ):
         span.set_attribute(
             "algorithm",
             algorithm.value,
         )
-        hashed = HashLib(algorithm=algorithm).hash(
-            payload=payload.payload,
-        )
-        return HashOut(
-            hash=hashed,
-        )
+        with stages.stage(COMPUTE):
+            hashed = HashLib(algorithm=algorithm).hash(
+                payload=payload.payload,
+            )
+        with stages.stage(SERIALIZE):
+            return encoded_json(
+                {"hash": hashed},
+                status_code=status.HTTP_201_CREATED,
+            )
+
+
+@router.post(
+    "/hashlib/batch",
+    status_code=status.HTTP_200_OK,
+    summary="Create hashes of a batch of payloads",
+    response_class=BatchStreamingResponse,
+    responses=NDJSON_RESULTS,
+    openapi_extra=HASHLIB_BATCH_BODY,
+)
+async def create_hashlib_hash_batch(
+        request: Request,
+        algorithm: HashLibEnum = HashLibEnum.SHA256,
+) -> BatchStreamingResponse:
+    """Hash a batch of payloads in one request, streaming the results as NDJSON.
+
+    Hashing millions of identifiers one request at a time is dominated by HTTP,
+    TLS and validation overhead. This endpoint takes the payloads as a JSON array
+    or as NDJSON (``Content-Type: application/x-ndjson``) and streams one result
+    line per payload, in input order, while the body is still being received.
+    Memory stays bounded on both ends whatever the batch size.
+
+    Args:
+        request (Request): The request whose body holds the batch. Every item
+            is either a payload string or an object
+            ``{"payload": str, "algorithm": str}``; payloads are limited to
+            256 characters like on /hashlib.
+        algorithm (HashLibEnum): Algorithm of the items that do not specify one.
+            Default: sha256
+
+    Returns:
+        BatchStreamingResponse: NDJSON lines, either
+            ``{"index": int, "algorithm": str, "hash": str}`` or
+            ``{"index": int, "error": str}`` for an invalid item. A malformed
+            body ends the stream with an error line whose index is null.
+
+    Example:
+        Request:
+        ```json
+        ["Hello, world!", {"payload": "other", "algorithm": "md5"}]
+        ```
+
+        Response:
+        ```
+        {"index":0,"algorithm":"sha256","hash":"315f5bdb76d078c43b8ac0064e4a0164612b1fce77c869345bfc94c75894edd3"}
+        {"index":1,"algorithm":"md5","hash":"795f3202b17cb6bc3d4b771d8c6c9eaf"}
+        ```
+    """
+    return BatchStreamingResponse(
+        hash_batch(
+            stream=request.stream(),
+            content_type=request.headers.get("content-type", ""),
+            default_algorithm=algorithm.value,
+        ),
+    )
+
+
+async def _calibration_out(
+        calibration: Calibration,
+        target_ms: float | None,
+) -> CalibrationOut:
+    recommended = await calibrator.recommend(target_ms)
+    return CalibrationOut(
+        measured_at=calibration.measured_at,
+        cpu_count=calibration.cpu_count,
+        bcrypt_ms_per_cost={
+            rounds: round(calibration.bcrypt_ms(rounds), 1)
+            for rounds in range(BCRYPT_MIN_ROUNDS, BCRYPT_MAX_ROUNDS + 1)
+        },
+        argon2_ms_per_kib_pass=calibration.argon2_ms_per_kib_pass,
+        recommended=HashParamsOut(**vars(recommended)),
+    )
+
+
+@router.get(
+    "/hash-calibration",
+    status_code=status.HTTP_200_OK,
+    response_model=CalibrationOut,
+    summary="Get password hash parameters for a latency target",
+)
+async def get_hash_calibration(
+        target_ms: float | None = Query(default=None, gt=0, le=10000),
+) -> CalibrationOut:
+    """Get the bcrypt and Argon2 cost model measured on this host.
+
+    bcrypt and Argon2 cost the same parameters a very different amount of
+    CPU on different nodes. Every worker benchmarks both hashers when it
+    starts, and this endpoint returns the measured costs together with the
+    parameters that fit a per-hash latency target. The same parameters are
+    used by /bcrypt-hash and /argon2-hash when they are given ``target_ms``.
+
+    Args:
+        target_ms (float, optional): Per-hash latency target in milliseconds.
+            Default: APP_CONFIG__CALIBRATION__TARGET_MS (250)
+
+    Returns:
+        CalibrationOut: Object containing:
+            - measured_at (datetime): When the benchmark ran.
+            - cpu_count (int): CPUs of the host.
+            - bcrypt_ms_per_cost (dict[int, float]): Estimated bcrypt time
+              per cost factor.
+            - argon2_ms_per_kib_pass (float): Argon2 time per KiB of memory
+              and pass.
+            - recommended (HashParamsOut): bcrypt rounds, Argon2 memory_cost
+              and time_cost for the target, with their estimated time.
+
+    Example:
+        ```
+        GET /hash-calibration?target_ms=100
+
+        Response:
+        {
+            "measured_at": "2025-01-01T00:00:00Z",
+            "cpu_count": 8,
+            "bcrypt_ms_per_cost": {"8": 13.1, "9": 26.2, ...},
+            "argon2_ms_per_kib_pass": 0.0011,
+            "recommended": {
+                "target_ms": 100.0,
+                "bcrypt_rounds": 10,
+                "bcrypt_ms": 52.4,
+                "argon2_memory_cost": 65536,
+                "argon2_time_cost": 1,
+                "argon2_ms": 72.1
+            }
+        }
+        ```
+    """
+    with tracer.start_as_current_span("get-hash-calibration"):
+        calibration = await calibrator.get()
+        return await _calibration_out(calibration, target_ms)
+
+
+@router.post(
+    "/hash-calibration",
+    status_code=status.HTTP_200_OK,
+    response_model=CalibrationOut,
+    summary="Benchmark the password hashers again",
+)
+async def run_hash_calibration(
+        target_ms: float | None = Query(default=None, gt=0, le=10000),
+) -> CalibrationOut:
+    """Benchmark bcrypt and Argon2 again on this worker.
+
+    Useful after the host changed (CPU quota, noisy neighbours, ...). Takes a
+    few hundred milliseconds, concurrent runs are serialized.
+
+    Args:
+        target_ms (float, optional): Per-hash latency target in milliseconds.
+            Default: APP_CONFIG__CALIBRATION__TARGET_MS (250)
+
+    Returns:
+        CalibrationOut: The new cost model, see GET /hash-calibration.
+    """
+    with tracer.start_as_current_span("run-hash-calibration"):
+        calibration = await calibrator.recalibrate()
+        return await _calibration_out(calibration, target_ms)
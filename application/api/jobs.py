@@ -0,0 +1,114 @@
+from fastapi import APIRouter, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
+
+from core.jobs import accepted_response, jobs
+from response_docs import JOB_ACCEPTED, JOB_NOT_FOUND
+
+
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+
+def _not_found() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail="Job not found.",
+    )
+
+
+@router.get(
+    "/{job_id}",
+    responses={**JOB_ACCEPTED, **JOB_NOT_FOUND},
+)
+async def get_job(
+    job_id: str,
+    wait: float = Query(default=0, ge=0),
+) -> Response:
+    """Fetch the result of a job, polling or long-polling.
+
+    Key generation requests sent with ``Prefer: respond-async`` answer 202
+    with a job id and a Location header pointing here. While the job runs
+    this endpoint answers 202 with its state; once it is finished it
+    answers with the response the synchronous request would have returned
+    (e.g. 201 and the private key, or 503 if the engine failed), exactly
+    once: the result is removed, and its buffer wiped, when it is fetched.
+
+    Args:
+        job_id (str): Id of the job.
+        wait (float): Seconds to wait for the job to finish before
+            answering 202 (long-polling), at most the configured maximum.
+
+    Returns:
+        Response: The result of the finished job, or 202 with the state of
+            the job (id, kind, status, creation and update times) and a
+            Retry-After header.
+
+    Raises:
+        HTTPException (404): If the job is unknown, expired or already
+            fetched.
+    """
+    if wait > 0:
+        await jobs.wait(job_id, wait)
+    job = await jobs.take(job_id)
+    if job is None:
+        raise _not_found()
+    if "body" in job:
+        return Response(
+            content=job["body"],
+            status_code=job["status_code"],
+            media_type="application/json",
+        )
+    return accepted_response(job)
+
+
+@router.get(
+    "/{job_id}/events",
+    response_class=StreamingResponse,
+    responses={
+        status.HTTP_200_OK: {
+            "description": "Server-sent events: `status` on every state "
+            "change, then `result` with the status code and body of the "
+            "response",
+            "content": {"text/event-stream": {}},
+        },
+        **JOB_NOT_FOUND,
+    },
+)
+async def job_events(job_id: str) -> StreamingResponse:
+    """Stream the state changes and the result of a job as server-sent events.
+
+    Sends a ``status`` event with the state of the job whenever it
+    changes, then a ``result`` event, ``{"status_code": int, "result":
+    object}``, and closes the stream. The result is removed once sent.
+
+    Args:
+        job_id (str): Id of the job.
+
+    Raises:
+        HTTPException (404): If the job is unknown, expired or already
+            fetched.
+    """
+    if await jobs.info(job_id) is None:
+        raise _not_found()
+    return StreamingResponse(
+        jobs.events(job_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.delete(
+    "/{job_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    responses=JOB_NOT_FOUND,
+)
+async def delete_job(job_id: str) -> Response:
+    """Cancel a job, or discard its result without fetching it.
+
+    Raises:
+        HTTPException (404): If the job is unknown, expired or already
+            fetched.
+    """
+    if not await jobs.delete(job_id):
+        raise _not_found()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
@@ -1,12 +1,35 @@
-from fastapi import APIRouter, status
+from contextlib import AsyncExitStack
+from functools import partial
 
+from fastapi import APIRouter, Header, Response, status
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+
+from core.admission import admission
+from core.batch import SlotStreamingResponse, stream_key_pairs
+from core.engine import engine
+from core.jobs import parse_prefer, respond_async
+from core.keycache import public_key_cache
+from core.keypool import key_pool
+from core.responses import encoded_json
+from core.stages import (
+    COMPUTE,
+    ENCRYPT,
+    KEYPOOL,
+    QUEUE,
+    SERIALIZE,
+    StageTimer,
+)
 from core.keysengine import (
+    KeyTypeEnum,
     RSASizeEnum,
+    encrypt_private_key_pem,
     gen_rsa_private_key_pem,
     gen_ed25519_private_key_pem,
     gen_rsa_ed25519_public_key_pem,
 )
 from core.schemas import (
+    KeyPairBatchIn,
     PrivateKeyOut,
     PublicKeyOut,
     PrivateKeyIn,
@@ -14,22 +37,25 @@ from core.schemas import (
 )
 from opentelemetry import trace
 
+from response_docs import JOB_ACCEPTED, KEY_PAIRS_RESULTS, SERVER_BUSY
+
 
 tracer = trace.get_tracer(__name__)
 
 router = APIRouter(tags=["Keys"])
 
 
-@tracer.start_as_current_span(__name__)
 @router.post(
     "/genrsa-private-key",
     status_code=status.HTTP_201_CREATED,
     response_model=PrivateKeyOut,
+    responses={**JOB_ACCEPTED, **SERVER_BUSY},
 )
 async def genrsa_private_key(
     key_size: RSASizeEnum,
     password: PasswordIn,
-) -> PrivateKeyOut:
+    prefer: str | None = Header(default=None),
+) -> Response:
     """Generate an RSA private key with configurable size and optional encryption.
 
     Creates a new RSA private key of the specified bit size and returns it in PEM format.
@@ -40,6 +66,9 @@ async def genrsa_private_key(
     - Implements PKCS#8 format for the private key
     - Uses optimal 65537 (0x10001) as the public exponent
     - When encrypted, uses AES-256-CBC with PBKDF2 key derivation
+    - When the shared key pool is enabled, a pre-generated key is taken from
+      it and only encrypted on request; an empty pool falls back to
+      generating the key inline
 
     Args:
         key_size (RSASizeEnum): The RSA key size in bits. Options:
@@ -50,6 +79,10 @@ async def genrsa_private_key(
         password (PasswordIn): Password protection configuration:
             - password (str, optional): Password to encrypt the private key.
               If None or empty, the key will be unencrypted.
+        prefer (str, optional): ``respond-async`` runs the generation as a
+            job and answers 202 with a Location to fetch the key from;
+            ``wait=<seconds>`` returns the key directly if it is ready in
+            time.
 
     Returns:
         PrivateKeyOut: Object containing:
@@ -59,51 +92,76 @@ async def genrsa_private_key(
 
     Performance considerations:
         - Generating larger keys (4096, 8192) can take significant time
-        - Key generation is CPU-intensive; server load may increase with frequent requests
+        - Key generation runs in the compute engine process pool, so it does
+          not block other requests served by the same worker
+        - With ``Prefer: respond-async`` the connection is released right
+          away and the job waits for a slot instead of being rejected
+
+    Raises:
+        HTTPException (503): If too many keys of this size are being generated.
+            The response carries a Retry-After header.
 
     Security note:
         Key size of 2048 bits or larger is recommended for general use.
         1024-bit keys should only be used for non-sensitive test environments.
     """
-    with tracer.start_as_current_span("genrsa-private-key"):
+    asynchronous, wait = parse_prefer(prefer)
+    if asynchronous:
+        return await respond_async(
+            "genrsa-private-key",
+            partial(_genrsa_private_key, key_size, password.password, reject=False),
+            wait,
+        )
+    return await _genrsa_private_key(key_size, password.password)
+
+
+async def _genrsa_private_key(
+    key_size: RSASizeEnum,
+    password: str | None,
+    reject: bool = True,
+) -> Response:
+    cost_class = f"rsa-{key_size.value}"
+    with (
+        tracer.start_as_current_span("genrsa-private-key"),
+        StageTimer("genrsa-private-key", cost_class) as stages,
+    ):
         current_span = trace.get_current_span()
         current_span.set_attribute("keySize", key_size)
-        private_pem = gen_rsa_private_key_pem(
-            password=password.password,
-            key_size=key_size.value,
-        )
-        return PrivateKeyOut(
-            private_key=private_pem,
-        )
+        async with stages.queued(admission.acquire(cost_class, reject=reject)):
+            with stages.stage(KEYPOOL):
+                private_pem = await key_pool.pop(key_size.value)
+            current_span.set_attribute("keyPoolHit", private_pem is not None)
+            if private_pem is None:
+                with stages.stage(COMPUTE):
+                    private_pem = await engine.run(
+                        gen_rsa_private_key_pem,
+                        password=password,
+                        key_size=key_size.value,
+                    )
+            elif password:
+                with stages.stage(ENCRYPT):
+                    private_pem = await engine.run(
+                        encrypt_private_key_pem,
+                        pem=private_pem,
+                        password=password,
+                    )
+        with stages.stage(SERIALIZE):
+            return encoded_json(
+                {"private_key": private_pem},
+                status_code=status.HTTP_201_CREATED,
+            )
+
 
-    # BackgroundTasks!!!
-    # async def task(data):
-    #     otherdata = await db.fetch("some sql")
-    #     newdata = somelongcomputation(data, otherdata)  # this blocks other requests
-    #     await db.execute("some sql", newdata)
-    #
-    # @app.post("/profile")
-    # async def profile(data: Data, background_tasks: BackgroundTasks):
-    #     background_tasks.add_task(task, data)
-    #     return {}
-
-    # Solution
-    # from fastapi.concurrency import run_in_threadpool
-    # async def task(data):
-    #     otherdata = await db.fetch("some sql")
-    #     newdata = await run_in_threadpool(lambda: somelongcomputation(data, otherdata))
-    #     await db.execute("some sql", newdata)
-
-
-@tracer.start_as_current_span(__name__)
 @router.post(
     "/gened25519-private-key",
     status_code=status.HTTP_201_CREATED,
     response_model=PrivateKeyOut,
+    responses={**JOB_ACCEPTED, **SERVER_BUSY},
 )
 async def gened25519_private_key(
     password: PasswordIn,
-) -> PrivateKeyOut:
+    prefer: str | None = Header(default=None),
+) -> Response:
     """Generate an Ed25519 private key with optional encryption.
 
     Creates a new Ed25519 elliptic curve private key (256 bits) and returns it in PEM format.
@@ -119,6 +177,8 @@ async def gened25519_private_key(
         password (PasswordIn): Password protection configuration:
             - password (str, optional): Password to encrypt the private key.
               If None or empty, the key will be unencrypted.
+        prefer (str, optional): ``respond-async`` (and ``wait``) as for
+            /genrsa-private-key.
 
     Returns:
         PrivateKeyOut: Object containing:
@@ -134,24 +194,49 @@ async def gened25519_private_key(
         Ideal for SSH keys, TLS certificates, document signing, and IoT device authentication
         where performance, security, and small key/signature size are important.
     """
-    with tracer.start_as_current_span("gened25519-private-key"):
-        private_pem = gen_ed25519_private_key_pem(
-            password=password.password,
-        )
-        return PrivateKeyOut(
-            private_key=private_pem,
+    asynchronous, wait = parse_prefer(prefer)
+    if asynchronous:
+        return await respond_async(
+            "gened25519-private-key",
+            partial(_gened25519_private_key, password.password, reject=False),
+            wait,
         )
+    return await _gened25519_private_key(password.password)
+
+
+async def _gened25519_private_key(
+    password: str | None,
+    reject: bool = True,
+) -> Response:
+    with (
+        tracer.start_as_current_span("gened25519-private-key"),
+        StageTimer(
+            "gened25519-private-key",
+            "ed25519-encrypted" if password else "ed25519",
+        ) as stages,
+    ):
+        async with stages.queued(admission.acquire("ed25519", reject=reject)):
+            with stages.stage(COMPUTE):
+                private_pem = await engine.run(
+                    gen_ed25519_private_key_pem,
+                    password=password,
+                )
+        with stages.stage(SERIALIZE):
+            return encoded_json(
+                {"private_key": private_pem},
+                status_code=status.HTTP_201_CREATED,
+            )
 
 
-@tracer.start_as_current_span(__name__)
 @router.post(
     "/gen-public-key",
     status_code=status.HTTP_201_CREATED,
     response_model=PublicKeyOut,
+    responses=SERVER_BUSY,
 )
 async def gen_public_key(
     payload: PrivateKeyIn,
-) -> PublicKeyOut:
+) -> Response:
     """Extract the public key from a private key (RSA or Ed25519).
 
     Derives the corresponding public key from a PEM-encoded private key.
@@ -175,6 +260,7 @@ async def gen_public_key(
               Format begins with "-----BEGIN PUBLIC KEY-----".
 
     Raises:
+        HTTPException (503): If too many public keys are being derived.
         HTTPException (422): If one of these errors occurs:
             - The private key data is in an invalid format or corrupted
             - A password was provided but the private key is not encrypted
@@ -182,15 +268,99 @@ async def gen_public_key(
             - The provided password is incorrect for decrypting the key
 
     Notes:
+        - Derived public keys are cached per worker, keyed by an HMAC of the
+          private key and password; repeat derivations skip the key loading
         - The public key format uses SubjectPublicKeyInfo (SPKI) encoding
         - The returned public key is compatible with most cryptographic libraries
           and systems including OpenSSL, SSH (after conversion), and TLS
     """
-    with tracer.start_as_current_span("gen-public-key"):
-        public_key = gen_rsa_ed25519_public_key_pem(
-            pem=payload.private_key,
-            password=payload.password,
-        )
-        return PublicKeyOut(
-            public_key=public_key,
+    cache_key = public_key_cache.key(payload.private_key, payload.password)
+    public_key = public_key_cache.get(cache_key)
+    with (
+        tracer.start_as_current_span("gen-public-key"),
+        StageTimer(
+            "gen-public-key",
+            "cached" if public_key is not None
+            else "encrypted" if payload.password else "plain",
+        ) as stages,
+    ):
+        current_span = trace.get_current_span()
+        current_span.set_attribute("keyCacheHit", public_key is not None)
+        if public_key is None:
+            async with stages.queued(admission.acquire("public-key")):
+                with stages.stage(COMPUTE):
+                    public_key = await engine.run(
+                        gen_rsa_ed25519_public_key_pem,
+                        pem=payload.private_key,
+                        password=payload.password,
+                    )
+            public_key_cache.put(cache_key, public_key)
+        with stages.stage(SERIALIZE):
+            return encoded_json(
+                {"public_key": public_key},
+                status_code=status.HTTP_201_CREATED,
+            )
+
+
+@router.post(
+    "/gen-key-pairs",
+    status_code=status.HTTP_200_OK,
+    response_class=StreamingResponse,
+    responses={**KEY_PAIRS_RESULTS, **SERVER_BUSY},
+)
+async def gen_key_pairs(
+    params: KeyPairBatchIn,
+) -> StreamingResponse:
+    """Generate many key pairs in one request, streaming them as NDJSON.
+
+    Provisioning a fleet of devices one key per request pays a round trip,
+    the JSON overhead and a compute engine hand-off for every key. This
+    endpoint spreads the generation of ``count`` keys over all the engine
+    processes and streams every key pair as soon as it is ready, so the
+    client can start consuming right away and the server memory does not
+    grow with the count.
+
+    Args:
+        params (KeyPairBatchIn): The batch to generate:
+            - count (int): Number of key pairs, 1 to 10000.
+            - key_type (str): 'ed25519' (default) or 'rsa'.
+            - key_size (int): RSA key size in bits, ignored for Ed25519.
+              Default: 2048
+            - password (str, optional): Password encrypting every private key.
+            - passwords (list[str | None], optional): One password per key,
+              takes precedence over ``password``.
+
+    Returns:
+        StreamingResponse: One NDJSON line per key pair,
+            ``{"index": int, "private_key": str, "public_key": str}``, in
+            completion order. A key whose generation failed gets
+            ``{"index": int, "error": str}`` instead.
+
+    Raises:
+        HTTPException (503): If too many batches are being generated.
+            The response carries a Retry-After header.
+        HTTPException (422): If ``passwords`` does not have ``count`` entries.
+    """
+    param_class = params.key_type.value
+    if params.key_type is KeyTypeEnum.RSA:
+        param_class = f"rsa-{params.key_size.value}"
+    with (
+        tracer.start_as_current_span("gen-key-pairs"),
+        StageTimer("gen-key-pairs", param_class) as stages,
+    ):
+        current_span = trace.get_current_span()
+        current_span.set_attribute("keyType", params.key_type.value)
+        current_span.set_attribute("count", params.count)
+        # The slot is held until the response is over, not until we return
+        slot = AsyncExitStack()
+        with stages.stage(QUEUE):
+            await slot.enter_async_context(admission.acquire("key-batch"))
+        return SlotStreamingResponse(
+            stream_key_pairs(
+                key_type=params.key_type,
+                key_size=params.key_size.value,
+                passwords=params.key_passwords(),
+            ),
+            media_type="application/x-ndjson",
+            background=BackgroundTask(slot.aclose),
         )
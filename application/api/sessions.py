@@ -0,0 +1,183 @@
+from fastapi import (
+    APIRouter,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
+from opentelemetry import trace
+
+from response_docs import (
+    CHUNK_BODY,
+    SERVER_BUSY,
+    SESSION_CONFLICT,
+    SESSION_NOT_FOUND,
+    TOO_LARGE_FILE,
+)
+from core.admission import admission
+from core.config import settings
+from core.hashengine import HashLibEnum, HashModeEnum
+from core.metrics import FILE_SUM_BYTES
+from core.schemas import FileHashedResponse, UploadSessionOut
+from core.sessions import sessions
+
+router = APIRouter(prefix="/file-sum/sessions", tags=["Files"])
+
+tracer = trace.get_tracer(__name__)
+
+
+def _not_found() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail="Session not found.",
+    )
+
+
+@router.post(
+    "",
+    status_code=status.HTTP_201_CREATED,
+    response_model=UploadSessionOut,
+    responses=SERVER_BUSY,
+)
+async def create_session(
+    response: Response,
+    algorithm: list[HashLibEnum] = Query(...),
+    filename: str = "upload",
+) -> UploadSessionOut:
+    """Open a resumable upload session to hash a file sent in chunks.
+
+    A session hashes a file of any size (up to the configured maximum,
+    64 GiB by default) sent as a series of ``PATCH`` requests. The server
+    keeps the hash state of the bytes received so far, never the bytes, so
+    a dropped connection only costs the chunk that was in flight: read the
+    session to get its offset and resend from there.
+
+    Sessions are dropped after an idle timeout (10 minutes by default)
+    without a chunk. The digests are the ones of ``/file-sum`` in
+    sequential mode.
+
+    Args:
+        algorithm (list[HashLibEnum]): The hashing algorithms to use.
+        filename (str): File name reported with the digests.
+
+    Returns:
+        UploadSessionOut: The new session, at offset 0. The Location header
+            points to it.
+
+    Raises:
+        HTTPException (503): If too many sessions are open.
+    """
+    info = await sessions.create([item.value for item in algorithm], filename)
+    response.headers["Location"] = (
+        f"{settings.prefix.api}/file-sum/sessions/{info['session_id']}"
+    )
+    return UploadSessionOut(**info)
+
+
+@router.get(
+    "/{session_id}",
+    response_model=UploadSessionOut,
+    responses=SESSION_NOT_FOUND,
+)
+async def get_session(session_id: str) -> UploadSessionOut:
+    """Return the state of a session, with the offset of its next chunk.
+
+    Raises:
+        HTTPException (404): If the session is unknown, expired or finalized.
+    """
+    info = await sessions.info(session_id)
+    if info is None:
+        raise _not_found()
+    return UploadSessionOut(**info)
+
+
+@router.patch(
+    "/{session_id}",
+    response_model=UploadSessionOut,
+    responses={
+        **SESSION_NOT_FOUND,
+        **SESSION_CONFLICT,
+        **TOO_LARGE_FILE,
+        **SERVER_BUSY,
+    },
+    openapi_extra=CHUNK_BODY,
+)
+async def append_chunk(
+    request: Request,
+    session_id: str,
+    offset: int = Query(..., ge=0),
+) -> UploadSessionOut:
+    """Append the raw request body to the file of a session.
+
+    The chunk is hashed while it streams in. It is accepted only if it
+    starts at the end of the data received so far, given by ``offset``, and
+    counts only once it is received completely: if the request fails, the
+    session is left where it was and the same chunk can be sent again.
+
+    Args:
+        request (Request): The request whose ``application/octet-stream``
+            body is the chunk, at most 64 MiB by default.
+        session_id (str): Id of the session.
+        offset (int): Position of the chunk in the file.
+
+    Returns:
+        UploadSessionOut: The session, with its offset moved past the chunk.
+
+    Raises:
+        HTTPException (404): If the session is unknown, expired or finalized.
+        HTTPException (409): If ``offset`` is not the offset of the session,
+            or another chunk of the session is being received.
+        HTTPException (413): If the chunk or the whole file is too large.
+        HTTPException (503): If too many files are being hashed.
+    """
+    with tracer.start_as_current_span("file-sum-chunk") as span:
+        span.set_attribute("offset", offset)
+        async with admission.acquire("file-sum"):
+            info = await sessions.append(session_id, offset, request.stream())
+        FILE_SUM_BYTES.labels("session").inc(info["offset"] - offset)
+        return UploadSessionOut(**info)
+
+
+@router.post(
+    "/{session_id}/finalize",
+    response_model=FileHashedResponse,
+    responses={**SESSION_NOT_FOUND, **SESSION_CONFLICT},
+)
+async def finalize_session(session_id: str) -> FileHashedResponse:
+    """Close a session and return the digests of its file.
+
+    Returns:
+        FileHashedResponse: The same fields as ``/file-sum`` in sequential
+            mode, ``size`` being the number of bytes received.
+
+    Raises:
+        HTTPException (404): If the session is unknown, expired or finalized.
+        HTTPException (409): If a chunk is still being received.
+    """
+    info = await sessions.finish(session_id)
+    algorithm = info["algorithms"][0]
+    return FileHashedResponse(
+        filename=info["filename"],
+        algorithm=algorithm,
+        hash=info["hashes"][algorithm],
+        size=info["offset"],
+        hashes=info["hashes"],
+        mode=HashModeEnum.SEQUENTIAL.value,
+    )
+
+
+@router.delete(
+    "/{session_id}",
+    status_code=status.HTTP_204_NO_CONTENT,
+    responses=SESSION_NOT_FOUND,
+)
+async def delete_session(session_id: str) -> Response:
+    """Abandon a session.
+
+    Raises:
+        HTTPException (404): If the session is unknown, expired or finalized.
+    """
+    if not await sessions.delete(session_id):
+        raise _not_found()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,79 @@
+"""Requests per second of the hot endpoints, served in-process.
+
+Run from the application directory (the usual APP_CONFIG__* variables must
+be set):
+
+    python -m benchmarks.endpoints --requests 5000
+
+Requests go through ``httpx.ASGITransport``, so there is no socket and no
+HTTP parsing: the figures are the per-request CPU cost of the application
+itself (routing, validation, handler and response serialization). Run it
+before and after a change to compare.
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+
+import httpx
+
+from main import app
+
+ENDPOINTS: dict[str, tuple[str, str, dict | None]] = {
+    "random-token": ("GET", "/api/random-token", None),
+    "hashlib": ("POST", "/api/hashlib?algorithm=sha256", {"payload": "benchmark"}),
+    "gen-public-key": ("POST", "/api/gen-public-key", None),
+}
+
+
+async def requests_per_second(
+    client: httpx.AsyncClient,
+    method: str,
+    url: str,
+    body: dict | None,
+    requests: int,
+    repeat: int,
+) -> float:
+    await client.request(method, url, json=body)
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(requests):
+            await client.request(method, url, json=body)
+        best = min(best, time.perf_counter() - started)
+    return requests / best
+
+
+async def run(requests: int, repeat: int) -> None:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        private_key = (
+            await client.post("/api/gened25519-private-key", json={})
+        ).json()["private_key"]
+        # Served from the public key cache after the first request
+        ENDPOINTS["gen-public-key"] = (
+            "POST",
+            "/api/gen-public-key",
+            {"private_key": private_key},
+        )
+        print(f"{'endpoint':<16} {'req/s':>10}")
+        for name, (method, url, body) in ENDPOINTS.items():
+            rps = await requests_per_second(
+                client, method, url, body, requests, repeat
+            )
+            print(f"{name:<16} {rps:>10.0f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    # The client logs every request, which would dominate the measurement
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    asyncio.run(run(args.requests, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
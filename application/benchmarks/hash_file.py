@@ -0,0 +1,80 @@
+"""File hashing throughput, before/after the block based HashLib.hash_file.
+
+Run from the application directory:
+
+    python -m benchmarks.hash_file --size 64 --block-size 262144
+
+For every algorithm and data shape the script reports the throughput in
+MiB/s of the legacy implementation (iterating the file, i.e. splitting it
+on newlines) and of ``HashLib.hash_file`` (fixed blocks read with
+``readinto`` into a reused buffer).
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from typing import BinaryIO, Callable
+
+from core.hashengine import DEFAULT_BLOCK_SIZE, HashLib, HashLibEnum
+
+MiB = 1024 * 1024
+
+SHAPES: dict[str, Callable[[int], bytes]] = {
+    "random": os.urandom,
+    "no-newlines": lambda size: b"\xab" * size,
+    "text-lines": lambda size: (b"0123456789abcdef" * 2 + b"\n") * (size // 33),
+}
+
+
+def legacy_hash_file(algorithm: str, file: BinaryIO) -> str:
+    # HashLib.hash_file before the block based implementation
+    hasher = HashLib(algorithm).hasher()
+    for chunk in file:
+        hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def throughput(func: Callable[[], str], file: BinaryIO, size: int, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        file.seek(0)
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return size / MiB / best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=64, help="file size in MiB")
+    parser.add_argument("--block-size", type=int, default=DEFAULT_BLOCK_SIZE)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'algorithm':<10} {'shape':<12} {'before MiB/s':>13} {'after MiB/s':>12}")
+    for shape, make in SHAPES.items():
+        data = make(args.size * MiB)
+        with tempfile.TemporaryFile() as file:
+            file.write(data)
+            for algorithm in HashLibEnum:
+                hashlib_ = HashLib(algorithm.value)
+                before = throughput(
+                    lambda: legacy_hash_file(algorithm.value, file),
+                    file,
+                    len(data),
+                    args.repeat,
+                )
+                after = throughput(
+                    lambda: hashlib_.hash_file(file, block_size=args.block_size),
+                    file,
+                    len(data),
+                    args.repeat,
+                )
+                print(
+                    f"{algorithm.value:<10} {shape:<12} {before:>13.1f} {after:>12.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
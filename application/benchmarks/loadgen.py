@@ -0,0 +1,549 @@
+"""Open-loop HTTP load generator for KeyForge.
+
+Run from the application directory, against a deployment:
+
+    python -m benchmarks.loadgen --url https://localhost --insecure \\
+        --rate 50 --duration 60 --arrival poisson --output report.json
+
+or in-process against ``main:app`` (no network, the usual APP_CONFIG__*
+variables must be set):
+
+    python -m benchmarks.loadgen --in-process --rate 20 --duration 10
+
+Requests are sent on an arrival schedule that does not depend on the
+responses (open loop): ``constant`` spaces them evenly, ``poisson`` draws
+exponential gaps, ``ramp`` goes linearly from ``--rate`` to ``--ramp-to``.
+A slow server therefore builds up a backlog instead of silently slowing
+the generator down, and latencies are measured from the time a request
+was *scheduled*, so queueing in the client is not hidden (no coordinated
+omission). Requests that would exceed ``--max-in-flight`` are not sent
+and are reported as dropped.
+
+Every request picks a scenario of the weighted mix (``--mix`` takes a JSON
+list of scenarios, see DEFAULT_MIX for the format). String values starting
+with ``$`` in a scenario body are replaced by fixtures created once before
+the run: ``$private_key``, ``$argon2_hash`` and ``$bcrypt_hash``.
+
+Connections are pooled and kept alive (``--connections``), so TLS is only
+negotiated once per connection. The report gives, per scenario and in
+total, the throughput, the rate of errors and of 503 (admission control)
+responses, and latency percentiles from a log-linear histogram with about
+1.6% relative precision.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import re
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Iterator
+
+import httpx
+
+MiB = 1024 * 1024
+
+# Reported latency percentiles
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+@dataclass
+class Scenario:
+    """One kind of request of the mix."""
+
+    name: str
+    method: str
+    path: str
+    weight: float = 1.0
+    params: dict | None = None
+    json: Any = None
+    # Size of a random application/octet-stream body
+    content_size: int | None = None
+
+
+DEFAULT_MIX: list[Scenario] = [
+    Scenario("random-token", "GET", "/api/random-token", weight=20),
+    Scenario(
+        "random-token-batch",
+        "GET",
+        "/api/random-token",
+        weight=2,
+        params={"length": 32, "count": 1000},
+    ),
+    *(
+        Scenario(
+            f"hashlib-{algorithm}",
+            "POST",
+            "/api/hashlib",
+            weight=5,
+            params={"algorithm": algorithm},
+            json={"payload": "qwerty"},
+        )
+        for algorithm in ("sha256", "sha384", "sha512", "md5", "blake2b", "sha3_256")
+    ),
+    Scenario(
+        "hashlib-batch",
+        "POST",
+        "/api/hashlib/batch",
+        weight=2,
+        json=[f"payload-{index}" for index in range(1000)],
+    ),
+    Scenario(
+        "argon2-hash",
+        "POST",
+        "/api/argon2-hash",
+        weight=3,
+        json={"payload": "qwerty", "length": 32, "memory_cost": 65536},
+    ),
+    Scenario(
+        "bcrypt-hash",
+        "POST",
+        "/api/bcrypt-hash",
+        weight=3,
+        json={"payload": "qwerty", "rounds": 12},
+    ),
+    Scenario(
+        "argon2-verify",
+        "POST",
+        "/api/argon2-verify",
+        weight=3,
+        json={"payload": "qwerty", "hash": "$argon2_hash"},
+    ),
+    Scenario(
+        "bcrypt-verify",
+        "POST",
+        "/api/bcrypt-verify",
+        weight=3,
+        json={"payload": "qwerty", "hash": "$bcrypt_hash"},
+    ),
+    *(
+        Scenario(
+            f"genrsa-{key_size}",
+            "POST",
+            "/api/genrsa-private-key",
+            weight=weight,
+            params={"key_size": key_size},
+            json={"password": "qwerty"},
+        )
+        for key_size, weight in ((1024, 2), (2048, 2), (4096, 0.5), (8192, 0.05))
+    ),
+    Scenario(
+        "gened25519",
+        "POST",
+        "/api/gened25519-private-key",
+        weight=10,
+        json={"password": "qwerty"},
+    ),
+    Scenario(
+        "gen-public-key",
+        "POST",
+        "/api/gen-public-key",
+        weight=5,
+        json={"private_key": "$private_key"},
+    ),
+    Scenario(
+        "gen-key-pairs",
+        "POST",
+        "/api/gen-key-pairs",
+        weight=1,
+        json={"count": 100, "key_type": "ed25519"},
+    ),
+    Scenario(
+        "file-sum",
+        "POST",
+        "/api/file-sum",
+        weight=2,
+        params={"algorithm": "sha256"},
+        content_size=MiB,
+    ),
+    Scenario("hash-calibration", "GET", "/api/hash-calibration", weight=1),
+]
+
+
+class LatencyHistogram:
+    """Log-linear latency histogram, in the spirit of HdrHistogram.
+
+    Values are recorded in microseconds. Below ``2 ** sub_bucket_bits``
+    every value has its own bucket; above, every power of two is split in
+    ``2 ** (sub_bucket_bits - 1)`` buckets, so the relative error of a
+    reported value is below ``2 ** (1 - sub_bucket_bits)`` (1.6% with the
+    default 7 bits) whatever the range, in a few hundred buckets at most.
+    """
+
+    def __init__(self, sub_bucket_bits: int = 7):
+        self.sub_bucket_bits = sub_bucket_bits
+        self.counts: dict[tuple[int, int], int] = {}
+        self.count = 0
+        self.total = 0
+        self.min = math.inf
+        self.max = 0
+
+    def record(self, seconds: float) -> None:
+        value = max(int(seconds * 1e6), 0)
+        shift = max(value.bit_length() - self.sub_bucket_bits, 0)
+        key = (shift, value >> shift)
+        self.counts[key] = self.counts.get(key, 0) + 1
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        for key, count in other.counts.items():
+            self.counts[key] = self.counts.get(key, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def percentile(self, percentile: float) -> float:
+        """Highest value of the bucket holding the percentile, in seconds."""
+        if not self.count:
+            return 0.0
+        rank = math.ceil(percentile / 100 * self.count)
+        seen = 0
+        for shift, sub_bucket in sorted(self.counts, key=lambda key: key[1] << key[0]):
+            seen += self.counts[shift, sub_bucket]
+            if seen >= max(rank, 1):
+                upper = ((sub_bucket + 1) << shift) - 1
+                return min(upper, self.max) / 1e6
+        return self.max / 1e6
+
+    def summary(self) -> dict[str, float]:
+        if not self.count:
+            return {}
+        return {
+            "min": self.min / 1e6,
+            "mean": self.total / self.count / 1e6,
+            **{f"p{percentile:g}": self.percentile(percentile) for percentile in PERCENTILES},
+            "max": self.max / 1e6,
+        }
+
+
+@dataclass
+class ScenarioStats:
+    """Outcomes of the requests of one scenario."""
+
+    sent: int = 0
+    ok: int = 0
+    busy: int = 0  # 503, i.e. rejected by admission control
+    errors: int = 0  # Other non-2xx responses
+    failures: int = 0  # No response: timeout, connection error, ...
+    dropped: int = 0  # Not sent, --max-in-flight was reached
+    latency: LatencyHistogram = field(default_factory=LatencyHistogram)
+
+    def record(self, status_code: int | None, latency: float) -> None:
+        if status_code is None:
+            self.failures += 1
+            return
+        self.latency.record(latency)
+        if 200 <= status_code < 300:
+            self.ok += 1
+        elif status_code == 503:
+            self.busy += 1
+        else:
+            self.errors += 1
+
+    def report(self, elapsed: float) -> dict:
+        completed = self.ok + self.busy + self.errors + self.failures
+        return {
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "ok": self.ok,
+            "busy_503": self.busy,
+            "errors": self.errors,
+            "failures": self.failures,
+            "throughput": self.ok / elapsed if elapsed else 0.0,
+            "error_rate": (self.errors + self.failures) / completed if completed else 0.0,
+            "busy_rate": self.busy / completed if completed else 0.0,
+            "latency": self.latency.summary(),
+        }
+
+
+def arrivals(
+    process: str,
+    rate: float,
+    duration: float,
+    ramp_to: float | None = None,
+    rng: random.Random | None = None,
+) -> Iterator[float]:
+    """Scheduled send times, in seconds from the start of the run.
+
+    Args:
+        process (str): 'constant', 'poisson' or 'ramp'.
+        rate (float): Requests per second (at the start for 'ramp').
+        duration (float): Length of the run in seconds.
+        ramp_to (float | None): Rate at the end of a 'ramp'.
+        rng (random.Random | None): Random source of 'poisson'.
+
+    Yields:
+        float: Offset of the next request.
+    """
+    rng = rng or random.Random()
+    now = 0.0
+    while True:
+        if process == "poisson":
+            now += rng.expovariate(rate)
+        elif process == "ramp":
+            end_rate = rate if ramp_to is None else ramp_to
+            current = rate + (end_rate - rate) * min(now / duration, 1.0)
+            now += 1 / max(current, 1e-3)
+        else:
+            now += 1 / rate
+        if now >= duration:
+            return
+        yield now
+
+
+def _resolve(value: Any, fixtures: dict[str, str]) -> Any:
+    if isinstance(value, str) and value.startswith("$"):
+        return fixtures[value[1:]]
+    if isinstance(value, dict):
+        return {key: _resolve(item, fixtures) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_resolve(item, fixtures) for item in value]
+    return value
+
+
+async def create_fixtures(client: httpx.AsyncClient, mix: list[Scenario]) -> dict[str, str]:
+    """Create the keys and hashes the scenarios of ``mix`` refer to."""
+    used = json.dumps([scenario.json for scenario in mix])
+    requests = {
+        "private_key": ("/api/gened25519-private-key", {}, "private_key"),
+        "argon2_hash": (
+            "/api/argon2-hash",
+            {"payload": "qwerty", "length": 32, "memory_cost": 65536},
+            "hash",
+        ),
+        "bcrypt_hash": ("/api/bcrypt-hash", {"payload": "qwerty", "rounds": 12}, "hash"),
+    }
+    fixtures = {}
+    for name, (path, body, key) in requests.items():
+        if f'"${name}"' in used:
+            response = await client.post(path, json=body)
+            response.raise_for_status()
+            fixtures[name] = response.json()[key]
+    return fixtures
+
+
+class LoadGenerator:
+    """Sends the requests of a mix on an open-loop arrival schedule."""
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        mix: list[Scenario],
+        max_in_flight: int,
+        seed: int | None = None,
+    ):
+        self.client = client
+        self.mix = mix
+        self.max_in_flight = max_in_flight
+        self.rng = random.Random(seed)
+        self.stats = {scenario.name: ScenarioStats() for scenario in mix}
+        self.in_flight = 0
+        self._bodies: dict[str, dict] = {}
+
+    def prepare(self, fixtures: dict[str, str]) -> None:
+        """Render the request arguments of every scenario once."""
+        for scenario in self.mix:
+            kwargs: dict[str, Any] = {"params": scenario.params}
+            if scenario.content_size is not None:
+                kwargs["content"] = os.urandom(scenario.content_size)
+                kwargs["headers"] = {"Content-Type": "application/octet-stream"}
+            elif scenario.json is not None:
+                kwargs["json"] = _resolve(scenario.json, fixtures)
+            self._bodies[scenario.name] = kwargs
+
+    async def _send(self, scenario: Scenario, scheduled: float) -> None:
+        stats = self.stats[scenario.name]
+        status_code = None
+        try:
+            response = await self.client.request(
+                scenario.method, scenario.path, **self._bodies[scenario.name]
+            )
+            status_code = response.status_code
+        except httpx.HTTPError:
+            pass
+        finally:
+            self.in_flight -= 1
+        stats.record(status_code, time.perf_counter() - scheduled)
+
+    async def run(self, schedule: Iterator[float]) -> float:
+        """Send requests at the scheduled offsets and wait for all of them.
+
+        Returns:
+            float: Elapsed time in seconds, until the last response.
+        """
+        weights = [scenario.weight for scenario in self.mix]
+        tasks: set[asyncio.Task] = set()
+        started = time.perf_counter()
+        for offset in schedule:
+            delay = started + offset - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            scenario = self.rng.choices(self.mix, weights)[0]
+            stats = self.stats[scenario.name]
+            stats.sent += 1
+            if self.in_flight >= self.max_in_flight:
+                stats.dropped += 1
+                continue
+            self.in_flight += 1
+            task = asyncio.create_task(self._send(scenario, started + offset))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.wait(tasks)
+        return time.perf_counter() - started
+
+    def report(self, elapsed: float) -> dict:
+        total = ScenarioStats()
+        for stats in self.stats.values():
+            for name in ("sent", "ok", "busy", "errors", "failures", "dropped"):
+                setattr(total, name, getattr(total, name) + getattr(stats, name))
+            total.latency.merge(stats.latency)
+        return {
+            "elapsed": elapsed,
+            "scenarios": {
+                name: stats.report(elapsed)
+                for name, stats in self.stats.items()
+                if stats.sent
+            },
+            "total": total.report(elapsed),
+        }
+
+
+def _format_ms(seconds: float | None) -> str:
+    return "-" if seconds is None else f"{seconds * 1000:.1f}"
+
+
+def print_summary(report: dict) -> None:
+    header = (
+        f"{'scenario':<20} {'sent':>7} {'ok/s':>8} {'err%':>6} {'503%':>6} "
+        f"{'drop':>5} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'p99.9 ms':>9} {'max ms':>8}"
+    )
+    print(header)
+    print("-" * len(header))
+    rows = [*report["scenarios"].items(), ("total", report["total"])]
+    for name, stats in rows:
+        latency = stats["latency"]
+        print(
+            f"{name:<20} {stats['sent']:>7} {stats['throughput']:>8.1f} "
+            f"{stats['error_rate']:>6.1%} {stats['busy_rate']:>6.1%} {stats['dropped']:>5} "
+            f"{_format_ms(latency.get('p50')):>8} {_format_ms(latency.get('p90')):>8} "
+            f"{_format_ms(latency.get('p99')):>8} {_format_ms(latency.get('p99.9')):>9} "
+            f"{_format_ms(latency.get('max')):>8}"
+        )
+    print(f"elapsed {report['elapsed']:.1f} s")
+
+
+def load_mix(path: str | None, only: str | None) -> list[Scenario]:
+    mix = DEFAULT_MIX
+    if path:
+        with open(path) as file:
+            mix = [Scenario(**scenario) for scenario in json.load(file)]
+    if only:
+        pattern = re.compile(only)
+        mix = [scenario for scenario in mix if pattern.search(scenario.name)]
+    if not mix:
+        raise SystemExit("The mix has no scenario")
+    return mix
+
+
+def _client(args: argparse.Namespace) -> httpx.AsyncClient:
+    timeout = httpx.Timeout(args.timeout)
+    if args.in_process:
+        from main import app
+
+        return httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app),
+            base_url="http://loadgen",
+            timeout=timeout,
+        )
+    return httpx.AsyncClient(
+        base_url=args.url,
+        verify=not args.insecure,
+        timeout=timeout,
+        limits=httpx.Limits(
+            max_connections=args.connections,
+            max_keepalive_connections=args.connections,
+        ),
+    )
+
+
+async def run(args: argparse.Namespace) -> dict:
+    mix = load_mix(args.mix, args.only)
+    async with _client(args) as client:
+        generator = LoadGenerator(
+            client=client,
+            mix=mix,
+            max_in_flight=args.max_in_flight,
+            seed=args.seed,
+        )
+        generator.prepare(await create_fixtures(client, mix))
+        schedule = arrivals(
+            process=args.arrival,
+            rate=args.rate,
+            duration=args.duration,
+            ramp_to=args.ramp_to,
+            rng=random.Random(args.seed),
+        )
+        elapsed = await generator.run(schedule)
+    report = generator.report(elapsed)
+    report["config"] = {
+        "target": "in-process" if args.in_process else args.url,
+        "arrival": args.arrival,
+        "rate": args.rate,
+        "ramp_to": args.ramp_to,
+        "duration": args.duration,
+        "connections": args.connections,
+        "max_in_flight": args.max_in_flight,
+        "seed": args.seed,
+        "mix": [asdict(scenario) for scenario in mix],
+    }
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", default="https://localhost", help="base URL")
+    target.add_argument(
+        "--in-process", action="store_true", help="call main:app, no network"
+    )
+    parser.add_argument("--insecure", action="store_true", help="skip TLS verification")
+    parser.add_argument("--rate", type=float, default=10, help="requests per second")
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument(
+        "--arrival", choices=("constant", "poisson", "ramp"), default="poisson"
+    )
+    parser.add_argument("--ramp-to", type=float, help="final rate of --arrival ramp")
+    parser.add_argument("--mix", help="JSON file with a list of scenarios")
+    parser.add_argument("--only", help="regular expression on the scenario names")
+    parser.add_argument("--connections", type=int, default=100, help="pool size")
+    parser.add_argument("--max-in-flight", type=int, default=1000)
+    parser.add_argument("--timeout", type=float, default=60, help="per request, seconds")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--output", help="JSON file the report is written to")
+    args = parser.parse_args()
+    if args.rate <= 0 or (args.ramp_to is not None and args.ramp_to <= 0):
+        parser.error("rates must be positive")
+
+    # The client logs every request
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    report = asyncio.run(run(args))
+    print_summary(report)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+    if not report["total"]["ok"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
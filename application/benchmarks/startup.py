@@ -0,0 +1,248 @@
+"""Cold-start budget of a worker: import time and time to the first request.
+
+Run from the application directory with the usual APP_CONFIG__* variables:
+
+    python -m benchmarks.startup imports --top 15
+    python -m benchmarks.startup serve --runs 5 --target 1.5
+
+``imports`` runs ``python -X importtime -c "import main"`` in a fresh
+interpreter and reports the total import time, the self time per top-level
+package and the slowest modules. Everything a worker imports before it can
+accept a connection is on the critical path of a restart or a scale-up;
+heavy modules that are only needed by some requests belong behind
+``core.lazy.lazy_import`` or in the startup warm-up.
+
+``serve`` starts ``python main.py`` with a single worker on a free local
+port, as many times as ``--runs``, and measures from the start of the
+process:
+
+    first-request  the first answer of /utils/health-check, i.e. the worker
+                   accepts traffic
+    ready          the first 200 of /utils/ready, i.e. the warm-up (engine
+                   processes, calibration, OTLP exporter) is done
+    first-key      latency of an Ed25519 key request sent right after ready
+
+It exits with status 1 when the median time to the first request exceeds
+``--target`` seconds, so it can gate a CI job. ``--foreground-warm-up``
+runs the warm-up before the worker accepts traffic, for comparison.
+"""
+
+import argparse
+import json
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import httpx
+
+APPLICATION_DIR = Path(__file__).resolve().parent.parent
+
+_IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+
+def parse_importtime(output: str) -> list[dict]:
+    """Parse the stderr of ``python -X importtime``.
+
+    Args:
+        output (str): Captured stderr.
+
+    Returns:
+        list[dict]: One entry per imported module, in import order, with
+            its ``name``, ``depth``, ``self`` and ``cumulative`` time in
+            seconds.
+    """
+    modules = []
+    for line in output.splitlines():
+        match = _IMPORT_LINE.match(line)
+        if match is None:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        modules.append(
+            {
+                "name": name,
+                "depth": len(indent) // 2,
+                "self": int(self_us) / 1e6,
+                "cumulative": int(cumulative_us) / 1e6,
+            }
+        )
+    return modules
+
+
+def summarize_imports(modules: list[dict], top: int = 10) -> dict:
+    """Total import time, self time per top-level package and slowest modules.
+
+    Args:
+        modules (list[dict]): Output of :func:`parse_importtime`.
+        top (int): Number of packages and modules to keep.
+
+    Returns:
+        dict: ``total``, ``packages`` and ``modules`` (by self time), times
+            in seconds.
+    """
+    packages: dict[str, float] = defaultdict(float)
+    for module in modules:
+        packages[module["name"].split(".")[0]] += module["self"]
+    slowest = sorted(modules, key=lambda module: module["self"], reverse=True)
+    return {
+        "total": sum(module["self"] for module in modules),
+        "packages": dict(
+            sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+        ),
+        "modules": {module["name"]: module["self"] for module in slowest[:top]},
+    }
+
+
+def measure_imports(module: str = "main") -> list[dict]:
+    """Import ``module`` in a fresh interpreter with ``-X importtime``."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=APPLICATION_DIR,
+        env={**os.environ, "PYTHONPATH": str(APPLICATION_DIR)},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return parse_importtime(completed.stderr)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _poll(client: httpx.Client, url: str, start: float, timeout: float) -> float:
+    # Seconds since ``start`` until ``url`` answers 200
+    while True:
+        try:
+            if client.get(url).status_code == 200:
+                return time.perf_counter() - start
+        except httpx.TransportError:
+            pass
+        if time.perf_counter() - start > timeout:
+            raise TimeoutError(f"{url} did not answer within {timeout} s")
+        time.sleep(0.005)
+
+
+def measure_startup(background_warm_up: bool = True, timeout: float = 60.0) -> dict:
+    """Start a single worker and time its first request and its readiness.
+
+    Returns:
+        dict: ``first_request``, ``ready`` and ``first_key`` in seconds,
+            and the warm-up ``steps`` reported by /utils/ready.
+    """
+    port = _free_port()
+    env = {
+        **os.environ,
+        "APP_CONFIG__RUNTIME__HOST": "127.0.0.1",
+        "APP_CONFIG__RUNTIME__PORT": str(port),
+        "APP_CONFIG__RUNTIME__RELOAD": "false",
+        "APP_CONFIG__WORKERS__WORKERS": "1",
+        "APP_CONFIG__STARTUP__BACKGROUND_WARM_UP": str(background_warm_up),
+    }
+    base_url = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "main.py"],
+        cwd=APPLICATION_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client(base_url=base_url, timeout=timeout) as client:
+            first_request = _poll(client, "/utils/health-check", start, timeout)
+            ready = _poll(client, "/utils/ready", start, timeout)
+            key_start = time.perf_counter()
+            client.post("/api/gened25519-private-key", json={}).raise_for_status()
+            first_key = time.perf_counter() - key_start
+            steps = client.get("/utils/ready").json()["steps"]
+    finally:
+        server.terminate()
+        server.wait(timeout)
+    return {
+        "first_request": first_request,
+        "ready": ready,
+        "first_key": first_key,
+        "steps": steps,
+    }
+
+
+def _print_table(rows: dict[str, float]) -> None:
+    width = max(map(len, rows), default=0)
+    for name, seconds in rows.items():
+        print(f"  {name:<{width}}  {seconds * 1000:9.1f} ms")
+
+
+def _imports_command(args: argparse.Namespace) -> int:
+    summary = summarize_imports(measure_imports(args.module), top=args.top)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return 0
+    print(f"import {args.module}: {summary['total'] * 1000:.1f} ms")
+    print("self time per package:")
+    _print_table(summary["packages"])
+    print("slowest modules (self time):")
+    _print_table(summary["modules"])
+    return 0
+
+
+def _serve_command(args: argparse.Namespace) -> int:
+    runs = [
+        measure_startup(background_warm_up=not args.foreground_warm_up)
+        for _ in range(args.runs)
+    ]
+    summary = {
+        metric: statistics.median(run[metric] for run in runs)
+        for metric in ("first_request", "ready", "first_key")
+    }
+    if args.json:
+        print(json.dumps({"median": summary, "runs": runs}, indent=2))
+    else:
+        print(f"median of {args.runs} runs:")
+        _print_table(summary)
+        print("warm-up steps of the last run:")
+        _print_table(runs[-1]["steps"])
+    if args.target is not None and summary["first_request"] > args.target:
+        print(
+            f"time to first request {summary['first_request']:.3f} s "
+            f"exceeds the {args.target:.3f} s target",
+            file=sys.stderr,
+        )
+        return 1
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    imports_parser = commands.add_parser("imports", help="import time report")
+    imports_parser.add_argument("--module", default="main")
+    imports_parser.add_argument("--top", type=int, default=10)
+    imports_parser.add_argument("--json", action="store_true")
+
+    serve_parser = commands.add_parser("serve", help="time to first request")
+    serve_parser.add_argument("--runs", type=int, default=3)
+    serve_parser.add_argument(
+        "--target",
+        type=float,
+        help="maximum median time to the first request, in seconds",
+    )
+    serve_parser.add_argument("--foreground-warm-up", action="store_true")
+    serve_parser.add_argument("--json", action="store_true")
+
+    args = parser.parse_args()
+    if args.command == "imports":
+        sys.exit(_imports_command(args))
+    sys.exit(_serve_command(args))
+
+
+if __name__ == "__main__":
+    main()
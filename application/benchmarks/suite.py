@@ -0,0 +1,598 @@
+"""Microbenchmarks of the hash and key engines, with regression baselines.
+
+Run from the application directory (the usual APP_CONFIG__* variables must
+be set for the ``asgi`` group):
+
+    python -m benchmarks.suite run --output baseline.json
+    # ... change something ...
+    python -m benchmarks.suite run --output current.json
+    python -m benchmarks.suite compare baseline.json current.json --threshold 0.1
+
+``run`` times every case of the selected groups and writes the results
+together with metadata about the machine and the library versions.
+``--quick`` restricts the parameter space to the cheap cases (well under a
+minute on a single core), ``--filter`` keeps the cases whose name matches a
+regular expression.
+
+``compare`` matches the cases by name and flags every case whose median
+time grew by more than the threshold. It exits with status 1 when there is
+at least one regression, so it can gate a CI job. Results taken on another
+machine are compared anyway, with a warning: only compare like with like.
+RSA key generation searches for random primes, its timings are noisy by
+nature: look at its standard deviation before calling it a regression.
+
+Groups:
+    hashlib   HashLib.hash, hash_file, MultiHash and TreeHash per algorithm
+              and data size
+    password  argon2hash per memory cost, bcrypt_hash per rounds, and both
+              verifications
+    keys      RSA per key size and Ed25519 key generation, plain and
+              encrypted PEM, PEM encryption and public key derivation
+    asgi      end-to-end requests through httpx.ASGITransport, as in the
+              test client fixture
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import logging
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from functools import lru_cache
+from importlib import metadata
+from typing import Awaitable, Callable
+
+from core.hashengine import (
+    HashLib,
+    HashLibEnum,
+    MultiHash,
+    TreeHash,
+    argon2_verify,
+    argon2hash,
+    bcrypt_hash,
+    bcrypt_verify,
+)
+from core.keysengine import (
+    RSASizeEnum,
+    encrypt_private_key_pem,
+    gen_ed25519_private_key_pem,
+    gen_rsa_ed25519_public_key_pem,
+    gen_rsa_private_key_pem,
+)
+
+KiB = 1024
+MiB = 1024 * KiB
+PASSWORD = "benchmark-password"
+PACKAGES = ("cryptography", "argon2-cffi", "bcrypt", "pwdlib", "fastapi", "orjson")
+
+
+@dataclass
+class Case:
+    """One benchmark: a callable timed for a point of the parameter space."""
+
+    name: str
+    group: str
+    func: Callable[[], object] | None = None
+    afunc: Callable[[], Awaitable[object]] | None = None
+    params: dict = field(default_factory=dict)
+    # Bytes processed per call, to report a throughput
+    size: int | None = None
+    quick: bool = True
+
+
+@lru_cache(maxsize=None)
+def _random_data(size: int) -> bytes:
+    # Created by the warm-up call of the first selected case that needs it,
+    # so that --quick and --filter runs do not allocate the others
+    return os.urandom(size)
+
+
+def _hashlib_cases() -> list[Case]:
+    cases = []
+    for algorithm in HashLibEnum:
+        hashlib_ = HashLib(algorithm.value)
+        for length in (16, 256):
+            payload = "x" * length
+            cases.append(
+                Case(
+                    name=f"hashlib/hash/{algorithm.value}/{length}B",
+                    group="hashlib",
+                    func=lambda h=hashlib_, p=payload: h.hash(p),
+                    params={"algorithm": algorithm.value, "payload_size": length},
+                    size=length,
+                )
+            )
+        for size in (64 * KiB, 16 * MiB):
+
+            def hash_file(h=hashlib_, s=size) -> str:
+                # BytesIO shares the bytes until written to: no copy
+                return h.hash_file(io.BytesIO(_random_data(s)))
+
+            cases.append(
+                Case(
+                    name=f"hashlib/hash_file/{algorithm.value}/{size // KiB}KiB",
+                    group="hashlib",
+                    func=hash_file,
+                    params={"algorithm": algorithm.value, "file_size": size},
+                    size=size,
+                    quick=size < MiB or algorithm is HashLibEnum.SHA256,
+                )
+            )
+    size = 16 * MiB
+    algorithms = ["sha256", "md5", "blake2b"]
+    cases += [
+        Case(
+            name="hashlib/multihash/sha256+md5+blake2b/16384KiB",
+            group="hashlib",
+            func=lambda: MultiHash(algorithms).update(_random_data(size)),
+            params={"algorithms": algorithms, "file_size": size},
+            size=size,
+        ),
+        Case(
+            name="hashlib/treehash/sha256/16384KiB",
+            group="hashlib",
+            func=lambda: _tree_hash(_random_data(size)),
+            params={"algorithms": ["sha256"], "file_size": size},
+            size=size,
+        ),
+    ]
+    return cases
+
+
+def _tree_hash(data: bytes) -> dict[str, str]:
+    tree = TreeHash(["sha256"])
+    tree.update(data)
+    return tree.hexdigests()
+
+
+def _password_cases() -> list[Case]:
+    cases = []
+    for memory_cost in (1024, 16 * 1024, 64 * 1024, 256 * 1024):
+        cases.append(
+            Case(
+                name=f"password/argon2hash/m{memory_cost}",
+                group="password",
+                func=lambda m=memory_cost: argon2hash(
+                    payload=PASSWORD, memory_cost=m, length=32
+                ),
+                params={"memory_cost": memory_cost, "time_cost": 3},
+                quick=memory_cost <= 64 * 1024,
+            )
+        )
+    for rounds in (8, 10, 12, 14):
+        cases.append(
+            Case(
+                name=f"password/bcrypt_hash/r{rounds}",
+                group="password",
+                func=lambda r=rounds: bcrypt_hash(payload=PASSWORD, rounds=r),
+                params={"rounds": rounds},
+                quick=rounds <= 12,
+            )
+        )
+    argon2_hashed = argon2hash(payload=PASSWORD, memory_cost=16 * 1024, length=32)
+    bcrypt_hashed = bcrypt_hash(payload=PASSWORD, rounds=10)
+    cases += [
+        Case(
+            name="password/argon2_verify/m16384",
+            group="password",
+            func=lambda: argon2_verify(
+                payload=PASSWORD,
+                hashed=argon2_hashed,
+                memory_cost=16 * 1024,
+                time_cost=3,
+            ),
+            params={"memory_cost": 16 * 1024, "time_cost": 3},
+        ),
+        Case(
+            name="password/bcrypt_verify/r10",
+            group="password",
+            func=lambda: bcrypt_verify(
+                payload=PASSWORD, hashed=bcrypt_hashed, rounds=10
+            ),
+            params={"rounds": 10},
+        ),
+    ]
+    return cases
+
+
+def _keys_cases() -> list[Case]:
+    cases = []
+    for key_size in RSASizeEnum:
+        for password in (None, PASSWORD):
+            pem = "encrypted" if password else "plain"
+            cases.append(
+                Case(
+                    name=f"keys/gen_rsa/{key_size.value}/{pem}",
+                    group="keys",
+                    func=lambda s=key_size.value, p=password: gen_rsa_private_key_pem(
+                        password=p, key_size=s
+                    ),
+                    params={"key_size": key_size.value, "encrypted": bool(password)},
+                    quick=key_size.value <= 2048,
+                )
+            )
+    for password in (None, PASSWORD):
+        pem = "encrypted" if password else "plain"
+        cases.append(
+            Case(
+                name=f"keys/gen_ed25519/{pem}",
+                group="keys",
+                func=lambda p=password: gen_ed25519_private_key_pem(password=p),
+                params={"encrypted": bool(password)},
+            )
+        )
+    rsa_pem = gen_rsa_private_key_pem(password=None, key_size=2048)
+    private_keys = {
+        "rsa-2048": (rsa_pem, gen_rsa_private_key_pem(password=PASSWORD, key_size=2048)),
+        "ed25519": (
+            gen_ed25519_private_key_pem(password=None),
+            gen_ed25519_private_key_pem(password=PASSWORD),
+        ),
+    }
+    cases.append(
+        Case(
+            name="keys/encrypt_private_key_pem/rsa-2048",
+            group="keys",
+            func=lambda: encrypt_private_key_pem(pem=rsa_pem, password=PASSWORD),
+            params={"key_type": "rsa-2048"},
+        )
+    )
+    for key_type, (plain, encrypted) in private_keys.items():
+        for pem, password in ((plain, None), (encrypted, PASSWORD)):
+            kind = "encrypted" if password else "plain"
+            cases.append(
+                Case(
+                    name=f"keys/gen_public_key/{key_type}/{kind}",
+                    group="keys",
+                    func=lambda k=pem, p=password: gen_rsa_ed25519_public_key_pem(
+                        pem=k, password=p
+                    ),
+                    params={"key_type": key_type, "encrypted": bool(password)},
+                )
+            )
+    return cases
+
+
+def _asgi_cases() -> list[Case]:
+    import httpx
+
+    from main import app
+
+    def request(method: str, url: str, **kwargs) -> Callable[[], Awaitable[object]]:
+        # Created lazily, in the event loop of the measurement
+        client: httpx.AsyncClient | None = None
+
+        async def call() -> None:
+            nonlocal client
+            if client is None:
+                client = httpx.AsyncClient(
+                    transport=httpx.ASGITransport(app=app),
+                    base_url="http://bench",
+                )
+            response = await client.request(method, url, **kwargs)
+            response.raise_for_status()
+
+        return call
+
+    private_key = gen_ed25519_private_key_pem(password=None)
+    upload = os.urandom(MiB)
+    raw = {"Content-Type": "application/octet-stream"}
+    return [
+        Case("asgi/random-token", "asgi", afunc=request("GET", "/api/random-token")),
+        Case(
+            "asgi/random-token/count-1000",
+            "asgi",
+            afunc=request("GET", "/api/random-token?length=32&count=1000"),
+            params={"count": 1000},
+        ),
+        Case(
+            "asgi/hashlib/sha256",
+            "asgi",
+            afunc=request(
+                "POST", "/api/hashlib?algorithm=sha256", json={"payload": "benchmark"}
+            ),
+            params={"algorithm": "sha256"},
+        ),
+        Case(
+            "asgi/gened25519-private-key",
+            "asgi",
+            afunc=request("POST", "/api/gened25519-private-key", json={}),
+        ),
+        Case(
+            "asgi/genrsa-private-key/2048",
+            "asgi",
+            afunc=request("POST", "/api/genrsa-private-key?key_size=2048", json={}),
+            params={"key_size": 2048},
+        ),
+        Case(
+            "asgi/gen-public-key/ed25519-cached",
+            "asgi",
+            afunc=request(
+                "POST", "/api/gen-public-key", json={"private_key": private_key}
+            ),
+        ),
+        Case(
+            "asgi/bcrypt-hash/r8",
+            "asgi",
+            afunc=request(
+                "POST", "/api/bcrypt-hash", json={"payload": PASSWORD, "rounds": 8}
+            ),
+            params={"rounds": 8},
+        ),
+        Case(
+            "asgi/file-sum/sha256/1024KiB",
+            "asgi",
+            afunc=request(
+                "POST", "/api/file-sum?algorithm=sha256", content=upload, headers=raw
+            ),
+            params={"algorithm": "sha256", "file_size": len(upload)},
+            size=len(upload),
+        ),
+    ]
+
+
+GROUPS: dict[str, Callable[[], list[Case]]] = {
+    "hashlib": _hashlib_cases,
+    "password": _password_cases,
+    "keys": _keys_cases,
+    "asgi": _asgi_cases,
+}
+
+
+def _timings(call: Callable[[int], float], rounds: int, min_time: float) -> tuple[int, list[float]]:
+    # As timeit.Timer.autorange: grow the loop count until a round is long enough
+    loops = 1
+    while True:
+        elapsed = call(loops)
+        if elapsed >= min_time:
+            break
+        loops *= 10 if elapsed < min_time / 10 else 2
+    timings = [elapsed / loops]
+    timings += [call(loops) / loops for _ in range(rounds - 1)]
+    return loops, timings
+
+
+def measure(case: Case, rounds: int, min_time: float) -> dict:
+    """Time ``case`` and summarize the seconds per call.
+
+    The loop count is chosen so that a round lasts at least ``min_time``,
+    then ``rounds`` rounds are timed. The median is what ``compare`` looks
+    at; the minimum and the standard deviation tell how noisy it was.
+
+    Args:
+        case (Case): The benchmark.
+        rounds (int): Number of timed rounds.
+        min_time (float): Minimum duration of a round in seconds.
+
+    Returns:
+        dict: The result of the case, JSON serializable.
+    """
+    if case.afunc is not None:
+        loop = asyncio.new_event_loop()
+
+        async def arounds(loops: int) -> float:
+            started = time.perf_counter()
+            for _ in range(loops):
+                await case.afunc()
+            return time.perf_counter() - started
+
+        try:
+            loop.run_until_complete(case.afunc())  # warm-up
+            loops, timings = _timings(
+                lambda n: loop.run_until_complete(arounds(n)), rounds, min_time
+            )
+        finally:
+            loop.close()
+    else:
+
+        def sync_rounds(loops: int) -> float:
+            func = case.func
+            started = time.perf_counter()
+            for _ in range(loops):
+                func()
+            return time.perf_counter() - started
+
+        case.func()  # warm-up
+        loops, timings = _timings(sync_rounds, rounds, min_time)
+
+    median = statistics.median(timings)
+    result = {
+        "group": case.group,
+        "params": case.params,
+        "rounds": rounds,
+        "loops": loops,
+        "median": median,
+        "min": min(timings),
+        "stdev": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+    }
+    if case.size:
+        result["bytes_per_second"] = case.size / median
+    return result
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _cpu_model() -> str:
+    try:
+        with open("/proc/cpuinfo") as cpuinfo:
+            for line in cpuinfo:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor()
+
+
+def machine_metadata() -> dict:
+    """Describe the machine and the software the results were taken with."""
+    versions = {}
+    for package in PACKAGES:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "hostname": platform.node(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_model": _cpu_model(),
+        "cpu_count": os.cpu_count(),
+        "available_cpus": len(os.sched_getaffinity(0))
+        if hasattr(os, "sched_getaffinity")
+        else os.cpu_count(),
+        "python": sys.version.split()[0],
+        "implementation": platform.python_implementation(),
+        "packages": versions,
+        "git_commit": _git_commit(),
+    }
+
+
+def run(
+    groups: list[str],
+    quick: bool,
+    pattern: str | None,
+    rounds: int,
+    min_time: float,
+) -> dict:
+    """Run the selected benchmarks, printing every result as it comes.
+
+    Returns:
+        dict: ``{"metadata": {...}, "results": {case name: result}}``.
+    """
+    results = {}
+    selected = re.compile(pattern) if pattern else None
+    for group in groups:
+        for case in GROUPS[group]():
+            if quick and not case.quick:
+                continue
+            if selected and not selected.search(case.name):
+                continue
+            result = results[case.name] = measure(case, rounds, min_time)
+            throughput = ""
+            if "bytes_per_second" in result:
+                throughput = f"{result['bytes_per_second'] / MiB:>10.1f} MiB/s"
+            print(
+                f"{case.name:<48} {_format_seconds(result['median']):>10} "
+                f"± {_format_seconds(result['stdev']):>9}{throughput}",
+                flush=True,
+            )
+    return {
+        "metadata": machine_metadata(),
+        "settings": {"quick": quick, "rounds": rounds, "min_time": min_time},
+        "results": results,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list[str]:
+    """Compare two runs case by case.
+
+    Args:
+        baseline (dict): Results of ``run`` taken as the reference.
+        current (dict): Results of ``run`` to check.
+        threshold (float): Relative slowdown of the median flagged as a
+            regression, e.g. 0.1 for 10%.
+
+    Returns:
+        list[str]: Names of the regressed cases.
+    """
+    for key in ("cpu_model", "cpu_count", "python"):
+        if baseline["metadata"].get(key) != current["metadata"].get(key):
+            print(
+                f"warning: {key} differs: {baseline['metadata'].get(key)} "
+                f"-> {current['metadata'].get(key)}"
+            )
+    regressions = []
+    print(f"{'case':<48} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, result in current["results"].items():
+        reference = baseline["results"].get(name)
+        if reference is None:
+            print(f"{name:<48} {'-':>10} {_format_seconds(result['median']):>10}      new")
+            continue
+        change = result["median"] / reference["median"] - 1
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        elif change < -threshold:
+            flag = "  improved"
+        print(
+            f"{name:<48} {_format_seconds(reference['median']):>10} "
+            f"{_format_seconds(result['median']):>10} {change:>+8.1%}{flag}"
+        )
+    for name in baseline["results"].keys() - current["results"].keys():
+        print(f"{name:<48} missing from the current results")
+    return regressions
+
+
+def _format_seconds(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the benchmarks")
+    run_parser.add_argument("--output", help="JSON file the results are written to")
+    run_parser.add_argument(
+        "--group",
+        action="append",
+        choices=list(GROUPS),
+        help="benchmark group, repeat for several (default: all)",
+    )
+    run_parser.add_argument("--filter", help="regular expression on the case names")
+    run_parser.add_argument("--quick", action="store_true", help="cheap cases only")
+    run_parser.add_argument("--rounds", type=int, default=5)
+    run_parser.add_argument("--min-time", type=float, default=0.1)
+
+    compare_parser = commands.add_parser("compare", help="compare two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.1)
+
+    args = parser.parse_args()
+    if args.command == "run":
+        # The client logs every request, which would dominate the measurement
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+        results = run(
+            groups=args.group or list(GROUPS),
+            quick=args.quick,
+            pattern=args.filter,
+            rounds=args.rounds,
+            min_time=args.min_time,
+        )
+        if args.output:
+            with open(args.output, "w") as output:
+                json.dump(results, output, indent=2)
+    else:
+        with open(args.baseline) as baseline, open(args.current) as current:
+            regressions = compare(json.load(baseline), json.load(current), args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) above {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from fastapi import HTTPException, status
+
+from core.config import AdmissionConfig, AdmissionLimit, settings
+from core.metrics import ADMISSION_IN_FLIGHT, ADMISSION_QUEUED, ADMISSION_REJECTED
+
+
+class _CostClass:
+    """Slots, FIFO wait queue and observed service time of one cost class."""
+
+    def __init__(self, name: str, limit: AdmissionLimit, service_time: float):
+        self.name = name
+        self.limit = limit
+        self.in_flight = 0
+        self.waiters: deque[asyncio.Future] = deque()
+        # Exponentially weighted moving average of the service time (seconds)
+        self.service_time = service_time
+
+    def retry_after(self) -> int:
+        """Seconds until the current backlog of this class is expected to drain."""
+        backlog = self.in_flight + len(self.waiters)
+        return max(
+            1,
+            math.ceil(self.service_time * backlog / self.limit.max_in_flight),
+        )
+
+    def report(self) -> None:
+        ADMISSION_IN_FLIGHT.labels(cost_class=self.name).set(self.in_flight)
+        ADMISSION_QUEUED.labels(cost_class=self.name).set(len(self.waiters))
+
+
+class AdmissionController:
+    """Per cost class admission control for expensive endpoints.
+
+    Every cost class (RSA per key size, Argon2, bcrypt, file-sum, ...) has a
+    maximum number of requests processed at the same time and a maximum
+    number of requests waiting for a slot. A request arriving when both are
+    exhausted is rejected right away with 503 and a ``Retry-After`` computed
+    from the observed service time, so that the reverse proxy can retry it
+    on another replica instead of queueing it until it times out.
+
+    The state is local to the worker process.
+    """
+
+    def __init__(self, config: AdmissionConfig):
+        self.enabled = config.enabled
+        self._classes = {
+            name: _CostClass(name, limit, config.default_service_time)
+            for name, limit in config.limits.items()
+        }
+
+    def _release(self, cost_class: _CostClass) -> None:
+        # Hand the slot over to the first waiter still interested in it
+        while cost_class.waiters:
+            waiter = cost_class.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                cost_class.report()
+                return
+        cost_class.in_flight -= 1
+        cost_class.report()
+
+    async def _acquire(self, cost_class: _CostClass, reject: bool) -> None:
+        limit = cost_class.limit
+        if cost_class.in_flight < limit.max_in_flight and not cost_class.waiters:
+            cost_class.in_flight += 1
+            cost_class.report()
+            return
+        if reject and len(cost_class.waiters) >= limit.max_queued:
+            ADMISSION_REJECTED.labels(cost_class=cost_class.name).inc()
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, retry later.",
+                headers={"Retry-After": str(cost_class.retry_after())},
+            )
+        waiter = asyncio.get_running_loop().create_future()
+        cost_class.waiters.append(waiter)
+        cost_class.report()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over right before the cancellation
+                self._release(cost_class)
+            else:
+                cost_class.waiters.remove(waiter)
+                cost_class.report()
+            raise
+
+    @asynccontextmanager
+    async def acquire(self, name: str, reject: bool = True) -> AsyncIterator[None]:
+        """Hold a slot of the ``name`` cost class for the duration of the block.
+
+        Waits in FIFO order when all slots are taken and the queue has room.
+
+        Args:
+            name (str): Cost class, e.g. 'rsa-4096', 'argon2' or 'file-sum'.
+                Classes without a configured limit are not limited.
+            reject (bool): Reject the request when the queue is full. Jobs,
+                whose number is bounded by the job store, wait instead.
+
+        Raises:
+            HTTPException (503): If both the slots and the queue of the class
+                are full. The response carries a ``Retry-After`` header.
+        """
+        cost_class = self._classes.get(name)
+        if not self.enabled or cost_class is None:
+            yield
+            return
+        await self._acquire(cost_class, reject)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            cost_class.service_time = 0.8 * cost_class.service_time + 0.2 * elapsed
+            self._release(cost_class)
+
+
+admission = AdmissionController(settings.admission)
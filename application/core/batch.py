@@ -0,0 +1,326 @@
+import asyncio
+import re
+from typing import AsyncIterator
+
+import orjson
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from core.engine import engine
+from core.hashengine import HashLib, HashLibEnum
+from core.keysengine import KeyTypeEnum, gen_key_pairs_pem
+
+NDJSON_MEDIA_TYPES = ("application/x-ndjson", "application/jsonl", "application/ndjson")
+
+# Same limit as BasePayload.payload
+MAX_PAYLOAD_LENGTH = 256
+# Largest raw item accepted, anything above is a malformed body
+MAX_ITEM_SIZE = 64 * 1024
+# Keys generated per compute engine task, RSA keys go one by one
+KEY_PAIRS_PER_TASK = {KeyTypeEnum.RSA: 1, KeyTypeEnum.ED25519: 64}
+
+
+class BatchError(ValueError):
+    """The batch body can not be parsed any further."""
+
+
+class NDJSONSplitter:
+    """Incrementally split an NDJSON body into its non-empty lines."""
+
+    def __init__(self, max_item_size: int = MAX_ITEM_SIZE):
+        self.max_item_size = max_item_size
+        self._buffer = b""
+
+    def feed(self, chunk: bytes) -> list[bytes]:
+        lines = (self._buffer + chunk).split(b"\n")
+        self._buffer = lines.pop()
+        if len(self._buffer) > self.max_item_size:
+            raise BatchError("Batch item is too large.")
+        return [line for line in lines if line.strip()]
+
+    def close(self) -> list[bytes]:
+        rest, self._buffer = self._buffer, b""
+        return [rest] if rest.strip() else []
+
+
+class JSONArraySplitter:
+    """Incrementally split a JSON array into the raw bytes of its elements.
+
+    Only the nesting depth and string boundaries are tracked (with regular
+    expressions, so the scan runs in C); every top-level element is then
+    parsed on its own with orjson. Memory is bounded by the largest
+    element rather than by the size of the array.
+    """
+
+    _STRUCTURAL = re.compile(rb'[\[\]{},"]')
+    _STRING_END = re.compile(rb'["\\]')
+
+    def __init__(self, max_item_size: int = MAX_ITEM_SIZE):
+        self.max_item_size = max_item_size
+        self._buffer = bytearray()
+        self._pos = 0
+        self._start = 0
+        self._depth = 0
+        self._in_string = False
+        self._done = False
+
+    def feed(self, chunk: bytes) -> list[bytes]:
+        items = []
+        buffer = self._buffer
+        buffer += chunk
+        pos = self._pos
+        while not self._done:
+            if self._in_string:
+                match = self._STRING_END.search(buffer, pos)
+                if match is None:
+                    pos = len(buffer)
+                    break
+                if buffer[match.start()] == ord("\\"):
+                    if match.end() >= len(buffer):
+                        # The escaped character is in the next chunk
+                        pos = match.start()
+                        break
+                    pos = match.end() + 1
+                    continue
+                self._in_string = False
+                pos = match.end()
+                continue
+            match = self._STRUCTURAL.search(buffer, pos)
+            if match is None:
+                pos = len(buffer)
+                break
+            char = buffer[match.start() : match.end()]
+            if self._depth == 0 and (
+                char != b"[" or buffer[self._start : match.start()].strip()
+            ):
+                raise BatchError("Batch body must be a JSON array.")
+            pos = match.end()
+            if char == b'"':
+                self._in_string = True
+            elif char in b"[{":
+                self._depth += 1
+                if self._depth == 1:
+                    self._start = pos
+            elif char in b"]}":
+                self._depth -= 1
+                if self._depth == 0:
+                    item = bytes(buffer[self._start : match.start()]).strip()
+                    if item:
+                        items.append(item)
+                    self._done = True
+            elif char == b"," and self._depth == 1:
+                items.append(bytes(buffer[self._start : match.start()]).strip())
+                self._start = pos
+        if pos - self._start > self.max_item_size:
+            raise BatchError("Batch item is too large.")
+        # Drop what has been consumed
+        del buffer[: self._start]
+        self._pos = pos - self._start
+        self._start = 0
+        return items
+
+    def close(self) -> list[bytes]:
+        if not self._done:
+            raise BatchError("Batch body is not a complete JSON array.")
+        return []
+
+
+def _error_line(index: int | None, detail: str) -> bytes:
+    return orjson.dumps({"index": index, "error": detail}) + b"\n"
+
+
+class BatchHasher:
+    """Hash batch items and render them as NDJSON result lines."""
+
+    def __init__(self, default_algorithm: str):
+        self.default_algorithm = default_algorithm
+        self._hashers = {
+            algorithm.value: HashLib(algorithm=algorithm.value).hasher
+            for algorithm in HashLibEnum
+        }
+        self.index = 0
+
+    def hash_item(self, raw: bytes) -> bytes:
+        """Hash one raw JSON item: a payload string or a payload object.
+
+        Object items are ``{"payload": str, "algorithm": str | null}``; when
+        the algorithm is missing the default algorithm is used.
+        """
+        index = self.index
+        self.index += 1
+        try:
+            item = orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            return _error_line(index, "Item is not valid JSON.")
+        algorithm = self.default_algorithm
+        if isinstance(item, dict):
+            algorithm = item.get("algorithm") or algorithm
+            item = item.get("payload")
+        if not isinstance(algorithm, str):
+            return _error_line(index, "Algorithm must be a string.")
+        if not isinstance(item, str):
+            return _error_line(index, "Payload must be a string.")
+        if len(item) > MAX_PAYLOAD_LENGTH:
+            return _error_line(
+                index,
+                f"Payload is longer than {MAX_PAYLOAD_LENGTH} characters.",
+            )
+        hasher = self._hashers.get(algorithm)
+        if hasher is None:
+            return _error_line(index, f"Hash algorithm '{algorithm}' is not supported")
+        return orjson.dumps(
+            {
+                "index": index,
+                "algorithm": algorithm,
+                "hash": hasher(item.encode()).hexdigest(),
+            }
+        ) + b"\n"
+
+
+async def hash_batch(
+    stream: AsyncIterator[bytes],
+    content_type: str,
+    default_algorithm: str,
+) -> AsyncIterator[bytes]:
+    """Hash a streamed batch of payloads, yielding NDJSON result lines.
+
+    The body is parsed incrementally as it is received (a JSON array, or
+    NDJSON if ``content_type`` says so) and the results of every received
+    chunk are yielded in input order. Both the request and the response
+    stay in constant memory.
+
+    Errors of a single item are reported on its line and do not stop the
+    batch. A malformed body ends the stream with a line without index.
+
+    Args:
+        stream (AsyncIterator[bytes]): The request body.
+        content_type (str): Content-Type of the request.
+        default_algorithm (str): Algorithm of items without one.
+
+    Yields:
+        bytes: One or more NDJSON lines.
+    """
+    if content_type.split(";")[0].strip() in NDJSON_MEDIA_TYPES:
+        splitter = NDJSONSplitter()
+    else:
+        splitter = JSONArraySplitter()
+    hasher = BatchHasher(default_algorithm)
+    try:
+        async for chunk in stream:
+            items = splitter.feed(chunk)
+            if items:
+                yield b"".join(map(hasher.hash_item, items))
+        items = splitter.close()
+        if items:
+            yield b"".join(map(hasher.hash_item, items))
+    except BatchError as exc:
+        yield _error_line(None, str(exc))
+
+
+async def stream_key_pairs(
+    key_type: KeyTypeEnum,
+    key_size: int,
+    passwords: list[str | None],
+) -> AsyncIterator[bytes]:
+    """Generate key pairs on the compute engine, yielding NDJSON result lines.
+
+    The keys are split into tasks of ``KEY_PAIRS_PER_TASK`` keys and at most
+    two tasks per engine process are in flight, so all the cores are busy
+    while the memory used does not depend on the number of keys. Results
+    are yielded as soon as their task completes, hence not necessarily in
+    index order.
+
+    Args:
+        key_type (KeyTypeEnum): Type of the keys.
+        key_size (int): Size of the RSA keys in bits.
+        passwords (list[str | None]): One password per key.
+
+    Yields:
+        bytes: NDJSON lines ``{"index": int, "private_key": str,
+            "public_key": str}``, or ``{"index": int, "error": str}`` for
+            the keys of a failed task.
+    """
+    chunk_size = KEY_PAIRS_PER_TASK[key_type]
+    window = 2 * engine.processes
+    starts = iter(range(0, len(passwords), chunk_size))
+    pending: dict[asyncio.Future, int] = {}
+
+    def submit() -> None:
+        start = next(starts, None)
+        if start is not None:
+            task = asyncio.ensure_future(
+                engine.run(
+                    gen_key_pairs_pem,
+                    key_type=key_type.value,
+                    key_size=key_size,
+                    passwords=passwords[start : start + chunk_size],
+                )
+            )
+            pending[task] = start
+
+    try:
+        for _ in range(window):
+            submit()
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            lines = []
+            for task in done:
+                start = pending.pop(task)
+                submit()
+                try:
+                    pairs = task.result()
+                except HTTPException as exc:
+                    end = min(start + chunk_size, len(passwords))
+                    lines += [_error_line(index, exc.detail) for index in range(start, end)]
+                    continue
+                lines += [
+                    orjson.dumps(
+                        {"index": index, "private_key": private, "public_key": public}
+                    )
+                    + b"\n"
+                    for index, (private, public) in enumerate(pairs, start)
+                ]
+            yield b"".join(lines)
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+class SlotStreamingResponse(StreamingResponse):
+    """Streaming response whose background task runs however it ends.
+
+    Starlette skips the background task when the body iterator raises or
+    the client went away, and the cleanup of an iterator that was never
+    started does not run at all. Admission slots held for the whole stream
+    are released by the background task, so it must run on every path.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        background, self.background = self.background, None
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            if background is not None:
+                await background()
+
+
+class BatchStreamingResponse(StreamingResponse):
+    """Streaming response whose body is produced while the request is read.
+
+    Starlette's ``StreamingResponse`` listens for the client disconnect by
+    calling ``receive()`` next to the body iterator, which would steal the
+    request body chunks the iterator is consuming. Here the iterator reads
+    the request itself and a disconnect surfaces as ``ClientDisconnect``
+    from ``request.stream()``.
+    """
+
+    media_type = "application/x-ndjson"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await self.stream_response(send)
+        finally:
+            # Also when the client went away: it releases admission slots
+            if self.background is not None:
+                await self.background()
@@ -0,0 +1,218 @@
+"""keyforge-hash: checksum files and directory trees with the /file-sum engine.
+
+    keyforge-hash -a sha256 dist/ > SHA256SUMS
+    keyforge-hash -a sha256 -a md5 --tag build/
+    keyforge-hash -a sha256 --json --mode tree image.iso
+
+Files are memory-mapped and the mapping is handed to hashlib without being
+copied, through the same ``MultiHash`` and ``TreeHash`` classes as the
+/file-sum endpoint: the digests, and with ``--json`` the whole objects, are
+the ones /file-sum returns for the same file. The text output is the one
+of sha256sum & co (``--tag`` for the BSD style used by ``sha256sum --tag``,
+required with several algorithms), so ``sha256sum -c`` can check it.
+
+Files are hashed on a thread pool with one thread per available CPU
+(hashlib releases the GIL), largest first so that a big file does not
+start last and keep a single core busy at the end. Results are printed in
+path order.
+"""
+
+import argparse
+import mmap
+import os
+import sys
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Iterable, Iterator
+
+import orjson
+
+from core.hashengine import (
+    DEFAULT_BLOCK_SIZE,
+    HashLibEnum,
+    HashModeEnum,
+    MultiHash,
+    TreeHash,
+)
+from core.manifest import algorithm_tag
+from core.resources import available_cpus
+from core.schemas import FileHashedResponse
+
+
+def hash_path(
+    path: str,
+    algorithms: list[str],
+    mode: HashModeEnum = HashModeEnum.SEQUENTIAL,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+) -> FileHashedResponse:
+    """Hash a file through a read-only memory mapping.
+
+    Args:
+        path (str): Path of the file, also reported as its ``filename``.
+        algorithms (list[str]): Algorithm names, the first one is reported
+            in ``algorithm`` and ``hash``.
+        mode (HashModeEnum): 'sequential' (default) or 'tree'.
+        block_size (int): Block size of the sequential mode.
+
+    Returns:
+        FileHashedResponse: The response /file-sum returns for this file.
+
+    Raises:
+        OSError: If the file can not be opened or mapped.
+        ValueError: If one of the algorithms is not supported.
+    """
+    if mode is HashModeEnum.TREE:
+        hasher = TreeHash(algorithms=algorithms)
+    else:
+        hasher = MultiHash(algorithms=algorithms, block_size=block_size)
+    with open(path, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        # An empty file can not be mapped, and has nothing to hash
+        if size:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapping:
+                if hasattr(mapping, "madvise"):
+                    mapping.madvise(mmap.MADV_SEQUENTIAL)
+                with memoryview(mapping) as view:
+                    hasher.update(view)
+                    hashes = hasher.hexdigests()
+        else:
+            hashes = hasher.hexdigests()
+    return FileHashedResponse(
+        filename=path,
+        algorithm=algorithms[0],
+        hash=hashes[algorithms[0]],
+        size=size,
+        hashes=hashes,
+        mode=mode.value,
+        leaf_size=hasher.leaf_size if mode is HashModeEnum.TREE else None,
+    )
+
+
+def walk(paths: Iterable[str]) -> Iterator[str]:
+    """Regular files of ``paths``, directories walked recursively in name order.
+
+    Symbolic links to files are followed, links to directories are not.
+    """
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                file_path = os.path.join(root, name)
+                if os.path.isfile(file_path):
+                    yield file_path
+
+
+def hash_paths(
+    paths: list[str],
+    algorithms: list[str],
+    mode: HashModeEnum = HashModeEnum.SEQUENTIAL,
+    workers: int | None = None,
+) -> Iterator[tuple[str, FileHashedResponse | OSError]]:
+    """Hash files in parallel, largest first, and yield them in ``paths`` order.
+
+    Args:
+        paths (list[str]): Files to hash.
+        algorithms (list[str]): Algorithm names.
+        mode (HashModeEnum): 'sequential' (default) or 'tree'.
+        workers (int | None): Number of threads, one per available CPU by
+            default.
+
+    Yields:
+        tuple[str, FileHashedResponse | OSError]: The path and its result,
+            or the error that prevented hashing it.
+    """
+
+    def size(path: str) -> int:
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+    with ThreadPoolExecutor(
+        max_workers=workers or available_cpus(),
+        thread_name_prefix="keyforge-hash",
+    ) as executor:
+        futures: dict[str, Future] = {}
+        for path in sorted(paths, key=size, reverse=True):
+            futures[path] = executor.submit(hash_path, path, algorithms, mode)
+        for path in paths:
+            try:
+                yield path, futures[path].result()
+            except OSError as exc:
+                yield path, exc
+
+
+def _escape(path: str) -> tuple[str, str]:
+    # coreutils escapes names with a backslash or a newline, and flags the
+    # line with a leading backslash
+    if "\\" not in path and "\n" not in path:
+        return "", path
+    return "\\", path.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def format_line(result: FileHashedResponse, algorithm: str, tag: bool) -> str:
+    """One line of sha256sum (or ``sha256sum --tag`` with ``tag``) output."""
+    prefix, name = _escape(result.filename)
+    digest = result.hashes[algorithm]
+    if tag:
+        return f"{prefix}{algorithm_tag(algorithm)} ({name}) = {digest}"
+    return f"{prefix}{digest}  {name}"
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="keyforge-hash",
+        description=__doc__.splitlines()[0],
+    )
+    parser.add_argument("paths", nargs="+", help="files and directories")
+    parser.add_argument(
+        "-a",
+        "--algorithm",
+        action="append",
+        choices=[item.value for item in HashLibEnum],
+        help="repeat for several algorithms in one pass (default: sha256)",
+    )
+    parser.add_argument(
+        "--mode",
+        choices=[item.value for item in HashModeEnum],
+        default=HashModeEnum.SEQUENTIAL.value,
+    )
+    parser.add_argument("-j", "--jobs", type=int, help="number of threads")
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument("--tag", action="store_true", help="BSD-style output")
+    output.add_argument(
+        "--json",
+        action="store_true",
+        help="a JSON array of /file-sum responses",
+    )
+    args = parser.parse_args(argv)
+    algorithms = list(dict.fromkeys(args.algorithm or ["sha256"]))
+    if len(algorithms) > 1 and not (args.tag or args.json):
+        parser.error("several algorithms need --tag or --json")
+
+    status, results = 0, []
+    for path, result in hash_paths(
+        list(walk(args.paths)),
+        algorithms,
+        mode=HashModeEnum(args.mode),
+        workers=args.jobs,
+    ):
+        if isinstance(result, OSError):
+            error = result.strerror or result
+            print(f"keyforge-hash: {path}: {error}", file=sys.stderr)
+            status = 1
+        elif args.json:
+            results.append(result.model_dump())
+        else:
+            for algorithm in algorithms:
+                print(format_line(result, algorithm, args.tag))
+    if args.json:
+        sys.stdout.buffer.write(orjson.dumps(results, option=orjson.OPT_INDENT_2))
+        sys.stdout.buffer.write(b"\n")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+import asyncio
+import logging
+import math
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable
+
+from starlette.concurrency import run_in_threadpool
+
+from core.config import CalibrationConfig, settings
+from core.hashengine import argon2hash, bcrypt_hash
+
+logger = logging.getLogger(__name__)
+
+# Bounds of BcryptHashParams.rounds
+BCRYPT_MIN_ROUNDS = 8
+BCRYPT_MAX_ROUNDS = 16
+# Bounds of Argon2HashParams.memory_cost and time_cost
+ARGON2_MAX_MEMORY_COST = 244141
+ARGON2_MAX_TIME_COST = 10
+# Below this the hash is no longer memory-hard in any useful sense
+ARGON2_MIN_MEMORY_COST = 1024
+
+# Parameters the measurements are taken with
+_BCRYPT_PROBE_ROUNDS = 10
+_ARGON2_PROBE_MEMORY_COST = 16 * 1024
+_PROBE_PAYLOAD = "calibration-probe-payload"
+
+
+@dataclass(frozen=True)
+class HashParams:
+    """Password hash parameters recommended for a latency target."""
+
+    target_ms: float
+    bcrypt_rounds: int
+    bcrypt_ms: float
+    argon2_memory_cost: int
+    argon2_time_cost: int
+    argon2_ms: float
+
+
+@dataclass(frozen=True)
+class Calibration:
+    """Cost model of the password hashers measured on this host.
+
+    bcrypt doubles its work with every round, so one measurement fixes the
+    whole curve. Argon2 fills and then passes ``time_cost`` times over
+    ``memory_cost`` KiB, so its time is linear in their product.
+    """
+
+    bcrypt_ms_at_probe: float
+    argon2_ms_per_kib_pass: float
+    measured_at: datetime
+    cpu_count: int
+
+    def bcrypt_ms(self, rounds: int) -> float:
+        return self.bcrypt_ms_at_probe * 2.0 ** (rounds - _BCRYPT_PROBE_ROUNDS)
+
+    def argon2_ms(self, memory_cost: int, time_cost: int) -> float:
+        return self.argon2_ms_per_kib_pass * memory_cost * time_cost
+
+    def recommend(self, target_ms: float, max_memory_cost: int) -> HashParams:
+        """Pick the most expensive parameters whose estimate fits in ``target_ms``.
+
+        bcrypt gets the highest cost factor not exceeding the target. Argon2
+        spends the target on memory first (up to ``max_memory_cost``) and on
+        extra passes only once the memory is capped, since memory is what
+        makes it expensive to attack on GPUs.
+
+        Args:
+            target_ms (float): Per-hash latency target in milliseconds.
+            max_memory_cost (int): Largest Argon2 memory_cost in KiB.
+
+        Returns:
+            HashParams: The parameters and their estimated latency.
+        """
+        rounds = _BCRYPT_PROBE_ROUNDS + math.floor(
+            math.log2(target_ms / self.bcrypt_ms_at_probe)
+        )
+        rounds = min(max(rounds, BCRYPT_MIN_ROUNDS), BCRYPT_MAX_ROUNDS)
+
+        kib_passes = target_ms / self.argon2_ms_per_kib_pass
+        memory_cost = min(int(kib_passes), max_memory_cost)
+        memory_cost = max(memory_cost, ARGON2_MIN_MEMORY_COST)
+        time_cost = min(max(int(kib_passes // memory_cost), 1), ARGON2_MAX_TIME_COST)
+
+        return HashParams(
+            target_ms=target_ms,
+            bcrypt_rounds=rounds,
+            bcrypt_ms=round(self.bcrypt_ms(rounds), 1),
+            argon2_memory_cost=memory_cost,
+            argon2_time_cost=time_cost,
+            argon2_ms=round(self.argon2_ms(memory_cost, time_cost), 1),
+        )
+
+
+def _fastest_ms(func: Callable[[], object], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000
+
+
+def measure(repeat: int) -> Calibration:
+    """Benchmark bcrypt and Argon2 on this host.
+
+    Takes a few hundred milliseconds: one bcrypt hash at cost 10 and one
+    single pass Argon2 hash over 16 MiB, each repeated ``repeat`` times.
+
+    Args:
+        repeat (int): Runs per measurement, the fastest one is kept.
+
+    Returns:
+        Calibration: The measured cost model.
+    """
+    bcrypt_ms = _fastest_ms(
+        lambda: bcrypt_hash(payload=_PROBE_PAYLOAD, rounds=_BCRYPT_PROBE_ROUNDS),
+        repeat,
+    )
+    argon2_ms = _fastest_ms(
+        lambda: argon2hash(
+            payload=_PROBE_PAYLOAD,
+            memory_cost=_ARGON2_PROBE_MEMORY_COST,
+            length=32,
+            time_cost=1,
+        ),
+        repeat,
+    )
+    return Calibration(
+        bcrypt_ms_at_probe=bcrypt_ms,
+        argon2_ms_per_kib_pass=argon2_ms / _ARGON2_PROBE_MEMORY_COST,
+        measured_at=datetime.now(timezone.utc),
+        cpu_count=os.cpu_count() or 1,
+    )
+
+
+class Calibrator:
+    """Holds the cost model of the worker and measures it when needed.
+
+    The model is measured in the application lifespan, lazily on the first
+    request that needs it otherwise, and again on demand. Measurements run
+    in the thread pool, one at a time.
+    """
+
+    def __init__(self, config: CalibrationConfig):
+        self.config = config
+        self.calibration: Calibration | None = None
+        self._lock = asyncio.Lock()
+
+    async def _calibrate(self, force: bool) -> Calibration:
+        async with self._lock:
+            if force or self.calibration is None:
+                self.calibration = await run_in_threadpool(measure, self.config.repeat)
+                logger.info(
+                    "Calibrated password hashers: bcrypt %.1f ms at cost %d, "
+                    "Argon2 %.4f ms per KiB and pass",
+                    self.calibration.bcrypt_ms_at_probe,
+                    _BCRYPT_PROBE_ROUNDS,
+                    self.calibration.argon2_ms_per_kib_pass,
+                )
+            return self.calibration
+
+    def preload(self) -> Calibration:
+        """Measure the cost model in the calling thread, without an event loop.
+
+        Used by the server process before it forks the workers: they share
+        one model instead of benchmarking the same CPUs at the same time.
+        """
+        self.calibration = measure(self.config.repeat)
+        return self.calibration
+
+    async def recalibrate(self) -> Calibration:
+        """Measure the cost model again, replacing the current one."""
+        return await self._calibrate(force=True)
+
+    async def get(self) -> Calibration:
+        """Return the cost model, measuring it first if there is none yet."""
+        if self.calibration is None:
+            return await self._calibrate(force=False)
+        return self.calibration
+
+    async def recommend(self, target_ms: float | None = None) -> HashParams:
+        """Recommended parameters for ``target_ms`` (default from the settings)."""
+        calibration = await self.get()
+        return calibration.recommend(
+            target_ms=target_ms or self.config.target_ms,
+            max_memory_cost=self.config.max_argon2_memory_cost,
+        )
+
+
+calibrator = Calibrator(settings.calibration)
@@ -17,6 +17,11 @@ def parse_cors(v: Any) -> list[str] | str:
     raise ValueError(v)
 
 
+def parse_optional(v: Any) -> Any:
+    # An empty variable, e.g. ``${WORKERS:-}`` in compose, means unset
+    return None if v == "" else v
+
+
 class RunTime(BaseModel):
     host: str = "0.0.0.0"
     port: int = 8000
@@ -24,7 +29,149 @@ class RunTime(BaseModel):
 
 
 class WorkersConfig(BaseModel):
-    workers: int
+    # None derives the count from the CPU quota and memory limit of the
+    # container, see core.resources.default_workers. Empty means None too.
+    workers: Annotated[int | None, BeforeValidator(parse_optional)] = None
+    # Import and warm the app up once, then fork the workers from it
+    preload: bool = True
+    # Worst-case memory of a worker with its engine processes, not counting
+    # the Argon2 budget, used to derive the worker count
+    memory_per_worker_mib: int = 256
+    # Recycle a worker after this many requests, plus a random jitter so
+    # that the workers do not restart together
+    max_requests: int | None = None
+    max_requests_jitter: int = 0
+    # Recycle a worker whose resident memory grows past this (preload only)
+    max_rss_mib: int | None = None
+
+
+class EngineConfig(BaseModel):
+    # Size of the per-worker process pool used for key generation.
+    # None means one process per available CPU.
+    processes: int | None = None
+    max_tasks_per_child: int | None = None
+    start_method: str = "spawn"
+
+
+class KeyPoolConfig(BaseModel):
+    # Pre-generated RSA keys shared by all uvicorn workers over a Unix socket
+    enabled: bool = False
+    address: str = "/tmp/keyforge-keypool.sock"
+    authkey: str | None = None
+    key_sizes: list[int] = [1024, 2048, 4096, 8192]
+    low_watermark: int = 2
+    high_watermark: int = 8
+    generator_processes: int = 1
+    timeout: float = 0.5
+
+
+class KeyCacheConfig(BaseModel):
+    # Public keys derived by /gen-public-key, keyed by a digest of the private key
+    enabled: bool = True
+    max_size: int = 1024
+    ttl: float = 300.0
+
+
+class AdmissionLimit(BaseModel):
+    max_in_flight: int
+    max_queued: int
+
+
+class AdmissionConfig(BaseModel):
+    # Per cost class limits, classes that are not listed are not limited
+    enabled: bool = True
+    limits: dict[str, AdmissionLimit] = {
+        "rsa-1024": AdmissionLimit(max_in_flight=8, max_queued=64),
+        "rsa-2048": AdmissionLimit(max_in_flight=4, max_queued=32),
+        "rsa-4096": AdmissionLimit(max_in_flight=2, max_queued=8),
+        "rsa-8192": AdmissionLimit(max_in_flight=1, max_queued=2),
+        "ed25519": AdmissionLimit(max_in_flight=16, max_queued=256),
+        "public-key": AdmissionLimit(max_in_flight=16, max_queued=256),
+        # Whole bulk key-pair requests, each one keeps the engine busy
+        "key-batch": AdmissionLimit(max_in_flight=1, max_queued=4),
+        "argon2": AdmissionLimit(max_in_flight=4, max_queued=32),
+        "bcrypt": AdmissionLimit(max_in_flight=4, max_queued=32),
+        "argon2-verify": AdmissionLimit(max_in_flight=8, max_queued=64),
+        "bcrypt-verify": AdmissionLimit(max_in_flight=8, max_queued=64),
+        "file-sum": AdmissionLimit(max_in_flight=4, max_queued=16),
+    }
+    # Used for Retry-After until a class has completed a request
+    default_service_time: float = 1.0
+
+
+class Argon2BudgetConfig(BaseModel):
+    # Argon2 memory (KiB) that may be reserved at the same time per worker
+    budget_kib: int = 512 * 1024
+    wait_timeout: float = 10.0
+
+
+class HashingConfig(BaseModel):
+    # Block size of file hashing reads, in bytes
+    block_size: int = 256 * 1024
+    # Largest manifest and largest total size of the files of /file-sum/verify
+    max_manifest_kib: int = 1024
+    max_verify_gib: int = 16
+
+
+class CalibrationConfig(BaseModel):
+    # Benchmark the password hashers when a worker starts
+    on_startup: bool = True
+    # Per-hash latency the recommended parameters aim for, in milliseconds
+    target_ms: float = 250.0
+    # Every measurement keeps the fastest of this many runs
+    repeat: int = 3
+    # Largest Argon2 memory_cost (KiB) recommended for a latency target
+    max_argon2_memory_cost: int = 65536
+
+
+class JobsConfig(BaseModel):
+    # Key generation requests sent with `Prefer: respond-async`
+    enabled: bool = True
+    # Jobs kept at the same time: queued, running and unfetched results
+    max_jobs: int = 1000
+    # Seconds a job is kept after its last state change
+    ttl: float = 300.0
+    # Longest wait of a long-poll or of `Prefer: wait`, in seconds
+    max_wait: float = 30.0
+    # Seconds between SSE keep-alive comments
+    keepalive: float = 15.0
+    # Seconds between two looks at a job run by another worker
+    poll_interval: float = 0.05
+    # Seconds the running jobs get to finish when a worker stops
+    drain_timeout: float = 30.0
+    # With several workers, jobs are kept by a store process shared over a
+    # Unix socket, so any worker can answer for any job
+    shared: bool = True
+    address: str = "/tmp/keyforge-jobs.sock"
+    authkey: str | None = None
+    timeout: float = 0.5
+
+
+class SessionsConfig(BaseModel):
+    # Resumable /file-sum upload sessions, hashed chunk by chunk
+    enabled: bool = True
+    # Sessions open at the same time
+    max_sessions: int = 1000
+    # Seconds a session is kept without a chunk
+    idle_timeout: float = 600.0
+    # Largest chunk of a request and largest file of a session
+    max_chunk_mib: int = 64
+    max_size_gib: int = 64
+    # With several workers, the hash state of the sessions is kept by a
+    # process shared over a Unix socket: any worker can take the next chunk
+    shared: bool = True
+    address: str = "/tmp/keyforge-sessions.sock"
+    authkey: str | None = None
+    timeout: float = 0.5
+
+
+class StartupConfig(BaseModel):
+    # Run the worker warm-up (engine processes, calibration, OTLP exporter)
+    # after the worker starts serving instead of before. /utils/ready
+    # answers 503 until the warm-up is done.
+    background_warm_up: bool = True
+    # Start every compute engine process and load its OpenSSL bindings
+    warm_up_engine: bool = True
 
 
 class OPTLSettings(BaseModel):
@@ -53,6 +200,16 @@ class Settings(BaseSettings):
     )
     runtime: RunTime = RunTime()
     workers: WorkersConfig
+    engine: EngineConfig = EngineConfig()
+    keypool: KeyPoolConfig = KeyPoolConfig()
+    keycache: KeyCacheConfig = KeyCacheConfig()
+    admission: AdmissionConfig = AdmissionConfig()
+    argon2_budget: Argon2BudgetConfig = Argon2BudgetConfig()
+    hashing: HashingConfig = HashingConfig()
+    calibration: CalibrationConfig = CalibrationConfig()
+    startup: StartupConfig = StartupConfig()
+    jobs: JobsConfig = JobsConfig()
+    sessions: SessionsConfig = SessionsConfig()
     prefix: ApiPrefix = ApiPrefix()
     project_name: str
     optl: OPTLSettings
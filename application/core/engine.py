@@ -0,0 +1,170 @@
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Any, Callable, TypeVar
+
+from fastapi import HTTPException, status
+
+from core.config import settings
+from core.metrics import EXECUTOR_TASKS, EXECUTOR_WORKERS
+from core.resources import available_cpus
+from core.stages import record_wait
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class _RemoteHTTPException(Exception):
+    """Picklable carrier for an HTTPException raised inside a pool process."""
+
+    def __init__(self, status_code: int, detail: Any):
+        super().__init__(status_code, detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _invoke(func: Callable[..., T], args: tuple, kwargs: dict) -> tuple[int, T]:
+    # The start time tells the parent how long the task waited for a process
+    started_ns = time.time_ns()
+    try:
+        return started_ns, func(*args, **kwargs)
+    except HTTPException as exc:
+        # fastapi.HTTPException can not be unpickled in the parent process
+        raise _RemoteHTTPException(exc.status_code, exc.detail) from None
+
+
+class ComputeEngine:
+    """Bounded process pool for CPU-bound cryptographic work.
+
+    RSA/Ed25519 key generation and PEM (de)serialization hold the GIL for
+    the whole operation, so running them inside an ``async def`` handler
+    freezes the event loop of the uvicorn worker. The engine moves those
+    calls into a pool of worker processes, leaving the event loop free to
+    serve I/O.
+
+    The pool is created in the application lifespan via :meth:`start` and
+    torn down via :meth:`shutdown`. When the lifespan is not run (e.g. in
+    tests using ``httpx.ASGITransport``) the pool is started lazily on the
+    first :meth:`run` call.
+    """
+
+    def __init__(
+        self,
+        processes: int | None = None,
+        start_method: str = "spawn",
+        max_tasks_per_child: int | None = None,
+    ):
+        """Initialize the engine without starting any processes.
+
+        Args:
+            processes (int | None): Maximum number of pool processes.
+                Defaults to the CPUs available to the container.
+            start_method (str): multiprocessing start method of the pool
+                processes ('spawn', 'forkserver' or 'fork').
+            max_tasks_per_child (int | None): Recycle a pool process after it
+                has completed this many tasks. None disables recycling.
+        """
+        self.processes = processes or available_cpus()
+        self.start_method = start_method
+        self.max_tasks_per_child = max_tasks_per_child
+        self._executor: ProcessPoolExecutor | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._executor is not None
+
+    def start(self) -> ProcessPoolExecutor:
+        """Create the process pool if it does not exist yet.
+
+        Returns:
+            ProcessPoolExecutor: The running executor.
+        """
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.processes,
+                mp_context=multiprocessing.get_context(self.start_method),
+                max_tasks_per_child=self.max_tasks_per_child,
+            )
+            EXECUTOR_WORKERS.labels("engine").set(self.processes)
+            logger.info(
+                "Compute engine started with %d %s processes",
+                self.processes,
+                self.start_method,
+            )
+        return self._executor
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Shut the process pool down, cancelling work that has not started.
+
+        Args:
+            wait (bool): Block until running tasks are finished.
+        """
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+            logger.info("Compute engine stopped")
+
+    async def warm_up(self, func: Callable[[], object]) -> None:
+        """Start every pool process and run ``func`` in it ahead of traffic.
+
+        Spawning a process and importing the application modules in it takes
+        hundreds of milliseconds, which the first requests of a worker would
+        otherwise pay. Submitting one task per process makes the executor
+        start all of them at once.
+
+        Args:
+            func (Callable[[], object]): Picklable initialisation, e.g.
+                loading the OpenSSL bindings.
+        """
+        await asyncio.gather(*(self.run(func) for _ in range(self.processes)))
+
+    async def run(self, func: Callable[..., T], /, *args: Any, **kwargs: Any) -> T:
+        """Run ``func(*args, **kwargs)`` in a pool process and await the result.
+
+        ``func`` and its arguments must be picklable, i.e. module level
+        functions called with plain data. The time the task waited for a
+        free process is recorded as the worker-wait stage of the request.
+
+        Raises:
+            HTTPException: Re-raised from the pool process, or 503 if a pool
+                process died while running the task.
+        """
+        loop = asyncio.get_running_loop()
+        executor = self.start()
+        tasks = EXECUTOR_TASKS.labels("engine")
+        tasks.inc()
+        submitted_ns = time.time_ns()
+        try:
+            started_ns, result = await loop.run_in_executor(
+                executor,
+                partial(_invoke, func, args, kwargs),
+            )
+        except _RemoteHTTPException as exc:
+            raise HTTPException(
+                status_code=exc.status_code,
+                detail=exc.detail,
+            )
+        except BrokenProcessPool:
+            logger.exception("Compute engine process died, restarting the pool")
+            if self._executor is executor:
+                self.shutdown(wait=False)
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Compute engine is restarting, retry later.",
+            )
+        finally:
+            tasks.dec()
+        record_wait(submitted_ns, started_ns)
+        return result
+
+
+engine = ComputeEngine(
+    processes=settings.engine.processes,
+    start_method=settings.engine.start_method,
+    max_tasks_per_child=settings.engine.max_tasks_per_child,
+)
@@ -0,0 +1,134 @@
+import base64
+import os
+import threading
+from enum import Enum
+from typing import Iterator
+
+# Bytes read from the OS per refill
+DEFAULT_POOL_SIZE = 64 * 1024
+# Tokens encoded per streamed chunk of a batch
+TOKENS_PER_CHUNK = 256
+
+
+class TokenEncodingEnum(str, Enum):
+    """Enumeration of the supported token encodings."""
+
+    HEX = "hex"
+    BASE64URL = "base64url"  # Without padding, like secrets.token_urlsafe
+    BASE32 = "base32"  # Without padding
+
+
+def _encode_hex(data: bytes) -> str:
+    return data.hex()
+
+
+def _encode_base64url(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _encode_base32(data: bytes) -> str:
+    return base64.b32encode(data).rstrip(b"=").decode("ascii")
+
+
+_ENCODERS = {
+    TokenEncodingEnum.HEX: _encode_hex,
+    TokenEncodingEnum.BASE64URL: _encode_base64url,
+    TokenEncodingEnum.BASE32: _encode_base32,
+}
+
+
+class EntropyPool:
+    """Per-worker buffer of OS randomness that tokens are sliced from.
+
+    ``secrets.token_*`` does one ``os.urandom`` call per token. The pool
+    reads ``size`` bytes at once (straight into its buffer from
+    ``/dev/urandom`` where available, so no copy of the random bytes is
+    left behind) and hands out slices of it. Every slice is zeroed in the
+    buffer as soon as it has been taken, so a given random byte is only
+    ever handed out once and does not linger in memory after use.
+
+    Batches are streamed from a sync generator, which Starlette runs in
+    worker threads while the event loop keeps taking single tokens: a lock
+    guards the refill and the read-then-advance of the position.
+    """
+
+    def __init__(self, size: int = DEFAULT_POOL_SIZE):
+        """Initialize an empty pool, filled on the first use.
+
+        Args:
+            size (int): Number of bytes read from the OS per refill.
+        """
+        self.size = size
+        self._buffer = bytearray(size)
+        self._view = memoryview(self._buffer)
+        self._zeros = memoryview(bytes(size))
+        self._pos = size
+        self._lock = threading.Lock()
+        try:
+            self._source = open("/dev/urandom", "rb", buffering=0)
+        except OSError:  # pragma: no cover
+            self._source = None
+
+    def _refill(self) -> None:
+        if self._source is not None:
+            read = self._source.readinto(self._buffer)
+            if read != self.size:  # pragma: no cover
+                raise OSError("Short read from /dev/urandom")
+        else:  # pragma: no cover
+            self._buffer[:] = os.urandom(self.size)
+        self._pos = 0
+
+    def take(self, length: int) -> bytes:
+        """Return ``length`` fresh random bytes.
+
+        Requests larger than the pool are read from the OS directly.
+
+        Args:
+            length (int): Number of bytes.
+
+        Returns:
+            bytes: Random bytes that were never handed out before.
+        """
+        if length > self.size:
+            return os.urandom(length)
+        with self._lock:
+            if self._pos + length > self.size:
+                self._refill()
+            start, end = self._pos, self._pos + length
+            self._pos = end
+            data = bytes(self._view[start:end])
+            self._view[start:end] = self._zeros[:length]
+        return data
+
+    def tokens(
+        self,
+        length: int,
+        count: int,
+        encoding: TokenEncodingEnum,
+    ) -> Iterator[list[str]]:
+        """Generate ``count`` tokens of ``length`` random bytes, in chunks.
+
+        Args:
+            length (int): Random bytes per token.
+            count (int): Number of tokens.
+            encoding (TokenEncodingEnum): Text encoding of the tokens.
+
+        Yields:
+            list[str]: Up to TOKENS_PER_CHUNK encoded tokens.
+        """
+        encode = _ENCODERS[encoding]
+        for start in range(0, count, TOKENS_PER_CHUNK):
+            chunk = min(TOKENS_PER_CHUNK, count - start)
+            # One slice (and one wipe) for the whole chunk
+            data = self.take(length * chunk)
+            yield [
+                encode(data[offset : offset + length])
+                for offset in range(0, len(data), length)
+            ]
+
+    def token(self, length: int, encoding: TokenEncodingEnum) -> str:
+        """Return a single token of ``length`` random bytes."""
+        return _ENCODERS[encoding](self.take(length))
+
+
+entropy_pool = EntropyPool()
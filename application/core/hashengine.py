@@ -1,15 +1,42 @@
+import argon2
+import asyncio
 import bcrypt
 import secrets
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
 from random import randint
 
-from fastapi import UploadFile
+from fastapi import HTTPException, UploadFile, status
+from starlette.concurrency import run_in_threadpool
 from pwdlib.hashers.argon2 import Argon2Hasher
 from pwdlib.hashers.bcrypt import BcryptHasher
-from hashlib import sha256, sha384, sha512, md5
+from hashlib import (
+    blake2b,
+    blake2s,
+    md5,
+    sha256,
+    sha384,
+    sha512,
+    sha3_256,
+    sha3_512,
+)
 from enum import Enum
-from typing import TypeVar, Type
+from typing import Any, BinaryIO, Callable, Iterable, TypeVar, Type
+
+from core.metrics import EXECUTOR_TASKS, EXECUTOR_WORKERS
+from core.resources import available_cpus
+from core.stages import record_wait
 
 HASHLIB = TypeVar("HASHLIB", bound=Type[sha256])
+T = TypeVar("T")
+
+# Large enough to amortize per-call overhead, small enough to stay in L2 cache
+DEFAULT_BLOCK_SIZE = 256 * 1024
+
+# Leaf size of the tree hash mode, part of the digest definition
+TREE_LEAF_SIZE = 1024 * 1024
 
 
 class HashLibEnum(str, Enum):
@@ -23,6 +50,21 @@ class HashLibEnum(str, Enum):
     SHA256 = "sha256"
     SHA384 = "sha384"
     MD5 = "md5"
+    BLAKE2B = "blake2b"
+    BLAKE2S = "blake2s"
+    SHA3_256 = "sha3_256"
+    SHA3_512 = "sha3_512"
+
+
+class HashModeEnum(str, Enum):
+    """Enumeration of file hashing modes.
+
+    - sequential: the plain digest of the file, as computed by sha256sum & co.
+    - tree: the root of a Merkle tree over fixed-size leaves, see TreeHash.
+    """
+
+    SEQUENTIAL = "sequential"
+    TREE = "tree"
 
 
 class HashLib:
@@ -37,6 +79,10 @@ class HashLib:
         "sha384": sha384,
         "sha512": sha512,
         "md5": md5,
+        "blake2b": blake2b,
+        "blake2s": blake2s,
+        "sha3_256": sha3_256,
+        "sha3_512": sha3_512,
     }
 
     def __init__(self, algorithm: str):
@@ -44,7 +90,8 @@ class HashLib:
 
         Args:
             algorithm (str): The name of the hashing algorithm to use.
-                Must be one of: 'sha256', 'sha384', 'sha512', or 'md5'.
+                Must be one of the HashLibEnum values, e.g. 'sha256',
+                'sha512', 'md5', 'blake2b' or 'sha3_256'.
 
         Raises:
             ValueError: If the specified algorithm is not supported.
@@ -52,7 +99,7 @@ class HashLib:
         self.hasher: Type[HASHLIB] = self.__algorithms.get(algorithm, None)
         if self.hasher is None:
             raise ValueError(
-                f"Hash algorithm '{self.hasher}' is not supported",
+                f"Hash algorithm '{algorithm}' is not supported",
             )
 
     def hash(self, payload: str) -> str:
@@ -66,23 +113,380 @@ class HashLib:
         """
         return self.hasher(payload.encode()).hexdigest()
 
-    def hash_file(self, file: UploadFile) -> str:
-        """Hash the contents of an uploaded file using the selected algorithm.
+    def hash_file(
+        self,
+        file: UploadFile | BinaryIO,
+        block_size: int = DEFAULT_BLOCK_SIZE,
+    ) -> str:
+        """Hash the contents of a file using the selected algorithm.
 
-        Processes the file in chunks to efficiently handle large files without
-        loading the entire file into memory.
+        The file is read in fixed-size blocks with ``readinto`` into a single
+        reused buffer, so memory stays at ``block_size`` bytes and the number
+        of ``update`` calls does not depend on the content (unlike iterating
+        the file, which splits it on newlines).
 
         Args:
-            file (UploadFile): The FastAPI UploadFile object to be hashed.
+            file (UploadFile | BinaryIO): The FastAPI UploadFile object or the
+                binary file object to be hashed.
+            block_size (int): Size of the blocks read from the file.
 
         Returns:
             str: The hexadecimal digest of the hashed file content.
         """
         hasher = self.hasher()
-        for chunk in file.file:
-            hasher.update(chunk)
+        fileobj = file.file if isinstance(file, UploadFile) else file
+        buffer = bytearray(block_size)
+        view = memoryview(buffer)
+        readinto = getattr(fileobj, "readinto", None)
+        if readinto is None:
+            while chunk := fileobj.read(block_size):
+                hasher.update(chunk)
+            return hasher.hexdigest()
+        while size := readinto(buffer):
+            hasher.update(view[:size])
         return hasher.hexdigest()
 
+    async def ahash_file(
+        self,
+        file: UploadFile | BinaryIO,
+        block_size: int = DEFAULT_BLOCK_SIZE,
+    ) -> str:
+        """Run :meth:`hash_file` in a worker thread.
+
+        hashlib releases the GIL while hashing a block, so the event loop
+        keeps serving requests while the file is hashed.
+        """
+        return await run_in_threadpool(self.hash_file, file, block_size)
+
+
+_digest_executor: ThreadPoolExecutor | None = None
+
+
+def _get_digest_executor() -> ThreadPoolExecutor:
+    global _digest_executor
+    if _digest_executor is None:
+        workers = available_cpus()
+        _digest_executor = ThreadPoolExecutor(
+            max_workers=workers,
+            thread_name_prefix="keyforge-digest",
+        )
+        EXECUTOR_WORKERS.labels("digest").set(workers)
+    return _digest_executor
+
+
+_password_executor: ThreadPoolExecutor | None = None
+
+
+def _get_password_executor() -> ThreadPoolExecutor:
+    global _password_executor
+    if _password_executor is None:
+        workers = available_cpus()
+        _password_executor = ThreadPoolExecutor(
+            max_workers=workers,
+            thread_name_prefix="keyforge-password",
+        )
+        EXECUTOR_WORKERS.labels("password").set(workers)
+    return _password_executor
+
+
+def _timed_call(func: Callable[..., T], kwargs: dict) -> tuple[int, T]:
+    return time.time_ns(), func(**kwargs)
+
+
+async def run_password_task(func: Callable[..., T], /, **kwargs: Any) -> T:
+    """Run a password hashing call on the bounded password executor.
+
+    bcrypt and Argon2 release the GIL, so one thread per CPU keeps every core
+    busy, while requests beyond that wait for a thread instead of
+    oversubscribing the CPU. The time spent waiting for a thread is
+    recorded as the worker-wait stage of the request.
+    """
+    loop = asyncio.get_running_loop()
+    tasks = EXECUTOR_TASKS.labels("password")
+    tasks.inc()
+    submitted_ns = time.time_ns()
+    try:
+        started_ns, result = await loop.run_in_executor(
+            _get_password_executor(),
+            partial(_timed_call, func, kwargs),
+        )
+    finally:
+        tasks.dec()
+    record_wait(submitted_ns, started_ns)
+    return result
+
+
+class MultiHash:
+    """Compute digests of several algorithms in a single pass over the data.
+
+    Incoming data is coalesced into blocks of ``block_size`` bytes and every
+    block is fed to all the hashers. With more than one algorithm the
+    hashers are updated in parallel threads: hashlib releases the GIL while
+    hashing large buffers, so the wall time of a block is the time of the
+    slowest algorithm rather than the sum of all of them.
+
+    Two preallocated block buffers are reused for the whole stream. With
+    :meth:`aupdate` a full block is hashed in a worker thread while the
+    event loop keeps receiving data into the other buffer.
+    """
+
+    def __init__(
+        self,
+        algorithms: Iterable[str],
+        block_size: int = DEFAULT_BLOCK_SIZE,
+    ):
+        """Initialize the hashers.
+
+        Args:
+            algorithms (Iterable[str]): Algorithm names, duplicates are ignored.
+            block_size (int): Size of the blocks fed to the hashers.
+
+        Raises:
+            ValueError: If one of the algorithms is not supported.
+        """
+        self.hashers = {
+            algorithm: HashLib(algorithm=algorithm).hasher()
+            for algorithm in dict.fromkeys(algorithms)
+        }
+        self.block_size = block_size
+        self._buffers: list[memoryview] = []
+        self._current = 0
+        self._filled = 0
+        self._pending: asyncio.Future | None = None
+
+    def _feed(self, data: bytes | bytearray | memoryview) -> None:
+        if len(self.hashers) == 1:
+            for hasher in self.hashers.values():
+                hasher.update(data)
+            return
+        # Wait for every hasher before the buffer can be reused
+        list(
+            _get_digest_executor().map(
+                lambda hasher: hasher.update(data),
+                self.hashers.values(),
+            )
+        )
+
+    def _buffer(self) -> memoryview:
+        while len(self._buffers) <= self._current:
+            self._buffers.append(memoryview(bytearray(self.block_size)))
+        return self._buffers[self._current]
+
+    def _fill(self, data: memoryview) -> memoryview:
+        # Copy as much of data as fits in the current block, return the rest
+        size = min(len(data), self.block_size - self._filled)
+        self._buffer()[self._filled : self._filled + size] = data[:size]
+        self._filled += size
+        return data[size:]
+
+    def _take_block(self) -> memoryview:
+        block = self._buffer()[: self._filled]
+        self._current ^= 1
+        self._filled = 0
+        return block
+
+    def update(self, data: bytes | bytearray | memoryview) -> None:
+        """Feed data to all the hashers."""
+        data = memoryview(data).cast("B")
+        if not self._filled and len(data) >= self.block_size:
+            self._feed(data)
+            return
+        while data:
+            data = self._fill(data)
+            if self._filled == self.block_size:
+                self._feed(self._buffer())
+                self._filled = 0
+
+    async def _afeed(self, block: memoryview) -> None:
+        # Blocks are hashed in order: wait for the previous one first
+        if self._pending is not None:
+            await self._pending
+        self._pending = asyncio.ensure_future(run_in_threadpool(self._feed, block))
+
+    async def aupdate(self, data: bytes | bytearray | memoryview) -> None:
+        """Feed data to all the hashers, hashing full blocks in a worker thread."""
+        data = memoryview(data).cast("B")
+        while data:
+            data = self._fill(data)
+            if self._filled == self.block_size:
+                await self._afeed(self._take_block())
+
+    def flush(self) -> None:
+        """Feed the data buffered in the current block to the hashers."""
+        if self._filled:
+            self._feed(self._buffer()[: self._filled])
+            self._filled = 0
+
+    async def aflush(self) -> None:
+        """Hash the buffered data and wait for the blocks of worker threads."""
+        if self._filled:
+            await self._afeed(self._take_block())
+        if self._pending is not None:
+            await self._pending
+            self._pending = None
+
+    def copy(self) -> "MultiHash":
+        """Return an independent copy of the hash state.
+
+        The hashers are copied with ``hashlib``'s ``copy()``, so the copy can
+        be fed more data while this object keeps its state as a checkpoint.
+        Must be called once flushed, with no block hashed in a worker thread.
+        """
+        if self._filled or self._pending is not None:
+            raise RuntimeError("MultiHash must be flushed before it is copied")
+        clone = MultiHash(algorithms=(), block_size=self.block_size)
+        clone.hashers = {
+            algorithm: hasher.copy() for algorithm, hasher in self.hashers.items()
+        }
+        return clone
+
+    def hexdigests(self) -> dict[str, str]:
+        """Flush pending data and return the hex digest of every algorithm."""
+        self.flush()
+        return {
+            algorithm: hasher.hexdigest() for algorithm, hasher in self.hashers.items()
+        }
+
+    async def ahexdigests(self) -> dict[str, str]:
+        """Wait for the blocks hashed in worker threads, see :meth:`hexdigests`."""
+        await self.aflush()
+        return self.hexdigests()
+
+
+def _hash_leaf(algorithms: list[str], leaf: bytearray) -> dict[str, bytes]:
+    digests = {}
+    for algorithm in algorithms:
+        hasher = HashLib(algorithm=algorithm).hasher(TreeHash.LEAF_PREFIX)
+        hasher.update(leaf)
+        digests[algorithm] = hasher.digest()
+    return digests
+
+
+def _tree_root(algorithm: str, level: list[bytes]) -> bytes:
+    constructor = HashLib(algorithm=algorithm).hasher
+    while len(level) > 1:
+        parents = [
+            constructor(TreeHash.NODE_PREFIX + left + right).digest()
+            for left, right in zip(level[0::2], level[1::2])
+        ]
+        if len(level) % 2:
+            # An odd node is promoted unchanged to the next level
+            parents.append(level[-1])
+        level = parents
+    return level[0]
+
+
+class TreeHash:
+    """Merkle tree hash over fixed-size leaves, computed in parallel.
+
+    The digest is defined as follows, so that clients can reproduce it:
+
+    1. The data is split into leaves of ``leaf_size`` bytes (1 MiB by
+       default); the last leaf may be shorter. Empty data is a single empty
+       leaf.
+    2. Every leaf is hashed as ``H(0x00 || leaf)``.
+    3. Adjacent digests are combined pairwise, left to right, as
+       ``H(0x01 || left || right)``. A level with an odd number of digests
+       promotes its last digest unchanged to the next level.
+    4. The single remaining digest is the root, returned hex-encoded.
+
+    The 0x00/0x01 prefixes separate leaves from internal nodes (as in
+    RFC 6962), so a leaf can not be confused with a node.
+
+    Leaves are hashed on a thread pool while data keeps coming in (hashlib
+    releases the GIL), so the latency of large files scales with the number
+    of cores. At most two leaves per thread are held in memory.
+    """
+
+    LEAF_PREFIX = b"\x00"
+    NODE_PREFIX = b"\x01"
+
+    def __init__(
+        self,
+        algorithms: Iterable[str],
+        leaf_size: int = TREE_LEAF_SIZE,
+    ):
+        """Initialize an empty tree.
+
+        Args:
+            algorithms (Iterable[str]): Algorithm names, duplicates are ignored.
+            leaf_size (int): Size of the leaves in bytes.
+
+        Raises:
+            ValueError: If one of the algorithms is not supported.
+        """
+        self.algorithms = list(dict.fromkeys(algorithms))
+        for algorithm in self.algorithms:
+            # Raises ValueError for unsupported algorithms
+            HashLib(algorithm=algorithm)
+        self.leaf_size = leaf_size
+        self._leaf = bytearray()
+        self._leaves = 0
+        self._running: deque[Future] = deque()
+        self._digests: list[dict[str, bytes]] = []
+        self._max_running = 2 * available_cpus()
+
+    def _fill(self, data: memoryview) -> memoryview:
+        size = min(len(data), self.leaf_size - len(self._leaf))
+        self._leaf += data[:size]
+        return data[size:]
+
+    def _submit_leaf(self) -> None:
+        leaf, self._leaf = self._leaf, bytearray()
+        self._leaves += 1
+        tasks = EXECUTOR_TASKS.labels("digest")
+        tasks.inc()
+        future = _get_digest_executor().submit(_hash_leaf, self.algorithms, leaf)
+        future.add_done_callback(lambda _: tasks.dec())
+        self._running.append(future)
+
+    def update(self, data: bytes | bytearray | memoryview) -> None:
+        """Feed data to the tree, blocking while too many leaves are in flight."""
+        data = memoryview(data).cast("B")
+        while data:
+            data = self._fill(data)
+            if len(self._leaf) == self.leaf_size:
+                self._submit_leaf()
+                while len(self._running) > self._max_running:
+                    self._digests.append(self._running.popleft().result())
+
+    async def aupdate(self, data: bytes | bytearray | memoryview) -> None:
+        """Feed data to the tree, awaiting while too many leaves are in flight."""
+        data = memoryview(data).cast("B")
+        while data:
+            data = self._fill(data)
+            if len(self._leaf) == self.leaf_size:
+                self._submit_leaf()
+                while len(self._running) > self._max_running:
+                    self._digests.append(
+                        await asyncio.wrap_future(self._running.popleft())
+                    )
+
+    def _roots(self) -> dict[str, str]:
+        return {
+            algorithm: _tree_root(
+                algorithm,
+                [digests[algorithm] for digests in self._digests],
+            ).hex()
+            for algorithm in self.algorithms
+        }
+
+    def hexdigests(self) -> dict[str, str]:
+        """Hash the last leaf and return the hex root of every algorithm."""
+        if self._leaf or not self._leaves:
+            self._submit_leaf()
+        while self._running:
+            self._digests.append(self._running.popleft().result())
+        return self._roots()
+
+    async def ahexdigests(self) -> dict[str, str]:
+        """Hash the last leaf and return the hex root of every algorithm."""
+        if self._leaf or not self._leaves:
+            self._submit_leaf()
+        while self._running:
+            self._digests.append(await asyncio.wrap_future(self._running.popleft()))
+        return self._roots()
+
 
 def rand_integer() -> int:
     """Generate a random integer between 32 and 128 (inclusive).
@@ -107,8 +511,7 @@ def bcrypt_hash(
     Args:
         payload (str | None): The string to hash, or None to use a random token.
         rounds (int): The cost factor (work factor) for the bcrypt algorithm,
-            typically between 8 and 32. Higher values increase security but
-            also increase computation time.
+            between 4 and 31. Every extra round doubles the computation time.
 
     Returns:
         str: The bcrypt hash string in the format:
@@ -117,9 +520,9 @@ def bcrypt_hash(
     if payload is None:
         payload = secrets.token_bytes(rand_integer())
     password_hasher = BcryptHasher(rounds=rounds)
+    # The salt encodes the cost factor, let the hasher generate it from rounds
     return password_hasher.hash(
         password=payload,
-        salt=bcrypt.gensalt(),
     )
 
 
@@ -127,6 +530,7 @@ def argon2hash(
     payload: str | None,
     memory_cost: int,
     length: int,
+    time_cost: int = 3,
 ) -> str:
     """Create an Argon2 hash from a payload with specified parameters.
 
@@ -137,6 +541,7 @@ def argon2hash(
         memory_cost (int): The amount of memory to use in kibibytes (KiB).
             Higher values increase resistance to GPU attacks but require more resources.
         length (int): The length of the hash output in bytes, typically between 8 and 32.
+        time_cost (int): The number of passes over the memory.
 
     Returns:
         str: The Argon2 hash string in the format:
@@ -147,8 +552,108 @@ def argon2hash(
     password_hasher = Argon2Hasher(
         hash_len=length,
         memory_cost=memory_cost,
+        time_cost=time_cost,
     )
     return password_hasher.hash(
         password=payload,
         salt=bcrypt.gensalt(),
     )
+
+
+def argon2_parameters(hashed: str) -> argon2.Parameters:
+    """Parse the parameters encoded in an Argon2 hash string.
+
+    Args:
+        hashed (str): The hash, e.g. "$argon2id$v=19$m=65536,t=3,p=4$...".
+
+    Returns:
+        argon2.Parameters: The type, version, memory_cost, time_cost, ...
+
+    Raises:
+        HTTPException (422): If the string is not an Argon2id hash.
+    """
+    try:
+        parameters = argon2.extract_parameters(hashed)
+    except argon2.exceptions.InvalidHashError:
+        parameters = None
+    if parameters is None or parameters.type is not argon2.Type.ID:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Hash is not a valid argon2id hash.",
+        )
+    return parameters
+
+
+def bcrypt_rounds(hashed: str) -> int:
+    """Return the cost factor encoded in a bcrypt hash string.
+
+    Args:
+        hashed (str): The hash, e.g. "$2b$12$...".
+
+    Returns:
+        int: The cost factor.
+
+    Raises:
+        HTTPException (422): If the string is not a bcrypt hash.
+    """
+    if not BcryptHasher.identify(hashed):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Hash is not a valid bcrypt hash.",
+        )
+    return int(hashed.split("$")[2])
+
+
+def argon2_verify(
+    payload: str,
+    hashed: str,
+    memory_cost: int,
+    time_cost: int,
+) -> tuple[bool, bool]:
+    """Verify a payload against an Argon2 hash.
+
+    Args:
+        payload (str): The string to verify (e.g., a password).
+        hashed (str): The Argon2id hash to verify against.
+        memory_cost (int): Current memory_cost in KiB.
+        time_cost (int): Current time_cost.
+
+    Returns:
+        tuple[bool, bool]: Whether the payload matches, and whether the hash
+            was created with other costs than the current ones and should
+            be replaced by a new hash on the next successful login.
+    """
+    valid = Argon2Hasher().verify(password=payload, hash=hashed)
+    parameters = argon2.extract_parameters(hashed)
+    needs_rehash = (
+        parameters.memory_cost != memory_cost
+        or parameters.time_cost != time_cost
+        or parameters.version != argon2.low_level.ARGON2_VERSION
+    )
+    return valid, valid and needs_rehash
+
+
+def bcrypt_verify(
+    payload: str,
+    hashed: str,
+    rounds: int,
+) -> tuple[bool, bool]:
+    """Verify a payload against a bcrypt hash.
+
+    Args:
+        payload (str): The string to verify (e.g., a password).
+        hashed (str): The bcrypt hash to verify against.
+        rounds (int): Current cost factor.
+
+    Returns:
+        tuple[bool, bool]: Whether the payload matches, and whether the hash
+            was created with another cost factor than the current one and
+            should be replaced by a new hash on the next successful login.
+    """
+    password_hasher = BcryptHasher(rounds=rounds)
+    try:
+        valid = password_hasher.verify(password=payload, hash=hashed)
+    except ValueError:
+        # Well-formed prefix but corrupted salt
+        return False, False
+    return valid, valid and password_hasher.check_needs_rehash(hashed)
@@ -0,0 +1,569 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import re
+import secrets
+import signal
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from enum import Enum
+from multiprocessing.connection import Client, Listener
+from multiprocessing.context import AuthenticationError
+from typing import AsyncIterator, Awaitable, Callable
+
+import orjson
+from fastapi import HTTPException, Response, status
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.registry import REGISTRY
+from starlette.concurrency import run_in_threadpool
+
+from core.config import JobsConfig, settings
+from core.metrics import JOBS_FINISHED, JOBS_SUBMITTED
+
+logger = logging.getLogger(__name__)
+
+# Errors of a store shared over the Unix socket
+_STORE_ERRORS = (OSError, EOFError, AuthenticationError, TimeoutError)
+
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+FINISHED = (JobStatus.SUCCEEDED.value, JobStatus.FAILED.value)
+
+
+@dataclass
+class _Job:
+    job_id: str
+    kind: str
+    status: str
+    created_at: float
+    updated_at: float
+    status_code: int | None = None
+    body: bytearray | None = None
+
+    def info(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "status": self.status,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+
+
+class JobStore:
+    """Bounded in-memory table of asynchronous jobs and their results.
+
+    A job is kept ``ttl`` seconds after its last state change: results
+    that are never fetched and jobs of a worker that died go away on their
+    own. A result is removed as soon as it is fetched, and its buffer is
+    overwritten with zeros first. This is best effort: the private key also
+    went through Python strings on its way here, which are released but
+    can not be wiped.
+
+    The store does no I/O and is thread-safe. It lives in the worker, or in
+    the shared store process when there are several workers (see
+    :class:`JobStoreServer`).
+    """
+
+    def __init__(self, max_jobs: int, ttl: float):
+        self.max_jobs = max_jobs
+        self.ttl = ttl
+        self._jobs: dict[str, _Job] = {}
+        # Job ids in expiry order: the TTL is the same for every job
+        self._expiry: OrderedDict[str, float] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _touch(self, job: _Job, now: float) -> None:
+        job.updated_at = time.time()
+        self._expiry[job.job_id] = now + self.ttl
+        self._expiry.move_to_end(job.job_id)
+
+    def _evict(self, job_id: str) -> None:
+        job = self._jobs.pop(job_id, None)
+        self._expiry.pop(job_id, None)
+        if job is not None and job.body is not None:
+            job.body[:] = bytes(len(job.body))
+
+    def _purge(self, now: float) -> None:
+        while self._expiry:
+            job_id, expires_at = next(iter(self._expiry.items()))
+            if expires_at > now:
+                return
+            self._evict(job_id)
+
+    def create(self, job_id: str, kind: str) -> dict | None:
+        """Add a queued job, or return None if the store is full."""
+        now = time.monotonic()
+        with self._lock:
+            self._purge(now)
+            if len(self._jobs) >= self.max_jobs:
+                return None
+            created_at = time.time()
+            job = _Job(job_id, kind, JobStatus.QUEUED.value, created_at, created_at)
+            self._jobs[job_id] = job
+            self._touch(job, now)
+            return job.info()
+
+    def start(self, job_id: str) -> None:
+        """Mark a job as running."""
+        now = time.monotonic()
+        with self._lock:
+            self._purge(now)
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.status = JobStatus.RUNNING.value
+                self._touch(job, now)
+
+    def finish(self, job_id: str, status_code: int, body: bytes) -> bool:
+        """Store the response of a job.
+
+        Returns:
+            bool: False if the job was deleted or expired in the meantime.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._purge(now)
+            job = self._jobs.get(job_id)
+            if job is None:
+                return False
+            job.status = (
+                JobStatus.SUCCEEDED.value
+                if status_code < 400
+                else JobStatus.FAILED.value
+            )
+            job.status_code = status_code
+            job.body = bytearray(body)
+            self._touch(job, now)
+            return True
+
+    def info(self, job_id: str) -> dict | None:
+        """State of a job, without its result, or None if it is unknown."""
+        with self._lock:
+            self._purge(time.monotonic())
+            job = self._jobs.get(job_id)
+            return None if job is None else job.info()
+
+    def take(self, job_id: str) -> dict | None:
+        """State of a job, with its result and removed if it is finished.
+
+        Returns:
+            dict | None: The state of the job plus ``status_code`` and
+                ``body`` (the encoded JSON response) once it is finished,
+                None if the job is unknown.
+        """
+        with self._lock:
+            self._purge(time.monotonic())
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            info = job.info()
+            if job.body is not None:
+                info["status_code"] = job.status_code
+                info["body"] = bytes(job.body)
+                self._evict(job_id)
+            return info
+
+    def delete(self, job_id: str) -> bool:
+        """Remove a job and wipe its result. False if it was unknown."""
+        with self._lock:
+            found = job_id in self._jobs
+            self._evict(job_id)
+            return found
+
+    def stats(self) -> dict[str, int]:
+        """Number of jobs per status."""
+        with self._lock:
+            self._purge(time.monotonic())
+            counts = dict.fromkeys((s.value for s in JobStatus), 0)
+            for job in self._jobs.values():
+                counts[job.status] += 1
+            return counts
+
+
+class JobStoreServer:
+    """Job store shared by all uvicorn workers over a Unix socket.
+
+    Workers run the jobs they accepted and report their state here, so any
+    worker can answer a poll for any job of the replica. The protocol is
+    the one of the key pool: one short-lived authenticated connection per
+    call.
+    """
+
+    COMMANDS = ("create", "start", "finish", "info", "take", "delete", "stats")
+
+    def __init__(self, config: JobsConfig):
+        self.config = config
+        self.store = JobStore(config.max_jobs, config.ttl)
+
+    def handle(self, conn) -> None:
+        with conn:
+            try:
+                command, *args = conn.recv()
+                if command in self.COMMANDS:
+                    conn.send(getattr(self.store, command)(*args))
+            except (EOFError, OSError, ValueError):
+                pass
+
+    def serve_forever(self) -> None:
+        if os.path.exists(self.config.address):
+            os.unlink(self.config.address)
+        listener = Listener(
+            address=self.config.address,
+            family="AF_UNIX",
+            authkey=self.config.authkey.encode(),
+        )
+        os.chmod(self.config.address, 0o600)
+        logger.info("Job store serving on %s", self.config.address)
+        with listener:
+            while True:
+                try:
+                    conn = listener.accept()
+                except (AuthenticationError, OSError, EOFError):
+                    continue
+                threading.Thread(
+                    target=self.handle,
+                    args=(conn,),
+                    daemon=True,
+                ).start()
+
+
+def _serve(config: JobsConfig) -> None:
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    JobStoreServer(config).serve_forever()
+
+
+def start_job_store(config: JobsConfig) -> multiprocessing.Process:
+    """Start the shared job store in a background process.
+
+    Must be called before the uvicorn workers are started: if no
+    authentication key is configured, a random one is generated and
+    exported to the environment so that the workers inherit it.
+
+    Args:
+        config (JobsConfig): Job settings.
+
+    Returns:
+        multiprocessing.Process: The running, daemonic, store process.
+    """
+    if config.authkey is None:
+        config.authkey = os.urandom(16).hex()
+        os.environ["APP_CONFIG__JOBS__AUTHKEY"] = config.authkey
+    process = multiprocessing.get_context("spawn").Process(
+        target=_serve,
+        args=(config,),
+        name="keyforge-jobs",
+        daemon=True,
+    )
+    process.start()
+    return process
+
+
+_PREFER = re.compile(r"\s*([\w-]+)\s*(?:=\s*\"?([^\",;]*)\"?)?")
+
+
+def parse_prefer(header: str | None) -> tuple[bool, float]:
+    """Parse the ``respond-async`` and ``wait`` preferences of RFC 7240.
+
+    Args:
+        header (str | None): Value of the Prefer request header.
+
+    Returns:
+        tuple[bool, float]: Whether the client asked for an asynchronous
+            response (never when jobs are disabled), and how many seconds
+            it is willing to wait for the result before getting one (0 if
+            not given).
+    """
+    respond_async, wait = False, 0.0
+    for preference in (header or "").split(","):
+        match = _PREFER.match(preference)
+        if match is None:
+            continue
+        name, value = match.group(1).lower(), match.group(2)
+        if name == "respond-async":
+            respond_async = True
+        elif name == "wait" and value:
+            try:
+                wait = max(float(value), 0.0)
+            except ValueError:
+                pass
+    return respond_async and settings.jobs.enabled, wait
+
+
+class JobManager:
+    """Worker side of the asynchronous jobs.
+
+    :meth:`submit` records a job in the store and runs it as a task of the
+    event loop; the work itself still goes through the admission control
+    and the compute engine like a synchronous request. The response the
+    request would have returned becomes the result of the job.
+
+    Without a shared store (single worker, tests) the jobs are kept by a
+    :class:`JobStore` of the worker. Waiting for a job run by this worker
+    awaits its task; waiting for a job of another worker polls the store.
+    """
+
+    def __init__(self, config: JobsConfig):
+        self.config = config
+        self.local = JobStore(config.max_jobs, config.ttl)
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._accepting = True
+
+    @property
+    def shared(self) -> bool:
+        return self.config.shared and self.config.authkey is not None
+
+    def _request(self, *message):
+        with Client(
+            self.config.address,
+            family="AF_UNIX",
+            authkey=self.config.authkey.encode(),
+        ) as conn:
+            conn.send(message)
+            if not conn.poll(self.config.timeout):
+                raise TimeoutError("Job store did not answer in time")
+            return conn.recv()
+
+    async def _call(self, command: str, *args):
+        if not self.shared:
+            return getattr(self.local, command)(*args)
+        try:
+            return await run_in_threadpool(self._request, command, *args)
+        except _STORE_ERRORS as exc:
+            logger.warning("Job store is unavailable: %s", exc)
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Job store is unavailable, retry later.",
+                headers={"Retry-After": "1"},
+            )
+
+    async def submit(self, kind: str, work: Callable[[], Awaitable[Response]]) -> dict:
+        """Record a job and start running ``work`` in the background.
+
+        Args:
+            kind (str): Endpoint name of the job, e.g. 'genrsa-private-key'.
+            work (Callable[[], Awaitable[Response]]): Produces the response
+                of the synchronous request.
+
+        Returns:
+            dict: The state of the queued job.
+
+        Raises:
+            HTTPException (503): If the store is full or the worker stops.
+        """
+        job_id = f"{settings.optl.service_name}.{secrets.token_urlsafe(16)}"
+        info = await self._call("create", job_id, kind) if self._accepting else None
+        if info is None:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many jobs, retry later.",
+                headers={"Retry-After": "1"},
+            )
+        JOBS_SUBMITTED.labels(kind).inc()
+        task = asyncio.create_task(self._run(job_id, kind, work))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+        return info
+
+    async def _run(
+        self,
+        job_id: str,
+        kind: str,
+        work: Callable[[], Awaitable[Response]],
+    ) -> None:
+        try:
+            await self._call("start", job_id)
+            response = await work()
+            status_code, body = response.status_code, response.body
+        except HTTPException as exc:
+            status_code = exc.status_code
+            body = orjson.dumps({"detail": exc.detail})
+        except Exception:
+            logger.exception("Job %s failed", job_id)
+            status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+            body = orjson.dumps({"detail": "Internal Server Error"})
+        JOBS_FINISHED.labels(
+            kind=kind,
+            outcome="succeeded" if status_code < 400 else "failed",
+        ).inc()
+        try:
+            await self._call("finish", job_id, status_code, body)
+        except HTTPException:
+            logger.error("Result of job %s is lost", job_id)
+
+    async def info(self, job_id: str) -> dict | None:
+        """State of a job, or None if it is unknown, expired or fetched."""
+        return await self._call("info", job_id)
+
+    async def take(self, job_id: str) -> dict | None:
+        """State of a job, with its result (fetched once) if it is finished."""
+        return await self._call("take", job_id)
+
+    async def delete(self, job_id: str) -> bool:
+        """Forget a job. A job run by this worker is cancelled."""
+        task = self._tasks.get(job_id)
+        if task is not None:
+            task.cancel()
+        return await self._call("delete", job_id)
+
+    def stats(self) -> dict[str, int]:
+        """Number of jobs per status, blocking on the shared store."""
+        if self.shared:
+            return self._request("stats")
+        return self.local.stats()
+
+    async def _pause(self, job_id: str, timeout: float) -> None:
+        # Wakes up as soon as a job of this worker is done
+        task = self._tasks.get(job_id)
+        if task is None:
+            await asyncio.sleep(min(self.config.poll_interval, timeout))
+        else:
+            await asyncio.wait({task}, timeout=timeout)
+
+    async def wait(self, job_id: str, timeout: float) -> dict | None:
+        """Wait up to ``timeout`` seconds for a job to finish.
+
+        Returns:
+            dict | None: The latest state of the job.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + min(timeout, self.config.max_wait)
+        while True:
+            info = await self.info(job_id)
+            remaining = deadline - loop.time()
+            if info is None or info["status"] in FINISHED or remaining <= 0:
+                return info
+            await self._pause(job_id, remaining)
+
+    async def events(self, job_id: str) -> AsyncIterator[bytes]:
+        """Server-sent events of a job: its states, then its result.
+
+        A ``status`` event is sent on every state change and a ``result``
+        event, ``{"status_code": int, "result": <response body>}``, once the
+        job is finished, which ends the stream and removes the result.
+        Comments keep the connection alive in between.
+        """
+        loop = asyncio.get_running_loop()
+        last_status, last_sent = None, loop.time()
+        while True:
+            info = await self.take(job_id)
+            if info is None:
+                yield _event("error", orjson.dumps({"detail": "Job not found."}))
+                return
+            body = info.pop("body", None)
+            status_code = info.pop("status_code", None)
+            if info["status"] != last_status:
+                last_status, last_sent = info["status"], loop.time()
+                yield _event("status", orjson.dumps(info))
+            if body is not None:
+                yield _event(
+                    "result",
+                    b'{"status_code":%d,"result":%s}' % (status_code, body),
+                )
+                return
+            if loop.time() - last_sent >= self.config.keepalive:
+                last_sent = loop.time()
+                yield b": keep-alive\n\n"
+            await self._pause(job_id, self.config.poll_interval)
+
+    async def drain(self, timeout: float) -> None:
+        """Stop accepting jobs and give the running ones ``timeout`` seconds."""
+        self._accepting = False
+        tasks = list(self._tasks.values())
+        if not tasks:
+            return
+        logger.info("Waiting for %d jobs to finish", len(tasks))
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+
+
+def _event(name: str, data: bytes) -> bytes:
+    return b"event: %s\ndata: %s\n\n" % (name.encode(), data)
+
+
+def accepted_response(info: dict) -> Response:
+    """202 response pointing at the job, as for a pending poll."""
+    return Response(
+        content=orjson.dumps(info),
+        status_code=status.HTTP_202_ACCEPTED,
+        media_type="application/json",
+        headers={
+            "Location": f"{settings.prefix.api}/jobs/{info['job_id']}",
+            "Retry-After": "1",
+        },
+    )
+
+
+async def respond_async(
+    kind: str,
+    work: Callable[[], Awaitable[Response]],
+    wait: float,
+) -> Response:
+    """Run ``work`` as a job and answer 202, or its result if ready in ``wait``.
+
+    Args:
+        kind (str): Endpoint name of the job.
+        work (Callable[[], Awaitable[Response]]): Produces the response of
+            the synchronous request.
+        wait (float): Seconds the client is willing to wait (Prefer: wait).
+
+    Returns:
+        Response: The result of the job if it finished in time, else 202
+            with the state of the job and its Location.
+    """
+    info = await jobs.submit(kind, work)
+    if wait > 0:
+        await jobs.wait(info["job_id"], wait)
+        job = await jobs.take(info["job_id"])
+        if job is not None:
+            if "body" in job:
+                return Response(
+                    content=job["body"],
+                    status_code=job["status_code"],
+                    media_type="application/json",
+                )
+            info = job
+    response = accepted_response(info)
+    response.headers["Preference-Applied"] = "respond-async"
+    return response
+
+
+class JobsCollector:
+    """Prometheus collector reporting the jobs per status on scrape."""
+
+    def __init__(self, manager: JobManager):
+        self.manager = manager
+
+    def describe(self):
+        # Do not query the store at registration time
+        return []
+
+    def collect(self):
+        try:
+            counts = self.manager.stats()
+        except _STORE_ERRORS:
+            return
+        jobs_gauge = GaugeMetricFamily(
+            "keyforge_jobs",
+            "Asynchronous jobs in the job store, per status",
+            labels=["status"],
+        )
+        for job_status, count in counts.items():
+            jobs_gauge.add_metric([job_status], count)
+        yield jobs_gauge
+
+
+jobs = JobManager(settings.jobs)
+
+if settings.jobs.enabled:
+    REGISTRY.register(JobsCollector(jobs))
@@ -0,0 +1,93 @@
+import hashlib
+import hmac
+import secrets
+import time
+from collections import OrderedDict
+
+from core.config import KeyCacheConfig, settings
+from core.metrics import KEYCACHE_EVICTIONS, KEYCACHE_REQUESTS, KEYCACHE_SIZE
+
+
+class PublicKeyCache:
+    """Bounded TTL/LRU cache of public keys derived from private keys.
+
+    Loading a private key runs the PKCS#8 KDF of encrypted keys and the
+    key validation, which costs tens of milliseconds, while clients tend to
+    derive the public key of the same few private keys again and again.
+
+    Entries are keyed by an HMAC of the private key PEM and its password,
+    computed with a random key drawn again by every worker (see
+    :meth:`reset`, called from the lifespan), and hold
+    only the public PEM. Neither the private key nor its password is kept
+    in memory, and the digest can not be brute-forced offline.
+
+    The least recently used entry is evicted when the cache is full, and
+    entries older than ``ttl`` seconds are dropped when looked up.
+    """
+
+    def __init__(self, config: KeyCacheConfig):
+        """Initialize an empty cache.
+
+        Args:
+            config (KeyCacheConfig): Size, TTL and whether the cache is used.
+        """
+        self.enabled = config.enabled and config.max_size > 0
+        self.max_size = config.max_size
+        self.ttl = config.ttl
+        self._secret = secrets.token_bytes(32)
+        self._entries: OrderedDict[bytes, tuple[float, str]] = OrderedDict()
+
+    def key(self, pem: str, password: str | None) -> bytes:
+        """Keyed digest of a private key and its password."""
+        pem_bytes = pem.encode("utf-8")
+        digest = hmac.new(self._secret, digestmod=hashlib.sha256)
+        # Length prefix, so that no (pem, password) pair can collide with another
+        digest.update(len(pem_bytes).to_bytes(8, "big"))
+        digest.update(pem_bytes)
+        digest.update((password or "").encode("utf-8"))
+        return digest.digest()
+
+    def get(self, key: bytes) -> str | None:
+        """Return the cached public key PEM, or None on a miss."""
+        if not self.enabled:
+            return None
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] < time.monotonic():
+            del self._entries[key]
+            KEYCACHE_EVICTIONS.labels(reason="expired").inc()
+            KEYCACHE_SIZE.set(len(self._entries))
+            entry = None
+        if entry is None:
+            KEYCACHE_REQUESTS.labels(result="miss").inc()
+            return None
+        self._entries.move_to_end(key)
+        KEYCACHE_REQUESTS.labels(result="hit").inc()
+        return entry[1]
+
+    def put(self, key: bytes, public_pem: str) -> None:
+        """Store a derived public key PEM, evicting the oldest entry if full."""
+        if not self.enabled:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, public_pem)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            KEYCACHE_EVICTIONS.labels(reason="size").inc()
+        KEYCACHE_SIZE.set(len(self._entries))
+
+    def clear(self) -> None:
+        self._entries.clear()
+        KEYCACHE_SIZE.set(0)
+
+    def reset(self) -> None:
+        """Draw a new HMAC key and drop the entries.
+
+        The cache is created when the application is imported, which with
+        preloading happens once in the server process: every forked worker
+        would otherwise share the same key.
+        """
+        self._secret = secrets.token_bytes(32)
+        self.clear()
+
+
+public_key_cache = PublicKeyCache(settings.keycache)
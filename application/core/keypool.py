@@ -0,0 +1,302 @@
+import logging
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from multiprocessing.connection import Client, Listener
+from multiprocessing.context import AuthenticationError
+
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import REGISTRY
+from starlette.concurrency import run_in_threadpool
+
+from core.config import KeyPoolConfig, settings
+from core.keysengine import gen_rsa_private_key_pem
+from core.metrics import KEYPOOL_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+
+class KeyPoolServer:
+    """Pre-generated RSA key pool shared by all uvicorn workers.
+
+    Runs in its own process and keeps, for every configured key size, a
+    queue of unencrypted PKCS#8 PEM keys between the low and the high
+    watermark. A size whose fill level drops to the low watermark is
+    refilled up to the high watermark by a process pool, so serving
+    connections never waits for prime generation.
+
+    Workers talk to the server through a Unix socket protected by an
+    authentication key (see :class:`KeyPoolClient`).
+    """
+
+    def __init__(self, config: KeyPoolConfig):
+        self.config = config
+        self.pools: dict[int, deque[str]] = {
+            size: deque() for size in config.key_sizes
+        }
+        self.hits = dict.fromkeys(config.key_sizes, 0)
+        self.misses = dict.fromkeys(config.key_sizes, 0)
+        self._refilling: set[int] = set()
+        self._pending = dict.fromkeys(config.key_sizes, 0)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._executor = ProcessPoolExecutor(
+            max_workers=config.generator_processes,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+    def pop(self, key_size: int) -> str | None:
+        """Take a key from the pool, or None if the pool for this size is empty."""
+        with self._lock:
+            pool = self.pools.get(key_size)
+            if not pool:
+                if pool is not None:
+                    self.misses[key_size] += 1
+                    self._wakeup.set()
+                return None
+            self.hits[key_size] += 1
+            if len(pool) - 1 <= self.config.low_watermark:
+                self._wakeup.set()
+            return pool.popleft()
+
+    def stats(self) -> dict[int, dict[str, int]]:
+        with self._lock:
+            return {
+                size: {
+                    "fill": len(pool),
+                    "hits": self.hits[size],
+                    "misses": self.misses[size],
+                }
+                for size, pool in self.pools.items()
+            }
+
+    def _next_size(self) -> int | None:
+        # Hysteresis between the watermarks; smallest relative fill first
+        with self._lock:
+            if self._closed:
+                return None
+            for size, pool in self.pools.items():
+                fill = len(pool) + self._pending[size]
+                if fill <= self.config.low_watermark:
+                    self._refilling.add(size)
+                elif fill >= self.config.high_watermark:
+                    self._refilling.discard(size)
+            candidates = [
+                size
+                for size in self._refilling
+                if len(self.pools[size]) + self._pending[size]
+                < self.config.high_watermark
+            ]
+            if not candidates:
+                return None
+            size = min(
+                candidates,
+                key=lambda s: (len(self.pools[s]) + self._pending[s], s),
+            )
+            self._pending[size] += 1
+            return size
+
+    def refill_forever(self) -> None:
+        running: dict[Future, int] = {}
+        while not self._closed:
+            while len(running) < self.config.generator_processes:
+                size = self._next_size()
+                if size is None:
+                    break
+                try:
+                    future = self._executor.submit(
+                        gen_rsa_private_key_pem,
+                        password=None,
+                        key_size=size,
+                    )
+                except RuntimeError:
+                    # Executor was shut down by close()
+                    return
+                running[future] = size
+            if not running:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                size = running.pop(future)
+                with self._lock:
+                    self._pending[size] -= 1
+                    if future.exception() is None:
+                        self.pools[size].append(future.result())
+                if future.exception() is not None:
+                    logger.error(
+                        "Key pool generation failed",
+                        exc_info=future.exception(),
+                    )
+
+    def handle(self, conn) -> None:
+        with conn:
+            try:
+                command, *args = conn.recv()
+                if command == "pop":
+                    conn.send(self.pop(args[0]))
+                elif command == "stats":
+                    conn.send(self.stats())
+            except (EOFError, OSError, ValueError):
+                pass
+
+    def serve_forever(self) -> None:
+        if os.path.exists(self.config.address):
+            os.unlink(self.config.address)
+        listener = Listener(
+            address=self.config.address,
+            family="AF_UNIX",
+            authkey=self.config.authkey.encode(),
+        )
+        os.chmod(self.config.address, 0o600)
+        threading.Thread(target=self.refill_forever, daemon=True).start()
+        logger.info("Key pool serving on %s", self.config.address)
+        try:
+            with listener:
+                while True:
+                    try:
+                        conn = listener.accept()
+                    except (AuthenticationError, OSError, EOFError):
+                        continue
+                    threading.Thread(
+                        target=self.handle,
+                        args=(conn,),
+                        daemon=True,
+                    ).start()
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        """Stop refilling and shut the generator processes down."""
+        with self._lock:
+            self._closed = True
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._wakeup.set()
+
+
+def _serve(config: KeyPoolConfig) -> None:
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    KeyPoolServer(config).serve_forever()
+
+
+def start_key_pool(config: KeyPoolConfig) -> multiprocessing.Process:
+    """Start the key pool server in a background process.
+
+    Must be called before the uvicorn workers are started: if no
+    authentication key is configured, a random one is generated and
+    exported to the environment so that the workers inherit it. The
+    process owns a process pool, so it can not be daemonic and has to be
+    terminated by the caller.
+
+    Args:
+        config (KeyPoolConfig): Key pool settings.
+
+    Returns:
+        multiprocessing.Process: The running server process.
+    """
+    if config.authkey is None:
+        config.authkey = os.urandom(16).hex()
+        os.environ["APP_CONFIG__KEYPOOL__AUTHKEY"] = config.authkey
+    process = multiprocessing.get_context("spawn").Process(
+        target=_serve,
+        args=(config,),
+        name="keyforge-keypool",
+    )
+    process.start()
+    return process
+
+
+class KeyPoolClient:
+    """Worker side of the shared RSA key pool.
+
+    Every request opens a short-lived connection to the key pool server.
+    Any failure (pool disabled, server down, empty pool) is reported as a
+    miss so that the caller falls back to generating the key inline.
+    """
+
+    def __init__(self, config: KeyPoolConfig):
+        self.config = config
+
+    def _request(self, *message):
+        with Client(
+            self.config.address,
+            family="AF_UNIX",
+            authkey=self.config.authkey.encode(),
+        ) as conn:
+            conn.send(message)
+            if not conn.poll(self.config.timeout):
+                raise TimeoutError("Key pool did not answer in time")
+            return conn.recv()
+
+    def _pop(self, key_size: int) -> str | None:
+        try:
+            private_pem = self._request("pop", key_size)
+        except (OSError, EOFError, AuthenticationError, TimeoutError) as exc:
+            logger.warning("Key pool is unavailable: %s", exc)
+            private_pem = None
+        KEYPOOL_REQUESTS.labels(
+            key_size=key_size,
+            result="miss" if private_pem is None else "hit",
+        ).inc()
+        return private_pem
+
+    async def pop(self, key_size: int) -> str | None:
+        """Take an unencrypted PEM RSA key of ``key_size`` bits from the pool.
+
+        Returns:
+            str | None: The PEM-encoded private key, or None on a miss.
+        """
+        if not self.config.enabled or self.config.authkey is None:
+            return None
+        return await run_in_threadpool(self._pop, key_size)
+
+    def stats(self) -> dict[int, dict[str, int]]:
+        """Fill level and hit/miss counters of the pool, per key size."""
+        return self._request("stats")
+
+
+class KeyPoolCollector:
+    """Prometheus collector reporting the shared pool state on scrape."""
+
+    def __init__(self, client: KeyPoolClient):
+        self.client = client
+
+    def describe(self):
+        # Do not query the server at registration time
+        return []
+
+    def collect(self):
+        if self.client.config.authkey is None:
+            return
+        fill = GaugeMetricFamily(
+            "keyforge_keypool_fill",
+            "Pre-generated RSA keys ready in the shared key pool",
+            labels=["key_size"],
+        )
+        served = CounterMetricFamily(
+            "keyforge_keypool_served",
+            "Key pool lookups answered by the shared key pool server",
+            labels=["key_size", "result"],
+        )
+        try:
+            stats = self.client.stats()
+        except (OSError, EOFError, AuthenticationError, TimeoutError):
+            return
+        for size, values in stats.items():
+            fill.add_metric([str(size)], values["fill"])
+            served.add_metric([str(size), "hit"], values["hits"])
+            served.add_metric([str(size), "miss"], values["misses"])
+        yield fill
+        yield served
+
+
+key_pool = KeyPoolClient(settings.keypool)
+
+if settings.keypool.enabled:
+    REGISTRY.register(KeyPoolCollector(key_pool))
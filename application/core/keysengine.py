@@ -1,12 +1,20 @@
 from enum import Enum
+from typing import TYPE_CHECKING
 
-from cryptography.hazmat.backends import default_backend
-from cryptography.hazmat.primitives.asymmetric import rsa, ed25519
-from cryptography.hazmat.primitives import serialization
-from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
-from cryptography.hazmat.primitives.asymmetric.rsa import RSAPrivateKey
 from fastapi import HTTPException
 
+from core.lazy import lazy_import, warm_up
+
+if TYPE_CHECKING:
+    from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+    from cryptography.hazmat.primitives.asymmetric.rsa import RSAPrivateKey
+
+# The OpenSSL bindings are loaded on first use (or by warm_up_crypto), so
+# that importing the module does not delay the start of a worker
+rsa = lazy_import("cryptography.hazmat.primitives.asymmetric.rsa")
+ed25519 = lazy_import("cryptography.hazmat.primitives.asymmetric.ed25519")
+serialization = lazy_import("cryptography.hazmat.primitives.serialization")
+
 
 class RSASizeEnum(int, Enum):
     """Enumeration of supported RSA key sizes.
@@ -21,6 +29,41 @@ class RSASizeEnum(int, Enum):
     RSA_8192 = 8192  # Maximum security, significant performance impact
 
 
+class KeyTypeEnum(str, Enum):
+    """Enumeration of the key types of bulk key-pair generation."""
+
+    RSA = "rsa"
+    ED25519 = "ed25519"
+
+
+def _private_key_to_pem(
+    private_key: "RSAPrivateKey | Ed25519PrivateKey",
+    password: str | None,
+) -> str:
+    """Serialize a private key to PKCS#8 PEM, encrypted if a password is given.
+
+    Args:
+        private_key (RSAPrivateKey | Ed25519PrivateKey): The key to serialize.
+        password (str | None): Optional password to encrypt the private key.
+            If None or empty string, the key will not be encrypted.
+
+    Returns:
+        str: The PEM-encoded private key as a string.
+    """
+    private_pem = private_key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=(
+            serialization.NoEncryption()
+            if password is None or password == ""
+            else serialization.BestAvailableEncryption(
+                password=password.encode("utf-8"),
+            )
+        ),
+    )
+    return private_pem.decode("utf-8")
+
+
 def gen_rsa_private_key_pem(
     password: str | None,
     key_size: int,
@@ -47,21 +90,41 @@ def gen_rsa_private_key_pem(
     private_key = rsa.generate_private_key(
         public_exponent=65537,
         key_size=key_size,
-        backend=default_backend(),
     )
 
-    private_pem = private_key.private_bytes(
-        encoding=serialization.Encoding.PEM,
-        format=serialization.PrivateFormat.PKCS8,
-        encryption_algorithm=(
-            serialization.NoEncryption()
-            if password is None or password == ""
-            else serialization.BestAvailableEncryption(
-                password=password.encode("utf-8"),
-            )
-        ),
+    return _private_key_to_pem(
+        private_key=private_key,
+        password=password,
+    )
+
+
+def encrypt_private_key_pem(
+    pem: str,
+    password: str | None,
+) -> str:
+    """Re-serialize an unencrypted PKCS#8 private key, encrypting it with a password.
+
+    Used for keys taken from the pre-generated key pool: prime generation
+    has already happened, only the (optional) encryption step is left.
+
+    Args:
+        pem (str): The unencrypted PEM-encoded private key.
+        password (str | None): Optional password to encrypt the private key.
+            If None or empty string, the key is returned unchanged.
+
+    Returns:
+        str: The PEM-encoded private key as a string.
+    """
+    if password is None or password == "":
+        return pem
+    private_key = serialization.load_pem_private_key(
+        pem.encode("utf-8"),
+        password=None,
+    )
+    return _private_key_to_pem(
+        private_key=private_key,
+        password=password,
     )
-    return private_pem.decode("utf-8")
 
 
 def gen_rsa_ed25519_public_key_pem(
@@ -88,7 +151,7 @@ def gen_rsa_ed25519_public_key_pem(
             is incorrect for an encrypted key.
     """
     try:
-        private_key: RSAPrivateKey | Ed25519PrivateKey = (
+        private_key: "RSAPrivateKey | Ed25519PrivateKey" = (
             serialization.load_pem_private_key(
                 pem.encode("utf-8"),
                 password=password.encode("utf-8") if password else None,
@@ -134,15 +197,56 @@ def gen_ed25519_private_key_pem(
     """
     private_key = ed25519.Ed25519PrivateKey.generate()
 
-    private_pem = private_key.private_bytes(
-        encoding=serialization.Encoding.PEM,
-        format=serialization.PrivateFormat.PKCS8,
-        encryption_algorithm=(
-            serialization.NoEncryption()
-            if password is None or password == ""
-            else serialization.BestAvailableEncryption(
-                password=password.encode("utf-8"),
-            )
-        ),
+    return _private_key_to_pem(
+        private_key=private_key,
+        password=password,
     )
-    return private_pem.decode("utf-8")
+
+
+def gen_key_pairs_pem(
+    key_type: str,
+    key_size: int,
+    passwords: list[str | None],
+) -> list[tuple[str, str]]:
+    """Generate a batch of key pairs and return them in PEM format.
+
+    Runs as a single compute engine task, so small keys (Ed25519) do not
+    pay the inter-process round trip one by one. The public key is
+    serialized from the generated key directly, without parsing the
+    private PEM back.
+
+    Args:
+        key_type (str): 'rsa' or 'ed25519', see KeyTypeEnum.
+        key_size (int): The size of the RSA keys in bits, ignored for Ed25519.
+        passwords (list[str | None]): One password per key to generate.
+            A None or empty password leaves the private key unencrypted.
+
+    Returns:
+        list[tuple[str, str]]: The PEM-encoded (private key, public key)
+            pairs, in the order of ``passwords``.
+    """
+    pairs = []
+    for password in passwords:
+        if key_type == KeyTypeEnum.RSA:
+            private_key = rsa.generate_private_key(
+                public_exponent=65537,
+                key_size=key_size,
+            )
+        else:
+            private_key = ed25519.Ed25519PrivateKey.generate()
+        public_pem = private_key.public_key().public_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PublicFormat.SubjectPublicKeyInfo,
+        )
+        pairs.append(
+            (
+                _private_key_to_pem(private_key=private_key, password=password),
+                public_pem.decode("utf-8"),
+            )
+        )
+    return pairs
+
+
+def warm_up_crypto() -> None:
+    """Load the OpenSSL bindings now instead of on the first key request."""
+    warm_up(rsa, ed25519, serialization)
@@ -0,0 +1,40 @@
+import importlib
+import importlib.util
+import sys
+from types import ModuleType
+
+
+def lazy_import(name: str) -> ModuleType:
+    """Return module ``name``, executed on its first attribute access.
+
+    Only the parent packages are imported right away. Meant for heavy
+    modules (native crypto bindings, exporters) that a worker does not need
+    to accept its first requests. A module already imported is returned as
+    is, and :func:`warm_up` forces the import ahead of the first use.
+
+    Args:
+        name (str): Absolute module name, e.g.
+            'cryptography.hazmat.primitives.serialization'.
+
+    Returns:
+        ModuleType: The module, possibly not executed yet.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+def warm_up(*modules: ModuleType) -> None:
+    """Execute lazily imported modules now, e.g. from a background thread."""
+    for module in modules:
+        # Any attribute access runs the deferred import
+        getattr(module, "__name__")
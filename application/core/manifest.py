@@ -0,0 +1,322 @@
+import asyncio
+import re
+from typing import AsyncIterator
+
+import orjson
+from fastapi import HTTPException, status
+
+from core.hashengine import HashLib, HashLibEnum, MultiHash
+from core.schemas import FileVerifiedResponse
+from core.uploads import PartEvent, UploadPart
+
+# Algorithm names of BSD-style lines (``sha256sum --tag``), as coreutils
+# spells them
+_TAGS = {"blake2b": "BLAKE2b", "blake2s": "BLAKE2s"}
+
+_TAG_LINE = re.compile(r"^(\\?)([\w-]+) \((.*)\) = ([0-9a-fA-F]+)$")
+_GNU_LINE = re.compile(r"^(\\?)([0-9a-fA-F]+) [ *](.*)$")
+
+# Files of a manifest and the expected hex digest of every algorithm
+Manifest = dict[str, dict[str, str]]
+
+
+class ManifestError(ValueError):
+    """The manifest can not be parsed."""
+
+
+def algorithm_tag(algorithm: str) -> str:
+    """Name of ``algorithm`` in BSD-style lines, e.g. 'SHA3-256'."""
+    return _TAGS.get(algorithm, algorithm.upper().replace("_", "-"))
+
+
+_ALGORITHMS = {algorithm_tag(item.value): item.value for item in HashLibEnum}
+
+
+def normalize(name: str) -> str:
+    """File name as matched between a manifest and the uploaded parts."""
+    while name.startswith("./"):
+        name = name[2:]
+    return name
+
+
+def _unescape(name: str) -> str:
+    # Reverse of the coreutils escaping of names with a backslash or newline
+    return re.sub(r"\\(.)", lambda m: "\n" if m[1] == "n" else m[1], name)
+
+
+def _add(manifest: Manifest, name: str, algorithm: str, digest: str) -> None:
+    try:
+        size = HashLib(algorithm=algorithm).hasher().digest_size
+    except ValueError as exc:
+        raise ManifestError(str(exc)) from None
+    if len(digest) != 2 * size:
+        raise ManifestError(f"Invalid {algorithm} digest for '{name}'.")
+    manifest.setdefault(normalize(name), {})[algorithm] = digest.lower()
+
+
+def _parse_json(manifest: Manifest, document, algorithm: str) -> None:
+    # {"name": "digest"}, or a list of /file-sum responses such as the
+    # output of keyforge-hash --json
+    if isinstance(document, dict):
+        document = [
+            {"filename": name, "hash": digest} for name, digest in document.items()
+        ]
+    if not isinstance(document, list):
+        raise ManifestError("JSON manifest must be an object or an array.")
+    for entry in document:
+        if not isinstance(entry, dict) or not isinstance(entry.get("filename"), str):
+            raise ManifestError("Manifest entries need a filename.")
+        hashes = entry.get("hashes") or {
+            entry.get("algorithm") or algorithm: entry.get("hash")
+        }
+        for entry_algorithm, digest in hashes.items():
+            if not isinstance(digest, str):
+                raise ManifestError(f"Missing digest for '{entry['filename']}'.")
+            _add(manifest, entry["filename"], entry_algorithm, digest)
+
+
+def parse_manifest(content: bytes, algorithm: str) -> Manifest:
+    """Parse a manifest in the sha256sum format or in JSON.
+
+    Text manifests hold one file per line, either ``<digest>  <name>`` as
+    printed by sha256sum & co (``*<name>`` for binary mode), whose algorithm
+    is ``algorithm``, or ``<ALGORITHM> (<name>) = <digest>`` as printed by
+    ``sha256sum --tag``. Both can be mixed, and a file can be listed once
+    per algorithm.
+
+    JSON manifests are either an object mapping file names to their
+    ``algorithm`` digest, or an array of /file-sum responses (``filename``,
+    ``algorithm``, ``hash`` and optionally ``hashes``), such as the output
+    of ``keyforge-hash --json``.
+
+    Args:
+        content (bytes): The manifest.
+        algorithm (str): Algorithm of the digests that do not name one.
+
+    Returns:
+        Manifest: The expected digests of every file.
+
+    Raises:
+        ManifestError: If the manifest is malformed or empty.
+    """
+    manifest: Manifest = {}
+    stripped = content.strip()
+    if stripped[:1] in (b"{", b"["):
+        try:
+            document = orjson.loads(stripped)
+        except orjson.JSONDecodeError:
+            raise ManifestError("Manifest is not valid JSON.") from None
+        _parse_json(manifest, document, algorithm)
+    else:
+        try:
+            text = content.decode()
+        except UnicodeDecodeError:
+            raise ManifestError("Manifest is not valid UTF-8.") from None
+        for number, line in enumerate(text.splitlines(), 1):
+            if not line.strip() or line.startswith("#"):
+                continue
+            match = _TAG_LINE.match(line)
+            if match is not None:
+                escaped, name_tag, name, digest = match.groups()
+                line_algorithm = _ALGORITHMS.get(name_tag)
+                if line_algorithm is None:
+                    raise ManifestError(
+                        f"Hash algorithm '{name_tag}' is not supported"
+                    )
+            else:
+                match = _GNU_LINE.match(line)
+                if match is None:
+                    raise ManifestError(f"Malformed manifest line {number}.")
+                escaped, digest, name = match.groups()
+                line_algorithm = algorithm
+            if escaped:
+                name = _unescape(name)
+            _add(manifest, name, line_algorithm, digest)
+    if not manifest:
+        raise ManifestError("Manifest lists no file.")
+    return manifest
+
+
+def _manifest_error(detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        detail=detail,
+    )
+
+
+async def read_manifest(
+    events: AsyncIterator[tuple[PartEvent, UploadPart | bytes | None]],
+    algorithm: str,
+    limit: int,
+    field: str = "manifest",
+) -> Manifest:
+    """Read and parse the manifest part, which must be the first of the body.
+
+    The rest of ``events`` is left for :func:`verify_files`.
+
+    Raises:
+        HTTPException (413): If the manifest exceeds ``limit`` bytes.
+        HTTPException (422): If the first part is not a valid manifest.
+    """
+    content = bytearray()
+    async for event, value in events:
+        if event is PartEvent.BEGIN and value.name != field:
+            raise _manifest_error(f"The first part must be the '{field}'.")
+        elif event is PartEvent.DATA:
+            content += value
+            if len(content) > limit:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"Manifest is too large. Exceeds {limit // 1024} KiB",
+                )
+        elif event is PartEvent.END:
+            try:
+                return parse_manifest(bytes(content), algorithm)
+            except ManifestError as exc:
+                raise _manifest_error(str(exc)) from None
+    raise _manifest_error(f"Missing '{field}' part.")
+
+
+def _line(document: dict) -> bytes:
+    return orjson.dumps(document) + b"\n"
+
+
+async def _check(
+    name: str,
+    expected: dict[str, str],
+    hasher: MultiHash,
+    size: int,
+) -> FileVerifiedResponse:
+    hashes = await hasher.ahexdigests()
+    algorithm = next(iter(hashes))
+    if not expected:
+        verdict = "unexpected"
+    elif hashes == expected:
+        verdict = "ok"
+    else:
+        verdict = "mismatch"
+    return FileVerifiedResponse(
+        filename=name,
+        algorithm=algorithm,
+        hash=hashes[algorithm],
+        size=size,
+        hashes=hashes,
+        status=verdict,
+        expected=expected,
+    )
+
+
+async def verify_files(
+    events: AsyncIterator[tuple[PartEvent, UploadPart | bytes | None]],
+    manifest: Manifest,
+    algorithm: str,
+    block_size: int,
+    limit: int,
+    fail_fast: bool,
+) -> AsyncIterator[bytes]:
+    """Hash the file parts of a multipart body and check them against a manifest.
+
+    Every file is hashed while it streams in, with the algorithms its
+    manifest entries use, its blocks being hashed in worker threads. The
+    digest of a file is finished in the background while the next file is
+    received, and a line is yielded for every file as soon as it is
+    checked.
+
+    With ``fail_fast`` every file is checked before the next one is read,
+    and the first mismatching or unexpected file ends the stream: the rest
+    of the body is not read, and uvicorn closes the connection instead of
+    receiving it.
+
+    Args:
+        events: The remaining events of the multipart body.
+        manifest (Manifest): The expected digests.
+        algorithm (str): Algorithm of the files that are not in the manifest.
+        block_size (int): Size of the blocks fed to the hashers.
+        limit (int): Maximum total size of the files in bytes.
+        fail_fast (bool): Stop at the first file that does not match.
+
+    Yields:
+        bytes: NDJSON lines, a ``FileVerifiedResponse`` per file part (in
+            completion order), then ``{"summary": {...}}`` with the count of
+            every status, the ``missing`` files of the manifest, whether
+            the body was ``aborted`` and whether everything ``passed``.
+            An invalid body ends the stream with ``{"error": str}``.
+    """
+    counts = dict.fromkeys(("ok", "mismatch", "unexpected"), 0)
+    seen: set[str] = set()
+    pending: set[asyncio.Task] = set()
+    aborted = False
+    total = 0
+    name, expected, hasher, size = None, {}, None, 0
+
+    def collect(tasks) -> list[bytes]:
+        nonlocal aborted
+        lines = []
+        for task in tasks:
+            result = task.result()
+            counts[result.status] += 1
+            aborted = aborted or (fail_fast and result.status != "ok")
+            lines.append(_line(result.model_dump()))
+        return lines
+
+    try:
+        async for event, value in events:
+            if event is PartEvent.BEGIN:
+                if value.filename is None:
+                    # Form fields other than files are ignored
+                    name = None
+                    continue
+                name = normalize(value.filename)
+                seen.add(name)
+                expected = manifest.get(name, {})
+                hasher = MultiHash(
+                    algorithms=list(expected) or [algorithm],
+                    block_size=block_size,
+                )
+                size = 0
+            elif event is PartEvent.DATA and name is not None:
+                size += len(value)
+                total += len(value)
+                if total > limit:
+                    yield _line(
+                        {"error": f"Files exceed {limit // (1024 * 1024)} MiB."}
+                    )
+                    return
+                await hasher.aupdate(value)
+            elif event is PartEvent.END and name is not None:
+                task = asyncio.create_task(_check(name, expected, hasher, size))
+                pending.add(task)
+                name = None
+                if fail_fast:
+                    # Only the last block is left to hash: know the verdict
+                    # before reading the next file
+                    await asyncio.wait({task})
+            done = {task for task in pending if task.done()}
+            if done:
+                pending -= done
+                yield b"".join(collect(done))
+                if aborted:
+                    break
+        if not aborted and pending:
+            done, pending = await asyncio.wait(pending)
+            yield b"".join(collect(done))
+    except HTTPException as exc:
+        # A malformed multipart body
+        yield _line({"error": exc.detail})
+        return
+    finally:
+        for task in pending:
+            task.cancel()
+    missing = sorted(set(manifest) - seen) if not aborted else []
+    yield _line(
+        {
+            "summary": {
+                **counts,
+                "missing": missing,
+                "aborted": aborted,
+                "passed": not aborted
+                and not missing
+                and counts["mismatch"] == counts["unexpected"] == 0,
+            }
+        }
+    )
@@ -0,0 +1,116 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from fastapi import HTTPException, status
+
+from core.config import settings
+from core.metrics import ARGON2_RESERVED_KIB, ARGON2_WAIT_SECONDS, ARGON2_WAITING
+
+
+class MemoryBudget:
+    """Memory-aware scheduler for Argon2 hashing.
+
+    Argon2 allocates its whole ``memory_cost`` for the duration of a hash.
+    The scheduler only lets a hash start when its memory fits in the
+    per-worker budget, which bounds the worst-case RSS of the worker to the
+    budget plus the baseline of the process.
+
+    Waiting hashes are served strictly in arrival order: a large request at
+    the head of the queue is not overtaken by smaller ones, so it can not be
+    starved. A request that does not get its memory within the timeout is
+    rejected with 503.
+    """
+
+    def __init__(self, budget_kib: int, wait_timeout: float):
+        """Initialize an empty budget.
+
+        Args:
+            budget_kib (int): Memory in KiB that may be reserved at once.
+            wait_timeout (float): Seconds a request may wait for memory.
+        """
+        self.budget_kib = budget_kib
+        self.wait_timeout = wait_timeout
+        self.reserved_kib = 0
+        self._waiters: deque[tuple[int, asyncio.Future]] = deque()
+
+    def _report(self) -> None:
+        ARGON2_RESERVED_KIB.set(self.reserved_kib)
+        ARGON2_WAITING.set(len(self._waiters))
+
+    def _grant(self) -> None:
+        while self._waiters:
+            kib, waiter = self._waiters[0]
+            if waiter.done():
+                self._waiters.popleft()
+                continue
+            if self.reserved_kib + kib > self.budget_kib:
+                break
+            self._waiters.popleft()
+            self.reserved_kib += kib
+            waiter.set_result(None)
+        self._report()
+
+    def _release(self, kib: int) -> None:
+        self.reserved_kib -= kib
+        self._grant()
+
+    async def _acquire(self, kib: int) -> None:
+        if not self._waiters and self.reserved_kib + kib <= self.budget_kib:
+            self.reserved_kib += kib
+            self._report()
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        entry = (kib, waiter)
+        self._waiters.append(entry)
+        self._report()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.wait_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as exc:
+            if waiter.done() and not waiter.cancelled():
+                # Memory was granted right before the timeout/cancellation
+                self._release(kib)
+            else:
+                waiter.cancel()
+                self._waiters.remove(entry)
+                # The head may have left, let the next requests in
+                self._grant()
+            if isinstance(exc, asyncio.TimeoutError):
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Server is busy, retry later.",
+                    headers={"Retry-After": "1"},
+                )
+            raise
+
+    @asynccontextmanager
+    async def reserve(self, kib: int) -> AsyncIterator[None]:
+        """Reserve ``kib`` KiB of the budget for the duration of the block.
+
+        Args:
+            kib (int): Argon2 ``memory_cost`` of the hash, in KiB.
+
+        Raises:
+            HTTPException (503): If the memory could not be reserved within
+                the wait timeout, or if it exceeds the whole budget.
+        """
+        if kib > self.budget_kib:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Requested memory cost exceeds the server memory budget.",
+            )
+        started = time.perf_counter()
+        await self._acquire(kib)
+        ARGON2_WAIT_SECONDS.observe(time.perf_counter() - started)
+        try:
+            yield
+        finally:
+            self._release(kib)
+
+
+argon2_budget = MemoryBudget(
+    budget_kib=settings.argon2_budget.budget_kib,
+    wait_timeout=settings.argon2_budget.wait_timeout,
+)
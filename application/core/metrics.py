@@ -0,0 +1,116 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+# Exposed on /metrics next to the generic HTTP metrics of
+# prometheus_fastapi_instrumentator (default registry).
+
+KEYPOOL_REQUESTS = Counter(
+    "keyforge_keypool_requests_total",
+    "RSA keys requested from the pre-generated key pool",
+    labelnames=("key_size", "result"),
+)
+
+KEYCACHE_REQUESTS = Counter(
+    "keyforge_keycache_requests_total",
+    "Public key derivations looked up in the public key cache",
+    labelnames=("result",),
+)
+
+KEYCACHE_EVICTIONS = Counter(
+    "keyforge_keycache_evictions_total",
+    "Public keys removed from the public key cache",
+    labelnames=("reason",),
+)
+
+KEYCACHE_SIZE = Gauge(
+    "keyforge_keycache_size",
+    "Public keys currently held in the public key cache",
+)
+
+ADMISSION_IN_FLIGHT = Gauge(
+    "keyforge_admission_in_flight",
+    "Requests currently being processed, per cost class",
+    labelnames=("cost_class",),
+)
+
+ADMISSION_QUEUED = Gauge(
+    "keyforge_admission_queued",
+    "Requests waiting for a free slot, per cost class",
+    labelnames=("cost_class",),
+)
+
+ADMISSION_REJECTED = Counter(
+    "keyforge_admission_rejected_total",
+    "Requests rejected with 503 because their cost class was full",
+    labelnames=("cost_class",),
+)
+
+ARGON2_RESERVED_KIB = Gauge(
+    "keyforge_argon2_reserved_kib",
+    "Argon2 memory currently reserved by running hashes (KiB)",
+)
+
+ARGON2_WAITING = Gauge(
+    "keyforge_argon2_waiting",
+    "Argon2 hashes waiting for their memory to fit in the budget",
+)
+
+ARGON2_WAIT_SECONDS = Histogram(
+    "keyforge_argon2_memory_wait_seconds",
+    "Time Argon2 hashes waited for memory budget",
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+
+STAGE_SECONDS = Histogram(
+    "keyforge_stage_seconds",
+    "Time spent per request stage (queue, worker-wait, compute, serialize, ...)",
+    labelnames=("endpoint", "param_class", "stage"),
+    buckets=(
+        0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+        0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30,
+    ),
+)
+
+OPERATIONS_IN_FLIGHT = Gauge(
+    "keyforge_operations_in_flight",
+    "Crypto requests currently being served, per endpoint",
+    labelnames=("endpoint",),
+)
+
+EXECUTOR_TASKS = Gauge(
+    "keyforge_executor_tasks",
+    "Tasks submitted to an executor and not finished yet (running or queued)",
+    labelnames=("executor",),
+)
+
+EXECUTOR_WORKERS = Gauge(
+    "keyforge_executor_workers",
+    "Maximum number of workers (processes or threads) of an executor",
+    labelnames=("executor",),
+)
+
+FILE_SUM_BYTES = Counter(
+    "keyforge_file_sum_bytes_total",
+    "Bytes hashed by /file-sum",
+    labelnames=("mode",),
+)
+
+FILE_SUM_THROUGHPUT = Histogram(
+    "keyforge_file_sum_throughput_bytes_per_second",
+    "Upload and hashing throughput of /file-sum requests",
+    labelnames=("mode",),
+    buckets=(
+        1e6, 5e6, 10e6, 25e6, 50e6, 100e6, 250e6, 500e6, 1e9, 2.5e9, 5e9,
+    ),
+)
+
+JOBS_SUBMITTED = Counter(
+    "keyforge_jobs_submitted_total",
+    "Asynchronous jobs accepted by this worker",
+    labelnames=("kind",),
+)
+
+JOBS_FINISHED = Counter(
+    "keyforge_jobs_finished_total",
+    "Asynchronous jobs run to completion by this worker",
+    labelnames=("kind", "outcome"),
+)
@@ -0,0 +1,199 @@
+import gc
+import logging
+import os
+import random
+import signal
+import threading
+import time
+
+import uvicorn
+
+# Configured by the uvicorn log config, next to the logs of the workers
+logger = logging.getLogger("uvicorn.error")
+
+
+def rss_bytes(pid: int) -> int | None:
+    """Resident set size of process ``pid``, or None if it does not exist.
+
+    Linux only: read from ``/proc/<pid>/statm``.
+    """
+    try:
+        with open(f"/proc/{pid}/statm") as statm:
+            pages = int(statm.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE")
+
+
+class PreforkServer:
+    """Forks uvicorn workers from a process that already loaded the app.
+
+    ``uvicorn.run("main:app", workers=n)`` spawns fresh interpreters that
+    each import and initialise the whole application. Here the server
+    process imports and warms the app up once, binds the socket and forks
+    the workers: modules, the OpenSSL bindings, the OpenAPI schema and the
+    calibration are shared copy-on-write instead of being loaded n times,
+    and a worker starts in milliseconds.
+
+    The server process does not serve requests. It restarts workers that
+    exit (uvicorn stops a worker after ``max_requests`` requests) and
+    replaces a worker whose resident memory grows past ``max_rss``: the
+    replacement is forked first, then the old worker is stopped gracefully
+    so that it finishes its in-flight requests.
+
+    Everything run before :meth:`run` must leave no event loop running
+    and, when possible, no threads behind: a forked worker only inherits
+    the thread calling ``fork``. The OpenTelemetry span processor restarts
+    its thread in the child by itself.
+    """
+
+    def __init__(
+        self,
+        config: uvicorn.Config,
+        workers: int,
+        max_requests: int | None = None,
+        max_requests_jitter: int = 0,
+        max_rss: int | None = None,
+        check_interval: float = 1.0,
+        graceful_timeout: float = 30.0,
+    ):
+        """Initialize the server without binding or forking anything.
+
+        Args:
+            config (uvicorn.Config): Config of the workers, with the app
+                object (not an import string).
+            workers (int): Number of worker processes.
+            max_requests (int | None): Recycle a worker after this many
+                requests. None disables recycling by request count.
+            max_requests_jitter (int): Add up to this many requests to the
+                limit of every worker, so they do not restart together.
+            max_rss (int | None): Recycle a worker whose resident memory
+                exceeds this many bytes. None disables the check.
+            check_interval (float): Seconds between two checks of the
+                workers.
+            graceful_timeout (float): Seconds a stopping worker gets to
+                finish its requests before it is killed.
+        """
+        self.config = config
+        self.workers = workers
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.max_rss = max_rss
+        self.check_interval = check_interval
+        self.graceful_timeout = graceful_timeout
+        self.pids: set[int] = set()
+        self._retiring: set[int] = set()
+        self._should_exit = threading.Event()
+        self._socket = None
+
+    def _handle_exit(self, sig: int, frame) -> None:
+        self._should_exit.set()
+
+    def _run_worker(self, max_requests: int | None) -> None:
+        # Runs in the forked child and never returns
+        code = 0
+        try:
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(sig, signal.SIG_DFL)
+            self.config.limit_max_requests = max_requests
+            uvicorn.Server(self.config).run(sockets=[self._socket])
+        except BaseException:
+            logger.exception("Worker process [%d] failed", os.getpid())
+            code = 1
+        finally:
+            logging.shutdown()
+            os._exit(code)
+
+    def spawn(self) -> int:
+        """Fork a worker and return its pid."""
+        max_requests = self.max_requests
+        if max_requests is not None:
+            max_requests += random.randint(0, self.max_requests_jitter)
+        pid = os.fork()
+        if pid == 0:
+            self._run_worker(max_requests)
+        self.pids.add(pid)
+        return pid
+
+    def reap(self) -> None:
+        """Collect exited workers and replace them unless the server stops."""
+        # Only our own pids: waitpid(-1) would also collect the key pool
+        # process, which multiprocessing waits for itself
+        for pid in list(self.pids):
+            try:
+                done, status = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                done, status = pid, 0
+            if done == 0:
+                continue
+            self.pids.discard(pid)
+            if pid in self._retiring:
+                self._retiring.discard(pid)
+                continue
+            if self._should_exit.is_set():
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            if code == 0:
+                logger.info("Worker process [%d] recycled", pid)
+            else:
+                logger.warning("Worker process [%d] died with code %d", pid, code)
+            self.spawn()
+
+    def recycle_large(self) -> None:
+        """Replace the workers whose resident memory exceeds ``max_rss``."""
+        if self.max_rss is None:
+            return
+        for pid in self.pids - self._retiring:
+            rss = rss_bytes(pid)
+            if rss is None or rss <= self.max_rss:
+                continue
+            logger.info(
+                "Worker process [%d] uses %d MiB of memory, recycling it",
+                pid,
+                rss >> 20,
+            )
+            self._retiring.add(pid)
+            self.spawn()
+            os.kill(pid, signal.SIGTERM)
+
+    def stop(self) -> None:
+        """Stop every worker, gracefully first."""
+        self._should_exit.set()
+        for pid in self.pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + self.graceful_timeout
+        while self.pids and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.05)
+        for pid in self.pids:
+            logger.warning("Worker process [%d] did not stop, killing it", pid)
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        self.pids.clear()
+
+    def run(self) -> None:
+        """Bind the socket, fork the workers and supervise them until a signal."""
+        self._socket = self.config.bind_socket()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, self._handle_exit)
+        # Objects loaded so far move to the permanent generation: the
+        # collector of a worker never writes to their pages, which stay
+        # shared with the server process
+        gc.collect()
+        gc.freeze()
+        logger.info(
+            "Started server process [%d], forking %d workers",
+            os.getpid(),
+            self.workers,
+        )
+        for _ in range(self.workers):
+            self.spawn()
+        while not self._should_exit.wait(self.check_interval):
+            self.reap()
+            self.recycle_large()
+        logger.info("Stopping %d workers", len(self.pids))
+        self.stop()
+        self._socket.close()
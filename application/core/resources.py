@@ -0,0 +1,103 @@
+import math
+import os
+from pathlib import Path
+
+CGROUP_ROOT = Path("/sys/fs/cgroup")
+
+# cgroup v1 reports "no limit" as a huge page-aligned number
+_V1_UNLIMITED = 1 << 60
+
+
+def _read(path: Path) -> str | None:
+    try:
+        return path.read_text().strip()
+    except OSError:
+        return None
+
+
+def _cgroup_dirs(root: Path, controller: str | None) -> list[Path]:
+    # The cgroup of this process, then the root of the hierarchy (a
+    # container usually sees its own cgroup as the root). ``controller`` is
+    # None for the unified cgroup v2 hierarchy.
+    base = root if controller is None else root / controller
+    dirs = []
+    for line in (_read(Path("/proc/self/cgroup")) or "").splitlines():
+        _, controllers, path = line.split(":", 2)
+        names = controllers.split(",") if controllers else [None]
+        if controller in names:
+            dirs.append(base / path.lstrip("/"))
+    dirs.append(base)
+    return dirs
+
+
+def cpu_limit(root: Path = CGROUP_ROOT) -> float | None:
+    """CPU quota of the cgroup, in CPUs.
+
+    Args:
+        root (Path): Mount point of the cgroup hierarchy.
+
+    Returns:
+        float | None: Quota divided by period, e.g. 1.5, or None when the
+            cgroup has no CPU limit.
+    """
+    for directory in _cgroup_dirs(root, None):
+        cpu_max = _read(directory / "cpu.max")
+        if cpu_max is not None:
+            quota, period = cpu_max.split()
+            return None if quota == "max" else int(quota) / int(period)
+    for directory in _cgroup_dirs(root, "cpu"):
+        quota = _read(directory / "cpu.cfs_quota_us")
+        period = _read(directory / "cpu.cfs_period_us")
+        if quota is not None and period is not None:
+            return None if int(quota) <= 0 else int(quota) / int(period)
+    return None
+
+
+def memory_limit(root: Path = CGROUP_ROOT) -> int | None:
+    """Memory limit of the cgroup, in bytes, or None when there is none."""
+    for directory in _cgroup_dirs(root, None):
+        memory_max = _read(directory / "memory.max")
+        if memory_max is not None:
+            return None if memory_max == "max" else int(memory_max)
+    for directory in _cgroup_dirs(root, "memory"):
+        limit = _read(directory / "memory.limit_in_bytes")
+        if limit is not None:
+            return None if int(limit) >= _V1_UNLIMITED else int(limit)
+    return None
+
+
+def available_cpus(root: Path = CGROUP_ROOT) -> int:
+    """CPUs this process may use: its affinity mask capped by the cgroup quota.
+
+    ``os.cpu_count()`` returns the CPUs of the host, which oversizes pools
+    in a container limited to a fraction of them.
+    """
+    if hasattr(os, "sched_getaffinity"):
+        cpus = len(os.sched_getaffinity(0))
+    else:
+        cpus = os.cpu_count() or 1
+    quota = cpu_limit(root)
+    if quota is not None:
+        cpus = min(cpus, math.ceil(quota))
+    return max(cpus, 1)
+
+
+def default_workers(memory_per_worker: int, root: Path = CGROUP_ROOT) -> int:
+    """Number of uvicorn workers that fits the CPU and memory of the cgroup.
+
+    One worker per available CPU, fewer if their memory would exceed the
+    memory limit.
+
+    Args:
+        memory_per_worker (int): Bytes a worker may use at worst, including
+            its engine processes and Argon2 budget.
+        root (Path): Mount point of the cgroup hierarchy.
+
+    Returns:
+        int: At least one worker.
+    """
+    workers = available_cpus(root)
+    limit = memory_limit(root)
+    if limit is not None:
+        workers = min(workers, limit // memory_per_worker)
+    return max(workers, 1)
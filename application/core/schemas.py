@@ -1,4 +1,8 @@
-from pydantic import BaseModel, Field
+from datetime import datetime
+
+from pydantic import BaseModel, Field, model_validator
+
+from core.keysengine import KeyTypeEnum, RSASizeEnum
 
 
 class PrivateKeyOut(BaseModel):
@@ -21,6 +25,32 @@ class PrivateKeyIn(PasswordIn):
     private_key: str
 
 
+class KeyPairBatchIn(PasswordIn):
+    count: int = Field(
+        ge=1,
+        le=10000,
+    )
+    key_type: KeyTypeEnum = KeyTypeEnum.ED25519
+    key_size: RSASizeEnum = RSASizeEnum.RSA_2048
+    # One password per key, takes precedence over the shared `password`
+    passwords: list[str | None] | None = Field(
+        default=None,
+        max_length=10000,
+    )
+
+    @model_validator(mode="after")
+    def check_passwords(self) -> "KeyPairBatchIn":
+        if self.passwords is not None:
+            if len(self.passwords) != self.count:
+                raise ValueError("passwords must have one entry per key")
+            if any(len(password or "") > 128 for password in self.passwords):
+                raise ValueError("passwords must be at most 128 characters")
+        return self
+
+    def key_passwords(self) -> list[str | None]:
+        return self.passwords or [self.password] * self.count
+
+
 class HashOut(BaseModel):
     hash: str
 
@@ -44,18 +74,97 @@ class Argon2HashParams(BasePayload):
         ge=8,
         le=244141,
     )
+    time_cost: int = Field(
+        default=3,
+        ge=1,
+        le=10,
+    )
+    # Replaces memory_cost and time_cost by the calibrated parameters
+    target_ms: float | None = Field(
+        default=None,
+        gt=0,
+        le=10000,
+    )
 
 
 class BcryptHashParams(BasePayload):
     rounds: int = Field(
         default=12,
         ge=8,
-        le=32,
+        le=16,
+    )
+    # Replaces rounds by the calibrated cost factor
+    target_ms: float | None = Field(
+        default=None,
+        gt=0,
+        le=10000,
     )
 
 
+class PasswordVerifyIn(BaseModel):
+    payload: str = Field(
+        max_length=256,
+        min_length=0,
+    )
+    hash: str = Field(
+        max_length=512,
+    )
+    # Latency target of the parameters needs_rehash compares with
+    target_ms: float | None = Field(
+        default=None,
+        gt=0,
+        le=10000,
+    )
+
+
+class VerifyOut(BaseModel):
+    valid: bool
+    needs_rehash: bool
+
+
 class FileHashedResponse(BaseModel):
     filename: str
     algorithm: str
     hash: str
     size: int
+    # Digest of every requested algorithm, the first one is also in `hash`
+    hashes: dict[str, str] = {}
+    mode: str = "sequential"
+    # Leaf size in bytes of the tree mode
+    leaf_size: int | None = None
+
+
+class FileVerifiedResponse(FileHashedResponse):
+    # ok, mismatch, or unexpected for a file missing from the manifest
+    status: str
+    # Digests of the file listed in the manifest
+    expected: dict[str, str] = {}
+
+
+class UploadSessionOut(BaseModel):
+    session_id: str
+    algorithms: list[str]
+    filename: str
+    # Bytes received so far, i.e. the offset of the next chunk
+    offset: int
+    created_at: float
+    updated_at: float
+    # The session is dropped at this time unless a chunk arrives
+    expires_at: float
+
+
+class HashParamsOut(BaseModel):
+    target_ms: float
+    bcrypt_rounds: int
+    bcrypt_ms: float
+    argon2_memory_cost: int
+    argon2_time_cost: int
+    argon2_ms: float
+
+
+class CalibrationOut(BaseModel):
+    measured_at: datetime
+    cpu_count: int
+    bcrypt_ms_per_cost: dict[int, float]
+    argon2_ms_per_kib_pass: float
+    recommended: HashParamsOut
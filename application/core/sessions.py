@@ -0,0 +1,535 @@
+import logging
+import multiprocessing
+import os
+import secrets
+import signal
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from multiprocessing.connection import Client, Connection, Listener
+from multiprocessing.context import AuthenticationError
+from typing import AsyncIterator, Iterable, Iterator
+
+from fastapi import HTTPException, status
+from starlette.concurrency import run_in_threadpool
+
+from core.config import SessionsConfig, settings
+from core.hashengine import MultiHash
+
+logger = logging.getLogger(__name__)
+
+# Errors of a store shared over the Unix socket
+_STORE_ERRORS = (OSError, EOFError, AuthenticationError, TimeoutError)
+
+
+class SessionError(Exception):
+    """Rejected session operation, with the status code to answer."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(status_code, detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _not_found() -> SessionError:
+    return SessionError(status.HTTP_404_NOT_FOUND, "Session not found.")
+
+
+@dataclass
+class _Session:
+    session_id: str
+    filename: str
+    hasher: MultiHash
+    created_at: float
+    updated_at: float
+    offset: int = 0
+    appending: bool = False
+
+
+class SessionStore:
+    """Bounded in-memory table of resumable upload sessions.
+
+    A session holds the hash state of the bytes received so far, never the
+    bytes themselves: its memory does not depend on the size of the file.
+    A chunk is hashed into a ``copy()`` of the state, which replaces the
+    state only once the whole chunk is received. A chunk that fails half-way
+    leaves the session at the end of the previous one, so the client
+    resends that chunk only.
+
+    A session is dropped after ``idle_timeout`` seconds without a chunk.
+    The store does no I/O and is thread-safe: chunks of different sessions
+    are hashed at the same time, outside of the lock. It lives in the
+    worker, or in the shared session process when there are several workers
+    (see :class:`SessionStoreServer`).
+    """
+
+    def __init__(self, max_sessions: int, idle_timeout: float, block_size: int):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.block_size = block_size
+        self._sessions: dict[str, _Session] = {}
+        # Session ids in expiry order: the timeout is the same for every one
+        self._expiry: OrderedDict[str, float] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _info(self, session: _Session) -> dict:
+        return {
+            "session_id": session.session_id,
+            "algorithms": list(session.hasher.hashers),
+            "filename": session.filename,
+            "offset": session.offset,
+            "created_at": session.created_at,
+            "updated_at": session.updated_at,
+            "expires_at": session.updated_at + self.idle_timeout,
+        }
+
+    def _touch(self, session: _Session, now: float) -> None:
+        session.updated_at = time.time()
+        self._expiry[session.session_id] = now + self.idle_timeout
+        self._expiry.move_to_end(session.session_id)
+
+    def _evict(self, session_id: str) -> _Session | None:
+        self._expiry.pop(session_id, None)
+        return self._sessions.pop(session_id, None)
+
+    def _purge(self, now: float) -> None:
+        while self._expiry:
+            session_id, expires_at = next(iter(self._expiry.items()))
+            if expires_at > now:
+                return
+            self._evict(session_id)
+
+    def _get(self, session_id: str) -> _Session:
+        self._purge(time.monotonic())
+        session = self._sessions.get(session_id)
+        if session is None:
+            raise _not_found()
+        return session
+
+    def create(
+        self,
+        session_id: str,
+        algorithms: list[str],
+        filename: str,
+    ) -> dict | None:
+        """Open a session, or return None if the store is full."""
+        now = time.monotonic()
+        with self._lock:
+            self._purge(now)
+            if len(self._sessions) >= self.max_sessions:
+                return None
+            created_at = time.time()
+            session = _Session(
+                session_id=session_id,
+                filename=filename,
+                hasher=MultiHash(algorithms=algorithms, block_size=self.block_size),
+                created_at=created_at,
+                updated_at=created_at,
+            )
+            self._sessions[session_id] = session
+            self._touch(session, now)
+            return self._info(session)
+
+    def info(self, session_id: str) -> dict | None:
+        """State of a session, or None if it is unknown or expired."""
+        with self._lock:
+            try:
+                return self._info(self._get(session_id))
+            except SessionError:
+                return None
+
+    def begin(self, session_id: str, offset: int) -> MultiHash:
+        """Start appending the chunk at ``offset``.
+
+        Returns:
+            MultiHash: A copy of the hash state, to feed the chunk to and
+                hand to :meth:`commit`, or to drop after :meth:`abort`.
+
+        Raises:
+            SessionError (404): If the session is unknown or expired.
+            SessionError (409): If ``offset`` is not the size received so
+                far, or another chunk is being appended.
+        """
+        with self._lock:
+            session = self._get(session_id)
+            if session.appending:
+                raise SessionError(
+                    status.HTTP_409_CONFLICT,
+                    "A chunk is already being appended to this session.",
+                )
+            if offset != session.offset:
+                raise SessionError(
+                    status.HTTP_409_CONFLICT,
+                    f"Offset mismatch: the next chunk starts at {session.offset}.",
+                )
+            session.appending = True
+            self._touch(session, time.monotonic())
+            return session.hasher.copy()
+
+    def commit(self, session_id: str, hasher: MultiHash, size: int) -> dict:
+        """Make the state of a fully received chunk the state of the session.
+
+        Raises:
+            SessionError (404): If the session was deleted or expired while
+                the chunk was received.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._purge(now)
+            session = self._sessions.get(session_id)
+            if session is None or not session.appending:
+                raise _not_found()
+            session.hasher = hasher
+            session.offset += size
+            session.appending = False
+            self._touch(session, now)
+            return self._info(session)
+
+    def abort(self, session_id: str) -> None:
+        """Drop the chunk being appended, the session stays where it was."""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session.appending = False
+
+    def append(self, session_id: str, offset: int, chunks: Iterable[bytes]) -> dict:
+        """Hash the pieces of a chunk, see :meth:`begin` and :meth:`commit`."""
+        hasher = self.begin(session_id, offset)
+        size = 0
+        try:
+            for chunk in chunks:
+                hasher.update(chunk)
+                size += len(chunk)
+            hasher.flush()
+        except BaseException:
+            self.abort(session_id)
+            raise
+        return self.commit(session_id, hasher, size)
+
+    def finish(self, session_id: str) -> dict:
+        """Close a session and return its state with the digest of every algorithm.
+
+        Raises:
+            SessionError (404): If the session is unknown or expired.
+            SessionError (409): If a chunk is being appended.
+        """
+        with self._lock:
+            session = self._get(session_id)
+            if session.appending:
+                raise SessionError(
+                    status.HTTP_409_CONFLICT,
+                    "A chunk is still being appended to this session.",
+                )
+            self._evict(session_id)
+            info = self._info(session)
+            info["hashes"] = session.hasher.hexdigests()
+            return info
+
+    def delete(self, session_id: str) -> bool:
+        """Drop a session. False if it was unknown."""
+        with self._lock:
+            return self._evict(session_id) is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._purge(time.monotonic())
+            return len(self._sessions)
+
+
+def _receive(conn: Connection) -> Iterator[bytes]:
+    # Accept the chunk, then read its pieces up to the empty end marker
+    conn.send(None)
+    while chunk := conn.recv_bytes():
+        yield chunk
+
+
+class SessionStoreServer:
+    """Session store shared by all uvicorn workers over a Unix socket.
+
+    The hash state of ``hashlib`` can not be pickled, so the state never
+    leaves this process: the worker receiving a chunk forwards its pieces
+    here as they arrive. The protocol is the one of the key pool, one
+    short-lived authenticated connection per call, and an ``append`` keeps
+    its connection for the whole chunk.
+    """
+
+    COMMANDS = ("create", "info", "finish", "delete")
+
+    def __init__(self, config: SessionsConfig):
+        self.config = config
+        self.store = SessionStore(
+            config.max_sessions,
+            config.idle_timeout,
+            settings.hashing.block_size,
+        )
+
+    def handle(self, conn: Connection) -> None:
+        with conn:
+            try:
+                command, *args = conn.recv()
+                try:
+                    if command == "append":
+                        session_id, offset = args
+                        result = self.store.append(session_id, offset, _receive(conn))
+                    elif command in self.COMMANDS:
+                        result = getattr(self.store, command)(*args)
+                    else:
+                        return
+                except SessionError as exc:
+                    result = exc
+                conn.send(result)
+            except (EOFError, OSError, ValueError):
+                pass
+
+    def serve_forever(self) -> None:
+        if os.path.exists(self.config.address):
+            os.unlink(self.config.address)
+        listener = Listener(
+            address=self.config.address,
+            family="AF_UNIX",
+            authkey=self.config.authkey.encode(),
+        )
+        os.chmod(self.config.address, 0o600)
+        logger.info("Session store serving on %s", self.config.address)
+        with listener:
+            while True:
+                try:
+                    conn = listener.accept()
+                except (AuthenticationError, OSError, EOFError):
+                    continue
+                threading.Thread(
+                    target=self.handle,
+                    args=(conn,),
+                    daemon=True,
+                ).start()
+
+
+def _serve(config: SessionsConfig) -> None:
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    SessionStoreServer(config).serve_forever()
+
+
+def start_session_store(config: SessionsConfig) -> multiprocessing.Process:
+    """Start the shared session store in a background process.
+
+    Must be called before the uvicorn workers are started: if no
+    authentication key is configured, a random one is generated and
+    exported to the environment so that the workers inherit it.
+
+    Args:
+        config (SessionsConfig): Session settings.
+
+    Returns:
+        multiprocessing.Process: The running, daemonic, store process.
+    """
+    if config.authkey is None:
+        config.authkey = os.urandom(16).hex()
+        os.environ["APP_CONFIG__SESSIONS__AUTHKEY"] = config.authkey
+    process = multiprocessing.get_context("spawn").Process(
+        target=_serve,
+        args=(config,),
+        name="keyforge-sessions",
+        daemon=True,
+    )
+    process.start()
+    return process
+
+
+def _http_error(exc: SessionError) -> HTTPException:
+    return HTTPException(status_code=exc.status_code, detail=exc.detail)
+
+
+def _too_large(what: str, limit: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"{what} is too large. Exceeds {limit // (1024 * 1024)} MiB",
+    )
+
+
+class SessionManager:
+    """Worker side of the resumable upload sessions.
+
+    Without a shared store (single worker, tests) the sessions are kept,
+    and their chunks hashed, by a :class:`SessionStore` of the worker.
+    """
+
+    def __init__(self, config: SessionsConfig):
+        self.config = config
+        self.local = SessionStore(
+            config.max_sessions,
+            config.idle_timeout,
+            settings.hashing.block_size,
+        )
+
+    @property
+    def shared(self) -> bool:
+        return self.config.shared and self.config.authkey is not None
+
+    @property
+    def max_chunk(self) -> int:
+        return self.config.max_chunk_mib << 20
+
+    @property
+    def max_size(self) -> int:
+        return self.config.max_size_gib << 30
+
+    def _connect(self) -> Connection:
+        return Client(
+            self.config.address,
+            family="AF_UNIX",
+            authkey=self.config.authkey.encode(),
+        )
+
+    def _recv(self, conn: Connection):
+        if not conn.poll(self.config.timeout):
+            raise TimeoutError("Session store did not answer in time")
+        result = conn.recv()
+        if isinstance(result, SessionError):
+            raise result
+        return result
+
+    def _request(self, *message):
+        with self._connect() as conn:
+            conn.send(message)
+            return self._recv(conn)
+
+    def _begin(self, session_id: str, offset: int) -> Connection:
+        conn = self._connect()
+        try:
+            conn.send(("append", session_id, offset))
+            self._recv(conn)
+        except BaseException:
+            conn.close()
+            raise
+        return conn
+
+    def _end(self, conn: Connection) -> dict:
+        conn.send_bytes(b"")
+        return self._recv(conn)
+
+    async def _store(self, func, *args):
+        # A call of the store, in a thread when it is shared, whose errors
+        # become HTTP errors. Errors of the request stream pass through.
+        try:
+            if not self.shared:
+                return func(*args)
+            return await run_in_threadpool(func, *args)
+        except SessionError as exc:
+            raise _http_error(exc) from None
+        except _STORE_ERRORS as exc:
+            raise self._unavailable(exc) from None
+
+    async def _call(self, command: str, *args):
+        if not self.shared:
+            return await self._store(getattr(self.local, command), *args)
+        return await self._store(self._request, command, *args)
+
+    @staticmethod
+    def _unavailable(exc: Exception) -> HTTPException:
+        logger.warning("Session store is unavailable: %s", exc)
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Session store is unavailable, retry later.",
+            headers={"Retry-After": "1"},
+        )
+
+    async def create(self, algorithms: list[str], filename: str) -> dict:
+        """Open a session.
+
+        Raises:
+            HTTPException (503): If too many sessions are open.
+        """
+        session_id = f"{settings.optl.service_name}.{secrets.token_urlsafe(16)}"
+        info = await self._call("create", session_id, algorithms, filename)
+        if info is None:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many upload sessions, retry later.",
+                headers={"Retry-After": "1"},
+            )
+        return info
+
+    async def info(self, session_id: str) -> dict | None:
+        """State of a session, or None if it is unknown or expired."""
+        return await self._call("info", session_id)
+
+    async def _limited(
+        self,
+        chunks: AsyncIterator[bytes],
+        offset: int,
+    ) -> AsyncIterator[bytes]:
+        size = 0
+        async for chunk in chunks:
+            if not chunk:
+                continue
+            size += len(chunk)
+            if size > self.max_chunk:
+                raise _too_large("Chunk", self.max_chunk)
+            if offset + size > self.max_size:
+                raise _too_large("File", self.max_size)
+            yield chunk
+
+    async def append(
+        self,
+        session_id: str,
+        offset: int,
+        chunks: AsyncIterator[bytes],
+    ) -> dict:
+        """Hash a chunk as it is received and move the session past it.
+
+        The session is checked before the first byte is read. If the chunk
+        is not received completely, the session stays at ``offset``.
+
+        Args:
+            session_id (str): Id of the session.
+            offset (int): Position of the chunk in the file, which must be
+                the number of bytes received so far.
+            chunks (AsyncIterator[bytes]): The pieces of the chunk, e.g. the
+                request stream.
+
+        Returns:
+            dict: The state of the session after the chunk.
+
+        Raises:
+            HTTPException (404): If the session is unknown or expired.
+            HTTPException (409): If ``offset`` is not the expected one, or
+                another chunk of the session is being appended.
+            HTTPException (413): If the chunk or the file is too large.
+        """
+        chunks = self._limited(chunks, offset)
+        if not self.shared:
+            hasher = await self._call("begin", session_id, offset)
+            size = 0
+            try:
+                async for chunk in chunks:
+                    await hasher.aupdate(chunk)
+                    size += len(chunk)
+                await hasher.aflush()
+            except BaseException:
+                self.local.abort(session_id)
+                raise
+            return await self._call("commit", session_id, hasher, size)
+        conn = await self._store(self._begin, session_id, offset)
+        # Closing the connection early makes the store drop the chunk
+        with conn:
+            async for chunk in chunks:
+                await self._store(conn.send_bytes, chunk)
+            return await self._store(self._end, conn)
+
+    async def finish(self, session_id: str) -> dict:
+        """Close a session and return its state and digests.
+
+        Raises:
+            HTTPException (404): If the session is unknown or expired.
+            HTTPException (409): If a chunk is being appended.
+        """
+        return await self._call("finish", session_id)
+
+    async def delete(self, session_id: str) -> bool:
+        """Drop a session. False if it was unknown."""
+        return await self._call("delete", session_id)
+
+
+sessions = SessionManager(settings.sessions)
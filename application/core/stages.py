@@ -0,0 +1,157 @@
+import math
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncContextManager, AsyncIterator
+
+from opentelemetry import trace
+from prometheus_client import Histogram
+
+from core.metrics import OPERATIONS_IN_FLIGHT, STAGE_SECONDS
+
+tracer = trace.get_tracer(__name__)
+
+# Stages recorded by the endpoints
+QUEUE = "queue"  # Waiting for an admission slot and/or Argon2 memory
+WORKER_WAIT = "worker-wait"  # Waiting for a free engine process or thread
+COMPUTE = "compute"  # The cryptographic operation itself
+ENCRYPT = "encrypt"  # PEM encryption of a pre-generated private key
+KEYPOOL = "keypool"  # Taking a key from the shared key pool
+UPLOAD = "upload"  # Receiving and parsing the body, hashed on the fly
+DIGEST = "digest"  # Finalizing the digests of an upload
+SERIALIZE = "serialize"  # Rendering the JSON response
+
+_current: ContextVar["StageTimer | None"] = ContextVar("keyforge_stages", default=None)
+# Histogram children by label values, labels() is comparatively slow
+_histograms: dict[tuple[str, str, str], Histogram] = {}
+
+
+def argon2_class(memory_cost: int) -> str:
+    """Parameter class of an Argon2 hash: its memory rounded up to a power of two MiB.
+
+    Keeps the label cardinality bounded whatever memory_cost clients send.
+    """
+    mib = max(math.ceil(memory_cost / 1024), 1)
+    return f"argon2-{2 ** math.ceil(math.log2(mib))}mib"
+
+
+class StageTimer:
+    """Records where the time of one request goes.
+
+    Every stage is observed in the ``keyforge_stage_seconds`` histogram,
+    labelled with the endpoint, the parameter class (key size, algorithm,
+    cost, ...) and the stage. When the request span is sampled, every stage
+    also becomes a child span of it; when it is not, no span is created at
+    all and a stage costs two clock reads and a histogram observation.
+
+    Used as a context manager inside the request span, the timer counts the
+    request in ``keyforge_operations_in_flight`` and is made current so that
+    the compute engine and the password executor can report how long the
+    task waited for a worker (see :func:`record_wait`).
+    Stages can nest: ``worker-wait`` is part of the enclosing ``compute``
+    or ``encrypt`` stage.
+    """
+
+    def __init__(self, endpoint: str, param_class: str):
+        """Initialize a timer for the current request span.
+
+        Args:
+            endpoint (str): Name of the endpoint, e.g. 'genrsa-private-key'.
+            param_class (str): Parameter class of the request, e.g. 'rsa-4096'.
+        """
+        self.endpoint = endpoint
+        self.param_class = param_class
+        self.recording = trace.get_current_span().is_recording()
+        self._token = None
+
+    def __enter__(self) -> "StageTimer":
+        self._in_flight = OPERATIONS_IN_FLIGHT.labels(self.endpoint)
+        self._in_flight.inc()
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        _current.reset(self._token)
+        self._in_flight.dec()
+
+    def _histogram(self, stage: str) -> Histogram:
+        key = (self.endpoint, self.param_class, stage)
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = STAGE_SECONDS.labels(*key)
+        return histogram
+
+    def record(self, stage: str, start_ns: int, end_ns: int) -> None:
+        """Record a stage that has already happened.
+
+        Args:
+            stage (str): Name of the stage.
+            start_ns (int): Start, in nanoseconds since the epoch.
+            end_ns (int): End, in nanoseconds since the epoch.
+        """
+        self._histogram(stage).observe(max(end_ns - start_ns, 0) / 1e9)
+        if self.recording:
+            tracer.start_span(stage, start_time=start_ns).end(end_time=end_ns)
+
+    def stage(self, stage: str) -> "_Stage":
+        """Time the ``with`` block as ``stage``.
+
+        The duration is available as ``seconds`` on the value bound by
+        ``with ... as``, once the block is over.
+        """
+        return _Stage(self, stage)
+
+    @asynccontextmanager
+    async def queued(self, *managers: AsyncContextManager) -> AsyncIterator[None]:
+        """Enter ``managers`` (admission slots, memory reservations) as the queue stage.
+
+        Only the wait for them is timed, they are held for the whole block.
+        """
+        async with AsyncExitStack() as stack:
+            with self.stage(QUEUE):
+                for manager in managers:
+                    await stack.enter_async_context(manager)
+            yield
+
+
+class _Stage:
+    """Context manager of :meth:`StageTimer.stage`.
+
+    A plain class rather than a generator based context manager: it is
+    entered several times per request, and this is cheaper.
+    """
+
+    __slots__ = ("timer", "name", "start_ns", "span", "seconds")
+
+    def __init__(self, timer: StageTimer, name: str):
+        self.timer = timer
+        self.name = name
+        self.span = None
+        self.seconds = 0.0
+
+    def __enter__(self) -> "_Stage":
+        self.start_ns = time.time_ns()
+        if self.timer.recording:
+            self.span = tracer.start_as_current_span(
+                self.name, start_time=self.start_ns
+            )
+            self.span.__enter__()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.seconds = (time.time_ns() - self.start_ns) / 1e9
+        self.timer._histogram(self.name).observe(self.seconds)
+        if self.span is not None:
+            self.span.__exit__(*exc_info)
+
+
+def record_wait(submitted_ns: int, started_ns: int) -> None:
+    """Record the worker-wait stage of the current request, if it has a timer.
+
+    Args:
+        submitted_ns (int): When the task was handed to the executor.
+        started_ns (int): When a worker started running it.
+    """
+    timer = _current.get()
+    if timer is not None:
+        timer.record(WORKER_WAIT, submitted_ns, started_ns)
@@ -0,0 +1,214 @@
+from dataclasses import dataclass
+from enum import Enum
+from typing import AsyncIterator, Awaitable, Callable
+
+from fastapi import HTTPException, Request, status
+
+try:
+    import python_multipart as multipart
+    from python_multipart.multipart import parse_options_header
+except ModuleNotFoundError:  # pragma: no cover
+    import multipart
+    from multipart.multipart import parse_options_header
+
+
+class PartEvent(Enum):
+    BEGIN = 1
+    DATA = 2
+    END = 3
+
+
+@dataclass
+class UploadPart:
+    name: str
+    filename: str | None
+    content_type: str | None
+
+
+@dataclass
+class UploadInfo:
+    filename: str
+    size: int
+
+
+class MultipartStream:
+    """Incremental multipart/form-data parser over the ASGI receive stream.
+
+    Unlike Starlette's form parser, the parts are never spooled to memory or
+    to temporary files: the body is fed to python-multipart chunk by chunk
+    as it is received and every chunk is yielded as an event:
+
+    - ``(PartEvent.BEGIN, UploadPart)`` once the headers of a part are parsed
+    - ``(PartEvent.DATA, bytes)`` for every portion of the part's data
+    - ``(PartEvent.END, None)`` when the part is complete
+    """
+
+    def __init__(self, content_type: str, stream: AsyncIterator[bytes]):
+        _, params = parse_options_header(content_type)
+        boundary = params.get(b"boundary")
+        if not boundary:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Missing multipart boundary.",
+            )
+        self.stream = stream
+        self._events: list[tuple[PartEvent, UploadPart | bytes | None]] = []
+        self._headers: dict[bytes, bytes] = {}
+        self._header_field = b""
+        self._header_value = b""
+        self._parser = multipart.MultipartParser(
+            boundary,
+            {
+                "on_part_begin": self._on_part_begin,
+                "on_part_data": self._on_part_data,
+                "on_part_end": self._on_part_end,
+                "on_header_field": self._on_header_field,
+                "on_header_value": self._on_header_value,
+                "on_header_end": self._on_header_end,
+                "on_headers_finished": self._on_headers_finished,
+            },
+        )
+
+    def _on_part_begin(self) -> None:
+        self._headers = {}
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        self._events.append((PartEvent.DATA, data[start:end]))
+
+    def _on_part_end(self) -> None:
+        self._events.append((PartEvent.END, None))
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = self._header_value = b""
+
+    def _on_headers_finished(self) -> None:
+        _, options = parse_options_header(
+            self._headers.get(b"content-disposition", b""),
+        )
+        filename = options.get(b"filename")
+        content_type = self._headers.get(b"content-type")
+        self._events.append(
+            (
+                PartEvent.BEGIN,
+                UploadPart(
+                    name=options.get(b"name", b"").decode("latin-1"),
+                    filename=None if filename is None else filename.decode("utf-8"),
+                    content_type=(
+                        None if content_type is None else content_type.decode("latin-1")
+                    ),
+                ),
+            )
+        )
+
+    async def __aiter__(self):
+        try:
+            async for chunk in self.stream:
+                self._parser.write(chunk)
+                events, self._events = self._events, []
+                for event in events:
+                    yield event
+            self._parser.finalize()
+        except multipart.exceptions.MultipartParseError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Malformed multipart body.",
+            )
+        for event in self._events:
+            yield event
+        self._events = []
+
+
+def _check_content_length(request: Request, limit: int, overhead: int) -> None:
+    content_length = request.headers.get("content-length")
+    if content_length is not None and content_length.isdigit():
+        if int(content_length) > limit + overhead:
+            raise _too_large(limit)
+
+
+def _too_large(limit: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"File is too large. Exceeds {limit // (1024 * 1024)} MiB",
+    )
+
+
+async def stream_upload(
+    request: Request,
+    sink: Callable[[bytes], Awaitable[None]],
+    limit: int,
+    field: str = "file",
+    filename: str | None = None,
+) -> UploadInfo:
+    """Feed an uploaded file to ``sink`` straight from the receive stream.
+
+    Two request bodies are supported:
+
+    - ``multipart/form-data``: the content of the ``field`` file part is
+      streamed through :class:`MultipartStream`; other parts are skipped.
+    - ``application/octet-stream`` (or any other non-form type): the raw
+      body is the file content.
+
+    Nothing is written to disk and memory stays constant regardless of the
+    file size.
+
+    Args:
+        request (Request): The incoming request, whose body was not read yet.
+        sink (Callable[[bytes], Awaitable[None]]): Awaited with every chunk
+            of the file.
+        limit (int): Maximum file size in bytes.
+        field (str): Name of the multipart file field.
+        filename (str | None): File name reported for raw bodies.
+
+    Returns:
+        UploadInfo: The file name and the number of bytes fed to ``sink``.
+
+    Raises:
+        HTTPException (413): If the file exceeds ``limit``.
+        HTTPException (400): If the multipart body is malformed.
+        HTTPException (422): If the multipart body has no ``field`` part.
+    """
+    content_type = request.headers.get("content-type", "")
+    size = 0
+    if not content_type.startswith("multipart/form-data"):
+        _check_content_length(request, limit, overhead=0)
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > limit:
+                raise _too_large(limit)
+            await sink(chunk)
+        return UploadInfo(filename=filename or "upload", size=size)
+
+    # Allow for the boundaries and part headers of a multipart body
+    _check_content_length(request, limit, overhead=64 * 1024)
+    found, in_file, complete = None, False, False
+    async for event, value in MultipartStream(content_type, request.stream()):
+        if event is PartEvent.BEGIN:
+            in_file = found is None and value.name == field
+            if in_file:
+                found = value.filename or field
+        elif event is PartEvent.DATA and in_file:
+            size += len(value)
+            if size > limit:
+                raise _too_large(limit)
+            await sink(value)
+        elif event is PartEvent.END:
+            complete = complete or in_file
+            in_file = False
+    if found is None:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Missing file field '{field}'.",
+        )
+    if not complete:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Incomplete multipart body.",
+        )
+    return UploadInfo(filename=found, size=size)
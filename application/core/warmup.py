@@ -0,0 +1,64 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class WarmUp:
+    """Startup work that a worker needs before it is ready for traffic.
+
+    Steps are registered with :meth:`add` and run concurrently by
+    :meth:`run`, from the application lifespan. The worker may accept
+    requests while they run: anything a step prepares is otherwise done
+    lazily by the first request that needs it, only slower. The readiness
+    endpoint reports :attr:`ready` and the duration of every step, so an
+    orchestrator can hold traffic back until the warm-up is done.
+    """
+
+    def __init__(self):
+        self._steps: dict[str, Callable[[], Awaitable[object]]] = {}
+        self.timings: dict[str, float] = {}
+        self.failed: list[str] = []
+        self.ready = False
+
+    def add(self, name: str, step: Callable[[], Awaitable[object]]) -> None:
+        """Register a step, replacing any step of the same name.
+
+        Args:
+            name (str): Name of the step in logs and the readiness report.
+            step (Callable[[], Awaitable[object]]): Coroutine function doing
+                the work; blocking work belongs in the thread pool.
+        """
+        self._steps[name] = step
+
+    async def _run_step(self, name: str, step: Callable[[], Awaitable[object]]):
+        start = time.perf_counter()
+        try:
+            await step()
+        except Exception:
+            # The first request that needs it retries the work
+            logger.exception("Warm-up step %s failed", name)
+            self.failed.append(name)
+        self.timings[name] = time.perf_counter() - start
+
+    async def run(self) -> None:
+        """Run every registered step and mark the worker as ready."""
+        start = time.perf_counter()
+        self.ready = False
+        self.timings.clear()
+        self.failed.clear()
+        await asyncio.gather(
+            *(self._run_step(name, step) for name, step in self._steps.items())
+        )
+        self.ready = True
+        steps = ", ".join(
+            f"{name} {seconds:.3f} s" for name, seconds in self.timings.items()
+        )
+        logger.info(
+            "Worker warmed up in %.3f s (%s)", time.perf_counter() - start, steps
+        )
+
+
+warm_up = WarmUp()
@@ -1,11 +1,23 @@
+import asyncio
 import logging
+import os
+from contextlib import asynccontextmanager, suppress
+from functools import partial
 
 from fastapi import FastAPI
-import uvicorn
 from fastapi.responses import ORJSONResponse
 
 from api import router as api_router
+from core.calibration import calibrator
 from core.config import settings
+from core.engine import engine
+from core.jobs import jobs, start_job_store
+from core.sessions import start_session_store
+from core.keycache import public_key_cache
+from core.keypool import start_key_pool
+from core.keysengine import warm_up_crypto
+from core.resources import available_cpus, default_workers
+from core.warmup import warm_up
 from fastapi.middleware.cors import CORSMiddleware
 from prometheus_fastapi_instrumentator import Instrumentator
 
@@ -18,16 +30,49 @@ import orjson
 class EndpointFilter(logging.Filter):
     # Uvicorn endpoint access log filter
     def filter(self, record: logging.LogRecord) -> bool:
-        excluded_paths = ["GET /metrics", "GET /utils/health-check"]
+        excluded_paths = [
+            "GET /metrics",
+            "GET /utils/health-check",
+            "GET /utils/ready",
+        ]
         return not any(path in record.getMessage() for path in excluded_paths)
 
 
 # Filter out /endpoint
 logging.getLogger("uvicorn.access").addFilter(EndpointFilter())
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Compute engine process pool lives as long as the worker
+    engine.start()
+    # Not inherited from the server process that imported the app
+    public_key_cache.reset()
+    warm_up_task = None
+    if settings.startup.background_warm_up:
+        warm_up_task = asyncio.create_task(warm_up.run())
+    else:
+        await warm_up.run()
+    yield
+    if warm_up_task is not None:
+        warm_up_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await warm_up_task
+    await jobs.drain(settings.jobs.drain_timeout)
+    engine.shutdown()
+
+
+if settings.startup.warm_up_engine:
+    warm_up.add("engine", partial(engine.warm_up, warm_up_crypto))
+if settings.calibration.on_startup:
+    # Keeps a cost model measured by the server process before the fork
+    warm_up.add("calibration", calibrator.get)
+
+
 app = FastAPI(
     title=settings.project_name,
     default_response_class=ORJSONResponse,
+    lifespan=lifespan,
 )
 
 # Setting OpenTelemetry exporter
@@ -53,21 +98,86 @@ app.add_middleware(
 exception_handler(app=app)
 
 
+def preload() -> None:
+    """Warm-up done once in the server process, shared by the forked workers."""
+    warm_up_crypto()
+    app.openapi()
+    if settings.calibration.on_startup:
+        calibrator.preload()
+
+
+def worker_count() -> int:
+    """Configured number of workers, or as many as the container fits."""
+    if settings.workers.workers is not None:
+        return settings.workers.workers
+    return default_workers(
+        memory_per_worker=(settings.workers.memory_per_worker_mib << 20)
+        + settings.argon2_budget.budget_kib * 1024,
+    )
+
+
+def share_engine_processes(workers: int) -> None:
+    """Split the available CPUs between the compute engines of the workers.
+
+    Each worker runs its own engine, by default with one process per CPU:
+    N workers would start N * N engine processes. Unless
+    ``APP_CONFIG__ENGINE__PROCESSES`` is set, every engine gets its share of
+    the CPUs instead, exported to the environment for spawned workers.
+    """
+    if settings.engine.processes is not None:
+        return
+    engine.processes = max(1, available_cpus() // workers)
+    os.environ["APP_CONFIG__ENGINE__PROCESSES"] = str(engine.processes)
+
+
 if __name__ == "__main__":
+    import uvicorn
+
+    from core.prefork import PreforkServer
+
     log_config = uvicorn.config.LOGGING_CONFIG
     log_config["formatters"]["access"]["fmt"] = (
         "%(asctime)s %(levelname)s [%(name)s] [%(filename)s:%(lineno)d] "
         "[trace_id=%(otelTraceID)s span_id=%(otelSpanID)s resource.service.name=%(otelServiceName)s] "
         "- trace_sampled=%(otelTraceSampled)s - %(message)s"
     )
-    uvicorn.run(
-        "main:app",
+    key_pool_process = None
+    if settings.keypool.enabled:
+        # Started before the workers so that they inherit the pool authkey
+        key_pool_process = start_key_pool(settings.keypool)
+    workers = worker_count()
+    share_engine_processes(workers)
+    if settings.jobs.enabled and settings.jobs.shared and workers > 1:
+        # Any worker can then answer for the jobs of the others
+        start_job_store(settings.jobs)
+    if settings.sessions.enabled and settings.sessions.shared and workers > 1:
+        # Any worker can then take the next chunk of any session
+        start_session_store(settings.sessions)
+    server_options = dict(
         host=settings.runtime.host,
         port=settings.runtime.port,
-        reload=settings.runtime.reload,
-        workers=settings.workers.workers,
         log_config=log_config,
         proxy_headers=True,
         forwarded_allow_ips="*",
         server_header=False,
     )
+    if settings.workers.preload and not settings.runtime.reload:
+        preload()
+        max_rss_mib = settings.workers.max_rss_mib
+        PreforkServer(
+            uvicorn.Config(app, **server_options),
+            workers=workers,
+            max_requests=settings.workers.max_requests,
+            max_requests_jitter=settings.workers.max_requests_jitter,
+            max_rss=None if max_rss_mib is None else max_rss_mib << 20,
+        ).run()
+    else:
+        uvicorn.run(
+            "main:app",
+            reload=settings.runtime.reload,
+            workers=workers,
+            limit_max_requests=settings.workers.max_requests,
+            **server_options,
+        )
+    if key_pool_process is not None:
+        key_pool_process.terminate()
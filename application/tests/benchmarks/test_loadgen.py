@@ -0,0 +1,81 @@
+import random
+
+import pytest
+from httpx import AsyncClient
+
+from benchmarks.loadgen import (
+    LatencyHistogram,
+    LoadGenerator,
+    Scenario,
+    arrivals,
+    create_fixtures,
+)
+
+
+def test_histogram_percentiles_are_within_precision():
+    histogram = LatencyHistogram()
+    for milliseconds in range(1, 1001):
+        histogram.record(milliseconds / 1000)
+
+    summary = histogram.summary()
+
+    assert summary["min"] == 0.001
+    assert summary["max"] == 1.0
+    assert summary["mean"] == pytest.approx(0.5005)
+    for percentile in (50, 90, 99):
+        assert histogram.percentile(percentile) == pytest.approx(
+            percentile / 100, rel=0.02
+        )
+
+
+def test_histogram_merge():
+    first, second = LatencyHistogram(), LatencyHistogram()
+    first.record(0.001)
+    second.record(0.002)
+
+    first.merge(second)
+
+    assert first.count == 2
+    assert first.percentile(100) == pytest.approx(0.002, rel=0.02)
+
+
+def test_constant_and_ramp_arrivals():
+    assert len(list(arrivals("constant", rate=10, duration=2))) == 19
+
+    ramp = list(arrivals("ramp", rate=10, duration=10, ramp_to=30))
+    first_gap, last_gap = ramp[1] - ramp[0], ramp[-1] - ramp[-2]
+    assert first_gap == pytest.approx(0.1, rel=0.05)
+    assert last_gap == pytest.approx(1 / 30, rel=0.05)
+    assert 180 < len(ramp) < 220
+
+
+def test_poisson_arrivals_rate():
+    offsets = list(arrivals("poisson", rate=100, duration=50, rng=random.Random(1)))
+
+    assert len(offsets) == pytest.approx(5000, rel=0.05)
+    assert offsets == sorted(offsets)
+
+
+@pytest.mark.asyncio
+async def test_load_generator_in_process(client: AsyncClient):
+    mix = [
+        Scenario("token", "GET", "/api/random-token", weight=3),
+        Scenario(
+            "public-key",
+            "POST",
+            "/api/gen-public-key",
+            json={"private_key": "$private_key"},
+        ),
+        Scenario("missing", "GET", "/api/missing", weight=1),
+    ]
+    generator = LoadGenerator(client=client, mix=mix, max_in_flight=100, seed=1)
+    generator.prepare(await create_fixtures(client, mix))
+
+    elapsed = await generator.run(arrivals("constant", rate=100, duration=0.5))
+    report = generator.report(elapsed)
+
+    assert report["total"]["sent"] == 49
+    assert report["scenarios"]["token"]["ok"] == report["scenarios"]["token"]["sent"]
+    assert report["scenarios"]["public-key"]["errors"] == 0
+    assert report["scenarios"]["missing"]["error_rate"] == 1.0
+    assert report["total"]["latency"]["p50"] > 0
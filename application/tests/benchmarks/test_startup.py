@@ -0,0 +1,33 @@
+import pytest
+
+from benchmarks.startup import parse_importtime, summarize_imports
+
+IMPORTTIME = """\
+import time: self [us] | cumulative | imported package
+import time:       100 |        100 |     fastapi.types
+import time:      2000 |       2100 |   fastapi
+import time:       300 |        300 |   core.config
+import time:       500 |       2900 | main
+"""
+
+
+def test_parse_importtime():
+    modules = parse_importtime(IMPORTTIME)
+
+    assert [module["name"] for module in modules] == [
+        "fastapi.types",
+        "fastapi",
+        "core.config",
+        "main",
+    ]
+    assert modules[0]["depth"] == 2
+    assert modules[-1]["depth"] == 0
+    assert modules[-1]["cumulative"] == pytest.approx(0.0029)
+
+
+def test_summarize_imports():
+    summary = summarize_imports(parse_importtime(IMPORTTIME), top=2)
+
+    assert summary["total"] == pytest.approx(0.0029)
+    assert summary["packages"] == pytest.approx({"fastapi": 0.0021, "main": 0.0005})
+    assert list(summary["modules"]) == ["fastapi", "main"]
@@ -0,0 +1,51 @@
+import pytest
+
+from benchmarks.suite import Case, compare, machine_metadata, measure
+
+
+def _results(**medians: float) -> dict:
+    return {
+        "metadata": {"cpu_model": "cpu", "cpu_count": 1, "python": "3.12.7"},
+        "results": {name: {"median": median} for name, median in medians.items()},
+    }
+
+
+def test_measure_sync_case():
+    result = measure(
+        Case(name="noop", group="test", func=lambda: None, size=10),
+        rounds=3,
+        min_time=0.001,
+    )
+
+    assert result["rounds"] == 3
+    assert result["loops"] >= 1
+    assert 0 < result["min"] <= result["median"]
+    assert result["bytes_per_second"] == pytest.approx(10 / result["median"])
+
+
+def test_measure_async_case():
+    async def noop() -> None:
+        pass
+
+    result = measure(
+        Case(name="noop", group="test", afunc=noop),
+        rounds=2,
+        min_time=0.001,
+    )
+
+    assert result["median"] > 0
+    assert "bytes_per_second" not in result
+
+
+def test_compare_flags_regressions_above_threshold():
+    baseline = _results(same=1.0, slower=1.0, faster=1.0, removed=1.0)
+    current = _results(same=1.05, slower=1.2, faster=0.5, added=1.0)
+
+    assert compare(baseline, current, threshold=0.1) == ["slower"]
+
+
+def test_machine_metadata():
+    info = machine_metadata()
+
+    assert info["cpu_count"] >= 1
+    assert "cryptography" in info["packages"]
@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException, status
+
+from core.admission import AdmissionController
+from core.config import AdmissionConfig, AdmissionLimit
+
+
+@pytest.fixture
+def controller() -> AdmissionController:
+    return AdmissionController(
+        AdmissionConfig(
+            limits={"rsa-8192": AdmissionLimit(max_in_flight=1, max_queued=1)},
+            default_service_time=3.0,
+        )
+    )
+
+
+async def hold(controller: AdmissionController, release: asyncio.Event):
+    async with controller.acquire("rsa-8192"):
+        await release.wait()
+
+
+@pytest.mark.asyncio
+async def test_admission_rejects_when_full(controller: AdmissionController):
+    release = asyncio.Event()
+    running = asyncio.create_task(hold(controller, release))
+    queued = asyncio.create_task(hold(controller, release))
+    await asyncio.sleep(0)
+
+    with pytest.raises(HTTPException) as exc_info:
+        async with controller.acquire("rsa-8192"):
+            pass
+    assert exc_info.value.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert exc_info.value.headers["Retry-After"] == "6"
+
+    release.set()
+    await asyncio.gather(running, queued)
+
+    async with controller.acquire("rsa-8192"):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_admission_cancelled_waiter_frees_queue(
+    controller: AdmissionController,
+):
+    release = asyncio.Event()
+    running = asyncio.create_task(hold(controller, release))
+    queued = asyncio.create_task(hold(controller, release))
+    await asyncio.sleep(0)
+
+    queued.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await queued
+
+    second = asyncio.create_task(hold(controller, release))
+    await asyncio.sleep(0)
+    release.set()
+    await asyncio.gather(running, second)
+
+
+@pytest.mark.asyncio
+async def test_admission_unknown_class_is_not_limited(
+    controller: AdmissionController,
+):
+    async with controller.acquire("argon2"):
+        async with controller.acquire("argon2"):
+            pass
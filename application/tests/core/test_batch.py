@@ -0,0 +1,102 @@
+import orjson
+import pytest
+from starlette.background import BackgroundTask
+
+from core.batch import (
+    BatchError,
+    BatchStreamingResponse,
+    SlotStreamingResponse,
+    JSONArraySplitter,
+    NDJSONSplitter,
+)
+
+
+def split(splitter, body: bytes, chunk_size: int) -> list[bytes]:
+    items = []
+    for start in range(0, len(body), chunk_size):
+        items += splitter.feed(body[start : start + chunk_size])
+    return items + splitter.close()
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 7, 4096])
+def test_json_array_splitter(chunk_size: int):
+    items = ["a,b", 'quo"te]', "back\\slash\\", {"payload": "[x]", "algorithm": None}]
+    body = b" \n" + orjson.dumps(items) + b"\n"
+
+    raw_items = split(JSONArraySplitter(), body, chunk_size)
+
+    assert [orjson.loads(raw) for raw in raw_items] == items
+
+
+def test_json_array_splitter_empty_array():
+    assert split(JSONArraySplitter(), b"[ ]", 1) == []
+
+
+@pytest.mark.parametrize("body", [b'{"a": 1}', b'"a"', b'["a"'])
+def test_json_array_splitter_rejects_malformed_body(body: bytes):
+    with pytest.raises(BatchError):
+        split(JSONArraySplitter(), body, 1)
+
+
+def test_json_array_splitter_limits_item_size():
+    with pytest.raises(BatchError):
+        split(JSONArraySplitter(max_item_size=8), b'["0123456789"]', 4)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 4096])
+def test_ndjson_splitter(chunk_size: int):
+    body = b'"a"\n\n{"payload": "b"}\r\n"c"'
+
+    raw_items = split(NDJSONSplitter(), body, chunk_size)
+
+    assert [orjson.loads(raw) for raw in raw_items] == ["a", {"payload": "b"}, "c"]
+
+
+@pytest.mark.asyncio
+async def test_batch_response_runs_background_when_the_client_is_gone():
+    released = []
+
+    async def body():
+        yield b"never sent"
+
+    async def send(message):
+        raise OSError("client went away")
+
+    response = BatchStreamingResponse(
+        body(), background=BackgroundTask(released.append, True)
+    )
+    with pytest.raises(OSError):
+        await response({"type": "http"}, None, send)
+
+    assert released == [True]
+
+
+@pytest.mark.asyncio
+async def test_slot_response_runs_background_once_on_every_path():
+    released = []
+
+    async def body():
+        yield b"line\n"
+
+    async def failing():
+        raise RuntimeError("boom")
+        yield b""
+
+    async def send(message):
+        pass
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    scope = {"type": "http", "asgi": {"spec_version": "2.4"}}
+    response = SlotStreamingResponse(
+        body(), background=BackgroundTask(released.append, "sent")
+    )
+    await response(scope, receive, send)
+    response = SlotStreamingResponse(
+        failing(), background=BackgroundTask(released.append, "failed")
+    )
+    with pytest.raises(RuntimeError):
+        await response(scope, receive, send)
+
+    assert released == ["sent", "failed"]
@@ -0,0 +1,104 @@
+import hashlib
+import os
+import subprocess
+
+import orjson
+import pytest
+from httpx import AsyncClient
+
+from core.bulkhash import format_line, hash_path, hash_paths, main, walk
+from core.hashengine import HashModeEnum
+
+
+@pytest.fixture
+def tree(tmp_path):
+    (tmp_path / "sub").mkdir()
+    files = {
+        "big.bin": os.urandom(3 * 1024 * 1024 + 17),
+        "empty": b"",
+        "sub/small.txt": b"hello\n",
+    }
+    for name, data in files.items():
+        (tmp_path / name).write_bytes(data)
+    return tmp_path, files
+
+
+def test_walk_in_name_order(tree):
+    root, _ = tree
+
+    assert list(walk([str(root)])) == [
+        str(root / "big.bin"),
+        str(root / "empty"),
+        str(root / "sub" / "small.txt"),
+    ]
+
+
+def test_hash_paths_matches_hashlib(tree):
+    root, files = tree
+    paths = [str(root / name) for name in files] + [str(root / "missing")]
+
+    results = list(hash_paths(paths, ["sha256", "blake2b"], workers=2))
+
+    assert [path for path, _ in results] == paths
+    for (path, result), data in zip(results, files.values()):
+        assert result.size == len(data)
+        assert result.hash == hashlib.sha256(data).hexdigest()
+        assert result.hashes["blake2b"] == hashlib.blake2b(data).hexdigest()
+    assert isinstance(results[-1][1], FileNotFoundError)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("mode", ["sequential", "tree"])
+async def test_output_identical_to_file_sum(client: AsyncClient, tree, mode: str):
+    root, files = tree
+    path = str(root / "big.bin")
+
+    response = await client.post(
+        "/api/file-sum",
+        params={"algorithm": ["sha256", "md5"], "mode": mode, "filename": path},
+        content=files["big.bin"],
+        headers={"Content-Type": "application/octet-stream"},
+    )
+
+    result = hash_path(path, ["sha256", "md5"], mode=HashModeEnum(mode))
+    assert orjson.loads(result.model_dump_json()) == response.json()
+
+
+def test_text_output_checks_with_sha256sum(tree, capsys):
+    root, _ = tree
+
+    assert main([str(root)]) == 0
+    output = capsys.readouterr().out
+    assert output.count("\n") == 3
+
+    checked = subprocess.run(
+        ["sha256sum", "--check", "--strict"],
+        input=output,
+        capture_output=True,
+        text=True,
+    )
+    assert checked.returncode == 0, checked.stdout + checked.stderr
+
+
+def test_tag_lines_and_escaping(tree):
+    root, _ = tree
+    result = hash_path(str(root / "sub" / "small.txt"), ["sha3_256", "blake2b"])
+    result.filename = "odd\\name"
+
+    digest = hashlib.sha3_256(b"hello\n").hexdigest()
+    assert format_line(result, "sha3_256", tag=True) == (
+        f"\\SHA3-256 (odd\\\\name) = {digest}"
+    )
+    assert format_line(result, "blake2b", tag=False).startswith("\\")
+    assert format_line(result, "blake2b", tag=True).startswith("\\BLAKE2b (")
+
+
+def test_json_output_and_errors(tree, capsys):
+    root, files = tree
+
+    assert main(["--json", "-a", "md5", str(root / "empty"), str(root / "nope")]) == 1
+    captured = capsys.readouterr()
+    [result] = orjson.loads(captured.out)
+    assert result["hash"] == hashlib.md5(b"").hexdigest()
+    assert result["mode"] == "sequential"
+    assert "nope" in captured.err
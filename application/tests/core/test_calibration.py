@@ -0,0 +1,66 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from core.calibration import (
+    ARGON2_MIN_MEMORY_COST,
+    BCRYPT_MAX_ROUNDS,
+    BCRYPT_MIN_ROUNDS,
+    Calibration,
+)
+
+
+@pytest.fixture
+def calibration() -> Calibration:
+    # 50 ms for bcrypt cost 10, 100 ms for Argon2 over 64 MiB in one pass
+    return Calibration(
+        bcrypt_ms_at_probe=50.0,
+        argon2_ms_per_kib_pass=100.0 / 65536,
+        measured_at=datetime.now(timezone.utc),
+        cpu_count=1,
+    )
+
+
+def test_bcrypt_cost_doubles_per_round(calibration: Calibration):
+    assert calibration.bcrypt_ms(11) == 100.0
+    assert calibration.bcrypt_ms(12) == 200.0
+
+
+@pytest.mark.parametrize(
+    "target_ms, rounds",
+    [
+        (1, BCRYPT_MIN_ROUNDS),
+        (99, 10),
+        (100, 11),
+        (250, 12),
+        (100000, BCRYPT_MAX_ROUNDS),
+    ],
+)
+def test_recommend_bcrypt(calibration: Calibration, target_ms: float, rounds: int):
+    recommended = calibration.recommend(target_ms, max_memory_cost=65536)
+    assert recommended.bcrypt_rounds == rounds
+    if BCRYPT_MIN_ROUNDS < rounds < BCRYPT_MAX_ROUNDS:
+        assert recommended.bcrypt_ms <= target_ms
+
+
+@pytest.mark.parametrize(
+    "target_ms, memory_cost, time_cost",
+    [
+        # Memory first, up to the cap
+        (50, 32768, 1),
+        (100, 65536, 1),
+        # Then more passes
+        (250, 65536, 2),
+        (300, 65536, 3),
+        (0.001, ARGON2_MIN_MEMORY_COST, 1),
+    ],
+)
+def test_recommend_argon2(
+    calibration: Calibration,
+    target_ms: float,
+    memory_cost: int,
+    time_cost: int,
+):
+    recommended = calibration.recommend(target_ms, max_memory_cost=65536)
+    assert recommended.argon2_memory_cost == memory_cost
+    assert recommended.argon2_time_cost == time_cost
@@ -0,0 +1,52 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from core.entropy import EntropyPool, TokenEncodingEnum
+
+
+def test_entropy_pool_hands_out_fresh_bytes():
+    pool = EntropyPool(size=64)
+
+    chunks = [pool.take(16) for _ in range(12)]
+
+    assert all(len(chunk) == 16 for chunk in chunks)
+    assert len(set(chunks)) == len(chunks)
+
+
+def test_entropy_pool_wipes_taken_bytes():
+    pool = EntropyPool(size=64)
+
+    pool.take(16)
+    pool.take(16)
+
+    assert pool._buffer[:32] == bytes(32)
+    assert pool._buffer[32:] != bytes(32)
+
+
+def test_entropy_pool_large_request():
+    pool = EntropyPool(size=64)
+
+    assert len(pool.take(100)) == 100
+
+
+def test_entropy_pool_tokens_in_chunks():
+    pool = EntropyPool()
+
+    chunks = list(pool.tokens(length=16, count=600, encoding=TokenEncodingEnum.HEX))
+
+    assert [len(chunk) for chunk in chunks] == [256, 256, 88]
+    tokens = [token for chunk in chunks for token in chunk]
+    assert len(set(tokens)) == 600
+    assert all(len(token) == 32 for token in tokens)
+
+
+def test_entropy_pool_is_thread_safe():
+    pool = EntropyPool(size=4096)
+
+    def take(_) -> list[bytes]:
+        return [pool.take(16) for _ in range(2000)]
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        chunks = [chunk for batch in executor.map(take, range(4)) for chunk in batch]
+
+    assert len(set(chunks)) == len(chunks) == 8000
+    assert bytes(16) not in chunks
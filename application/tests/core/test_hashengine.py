@@ -0,0 +1,86 @@
+import hashlib
+import os
+from io import BytesIO
+
+import pytest
+
+from core.hashengine import HashLib, MultiHash, TreeHash
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        b"",
+        os.urandom(1024 * 1024 + 17),
+        b"\n" * 100_000,
+    ],
+    # Random parameters would make random test ids, which differ between
+    # pytest-xdist workers
+    ids=["empty", "random", "newlines"],
+)
+def test_hash_file(data: bytes):
+    expected = hashlib.sha256(data).hexdigest()
+
+    assert HashLib("sha256").hash_file(BytesIO(data), block_size=4096) == expected
+
+
+@pytest.mark.asyncio
+async def test_ahash_file():
+    data = os.urandom(300_000)
+
+    assert await HashLib("md5").ahash_file(BytesIO(data)) == (
+        hashlib.md5(data).hexdigest()
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("chunk_size", [1, 1000, 4096, 10_000])
+async def test_multi_hash_chunking(chunk_size: int):
+    data = os.urandom(50_000)
+    expected = {
+        algorithm: hashlib.new(algorithm, data).hexdigest()
+        for algorithm in ("sha256", "md5")
+    }
+    sync_hasher = MultiHash(["sha256", "md5"], block_size=4096)
+    async_hasher = MultiHash(["sha256", "md5"], block_size=4096)
+
+    for start in range(0, len(data), chunk_size):
+        sync_hasher.update(data[start : start + chunk_size])
+        await async_hasher.aupdate(data[start : start + chunk_size])
+
+    assert sync_hasher.hexdigests() == expected
+    assert await async_hasher.ahexdigests() == expected
+
+
+def reference_tree_hash(algorithm: str, data: bytes, leaf_size: int) -> str:
+    leaves = [data[i : i + leaf_size] for i in range(0, len(data), leaf_size)] or [b""]
+    level = [hashlib.new(algorithm, b"\x00" + leaf).digest() for leaf in leaves]
+    while len(level) > 1:
+        parents = [
+            hashlib.new(algorithm, b"\x01" + level[i] + level[i + 1]).digest()
+            for i in range(0, len(level) - 1, 2)
+        ]
+        if len(level) % 2:
+            parents.append(level[-1])
+        level = parents
+    return level[0].hex()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("size", [0, 1, 4096, 5 * 4096 + 3, 64 * 4096])
+async def test_tree_hash(size: int):
+    data = os.urandom(size)
+    algorithms = ["sha256", "blake2b", "sha3_512"]
+    expected = {
+        algorithm: reference_tree_hash(algorithm, data, 4096)
+        for algorithm in algorithms
+    }
+    sync_tree = TreeHash(algorithms, leaf_size=4096)
+    async_tree = TreeHash(algorithms, leaf_size=4096)
+
+    for start in range(0, len(data), 1000):
+        sync_tree.update(data[start : start + 1000])
+        await async_tree.aupdate(data[start : start + 1000])
+
+    assert sync_tree.hexdigests() == expected
+    assert await async_tree.ahexdigests() == expected
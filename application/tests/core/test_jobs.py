@@ -0,0 +1,151 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi import HTTPException, Response
+
+from core.config import JobsConfig
+from core.jobs import JobManager, JobStore, JobStoreServer, parse_prefer
+
+
+def test_store_lifecycle_and_single_fetch():
+    store = JobStore(max_jobs=10, ttl=60)
+
+    assert store.create("a", "kind")["status"] == "queued"
+    store.start("a")
+    assert store.take("a")["status"] == "running"
+    assert store.finish("a", 201, b'{"private_key":"pem"}')
+
+    job = store.take("a")
+    assert job["status"] == "succeeded"
+    assert job["status_code"] == 201
+    assert job["body"] == b'{"private_key":"pem"}'
+    assert store.take("a") is None
+
+
+def test_store_zeroes_fetched_results():
+    store = JobStore(max_jobs=10, ttl=60)
+    store.create("a", "kind")
+    store.finish("a", 201, b"secret")
+    buffer = store._jobs["a"].body
+
+    store.take("a")
+
+    assert buffer == bytearray(6)
+
+
+def test_store_is_bounded():
+    store = JobStore(max_jobs=2, ttl=60)
+
+    assert store.create("a", "kind") is not None
+    assert store.create("b", "kind") is not None
+    assert store.create("c", "kind") is None
+    assert store.delete("a")
+    assert store.create("c", "kind") is not None
+
+
+def test_store_expires_jobs():
+    store = JobStore(max_jobs=10, ttl=0.05)
+    store.create("a", "kind")
+    store.finish("a", 500, b"{}")
+    buffer = store._jobs["a"].body
+
+    time.sleep(0.1)
+
+    assert store.info("a") is None
+    assert buffer == bytearray(2)
+    assert store.stats()["failed"] == 0
+
+
+def test_store_drops_results_of_deleted_jobs():
+    store = JobStore(max_jobs=10, ttl=60)
+    store.create("a", "kind")
+    store.delete("a")
+
+    assert not store.finish("a", 201, b"{}")
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        (None, (False, 0.0)),
+        ("respond-async", (True, 0.0)),
+        ("respond-async, wait=5", (True, 5.0)),
+        ('wait="2.5"; foo, RESPOND-ASYNC', (True, 2.5)),
+        ("wait=soon", (False, 0.0)),
+        ("handling=lenient", (False, 0.0)),
+    ],
+)
+def test_parse_prefer(header, expected):
+    assert parse_prefer(header) == expected
+
+
+@pytest.fixture
+def shared_jobs_config(tmp_path) -> JobsConfig:
+    config = JobsConfig(
+        address=str(tmp_path / "jobs.sock"),
+        authkey="test-authkey",
+        poll_interval=0.01,
+    )
+    threading.Thread(
+        target=JobStoreServer(config).serve_forever,
+        daemon=True,
+    ).start()
+    deadline = time.monotonic() + 5
+    while not (tmp_path / "jobs.sock").exists():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    return config
+
+
+@pytest.mark.asyncio
+async def test_jobs_shared_between_managers(shared_jobs_config: JobsConfig):
+    owner, other = JobManager(shared_jobs_config), JobManager(shared_jobs_config)
+
+    async def work() -> Response:
+        await asyncio.sleep(0.05)
+        return Response(b'{"private_key":"pem"}', status_code=201)
+
+    info = await owner.submit("kind", work)
+
+    assert (await other.wait(info["job_id"], timeout=5))["status"] == "succeeded"
+    job = await other.take(info["job_id"])
+    assert job["body"] == b'{"private_key":"pem"}'
+    assert await owner.info(info["job_id"]) is None
+    assert owner.stats()["succeeded"] == 0
+
+
+@pytest.mark.asyncio
+async def test_failed_job_keeps_the_error_response():
+    manager = JobManager(JobsConfig())
+
+    async def work() -> Response:
+        raise HTTPException(status_code=503, detail="Compute engine is restarting.")
+
+    info = await manager.submit("kind", work)
+    await manager.wait(info["job_id"], timeout=5)
+    job = await manager.take(info["job_id"])
+
+    assert job["status"] == "failed"
+    assert job["status_code"] == 503
+    assert job["body"] == b'{"detail":"Compute engine is restarting."}'
+
+
+@pytest.mark.asyncio
+async def test_drain_stops_accepting_jobs():
+    manager = JobManager(JobsConfig())
+    finished = asyncio.Event()
+
+    async def work() -> Response:
+        await asyncio.sleep(0.05)
+        finished.set()
+        return Response(b"{}")
+
+    await manager.submit("kind", work)
+    await manager.drain(timeout=5)
+
+    assert finished.is_set()
+    with pytest.raises(HTTPException) as exc_info:
+        await manager.submit("kind", work)
+    assert exc_info.value.status_code == 503
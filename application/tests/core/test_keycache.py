@@ -0,0 +1,74 @@
+import time
+
+import pytest
+
+from core.config import KeyCacheConfig
+from core.keycache import PublicKeyCache
+
+
+@pytest.fixture
+def cache() -> PublicKeyCache:
+    return PublicKeyCache(KeyCacheConfig(max_size=2, ttl=60.0))
+
+
+def test_keycache_hit(cache: PublicKeyCache):
+    key = cache.key("private", "password")
+    assert cache.get(key) is None
+
+    cache.put(key, "public")
+
+    assert cache.get(key) == "public"
+
+
+def test_keycache_key_depends_on_password(cache: PublicKeyCache):
+    assert cache.key("private", "password") != cache.key("private", "other")
+    assert cache.key("private", None) == cache.key("private", "")
+    assert cache.key("ab", "c") != cache.key("a", "bc")
+
+
+def test_keycache_key_is_not_a_plain_digest():
+    first = PublicKeyCache(KeyCacheConfig())
+    second = PublicKeyCache(KeyCacheConfig())
+
+    assert first.key("private", "password") != second.key("private", "password")
+
+
+def test_keycache_reset_draws_a_new_key(cache: PublicKeyCache):
+    key = cache.key("private", "password")
+    cache.put(key, "public")
+
+    cache.reset()
+
+    assert cache.key("private", "password") != key
+    assert cache.get(key) is None
+
+
+def test_keycache_evicts_least_recently_used(cache: PublicKeyCache):
+    keys = [cache.key(f"private-{i}", None) for i in range(3)]
+    cache.put(keys[0], "public-0")
+    cache.put(keys[1], "public-1")
+    cache.get(keys[0])
+
+    cache.put(keys[2], "public-2")
+
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) == "public-0"
+    assert cache.get(keys[2]) == "public-2"
+
+
+def test_keycache_expires_entries(cache: PublicKeyCache, monkeypatch):
+    key = cache.key("private", None)
+    cache.put(key, "public")
+
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 61)
+
+    assert cache.get(key) is None
+
+
+def test_keycache_disabled():
+    cache = PublicKeyCache(KeyCacheConfig(enabled=False))
+    key = cache.key("private", None)
+    cache.put(key, "public")
+
+    assert cache.get(key) is None
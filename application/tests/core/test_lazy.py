@@ -0,0 +1,40 @@
+import subprocess
+import sys
+
+import pytest
+
+from core.lazy import lazy_import, warm_up
+
+
+def test_lazy_import_defers_execution():
+    # A fresh interpreter, the module may already be imported here
+    code = (
+        "import sys\n"
+        "from core.lazy import lazy_import, warm_up\n"
+        "module = lazy_import('json.tool')\n"
+        "assert 'argparse' not in sys.modules\n"
+        "warm_up(module)\n"
+        "assert 'argparse' in sys.modules\n"
+        "assert callable(module.main)\n"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
+def test_lazy_import_returns_imported_module():
+    assert lazy_import("json") is sys.modules["json"]
+
+
+def test_lazy_import_missing_module():
+    with pytest.raises(ModuleNotFoundError):
+        lazy_import("core.does_not_exist")
+
+
+def test_keysengine_does_not_load_openssl_on_import():
+    code = (
+        "import sys\n"
+        "import core.keysengine as keysengine\n"
+        "assert 'cryptography.hazmat.bindings._rust' not in sys.modules\n"
+        "keysengine.warm_up_crypto()\n"
+        "assert 'cryptography.hazmat.bindings._rust' in sys.modules\n"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
@@ -0,0 +1,73 @@
+import hashlib
+
+import orjson
+import pytest
+
+from core.manifest import ManifestError, algorithm_tag, parse_manifest
+
+SHA256_A = hashlib.sha256(b"a").hexdigest()
+MD5_A = hashlib.md5(b"a").hexdigest()
+
+
+def test_parse_sha256sum_lines():
+    content = (
+        f"{SHA256_A}  ./dist/a.bin\n"
+        f"{SHA256_A.upper()} *b.bin\n"
+        "\n"
+        f"\\{SHA256_A}  odd\\\\name\\nline\n"
+    ).encode()
+
+    assert parse_manifest(content, "sha256") == {
+        "dist/a.bin": {"sha256": SHA256_A},
+        "b.bin": {"sha256": SHA256_A},
+        "odd\\name\nline": {"sha256": SHA256_A},
+    }
+
+
+def test_parse_tag_lines_with_several_algorithms():
+    content = (
+        f"SHA256 (a.bin) = {SHA256_A}\n"
+        f"MD5 (a.bin) = {MD5_A}\n"
+        f"{algorithm_tag('blake2b')} (b.bin) = {hashlib.blake2b(b'b').hexdigest()}\n"
+    ).encode()
+
+    manifest = parse_manifest(content, "sha512")
+
+    assert manifest["a.bin"] == {"sha256": SHA256_A, "md5": MD5_A}
+    assert list(manifest["b.bin"]) == ["blake2b"]
+
+
+def test_parse_json_manifests():
+    mapping = orjson.dumps({"a.bin": MD5_A})
+    responses = orjson.dumps(
+        [
+            {
+                "filename": "a.bin",
+                "algorithm": "sha256",
+                "hash": SHA256_A,
+                "hashes": {"sha256": SHA256_A, "md5": MD5_A},
+            }
+        ]
+    )
+
+    assert parse_manifest(mapping, "md5") == {"a.bin": {"md5": MD5_A}}
+    assert parse_manifest(responses, "sha512") == {
+        "a.bin": {"sha256": SHA256_A, "md5": MD5_A}
+    }
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        b"",
+        b"not a manifest line",
+        f"{MD5_A}  a.bin".encode(),
+        f"WHIRLPOOL (a.bin) = {SHA256_A}".encode(),
+        b'{"a.bin": 42}',
+        b"[1, 2]",
+        b"{broken",
+    ],
+)
+def test_parse_rejects_malformed_manifests(content: bytes):
+    with pytest.raises(ManifestError):
+        parse_manifest(content, "sha256")
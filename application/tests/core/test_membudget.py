@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException, status
+
+from core.membudget import MemoryBudget
+
+
+async def hold(budget: MemoryBudget, kib: int, release: asyncio.Event, log: list):
+    async with budget.reserve(kib):
+        log.append(kib)
+        await release.wait()
+
+
+@pytest.mark.asyncio
+async def test_memory_budget_is_fair():
+    budget = MemoryBudget(budget_kib=100, wait_timeout=5)
+    first_release, rest_release = asyncio.Event(), asyncio.Event()
+    started = []
+
+    first = asyncio.create_task(hold(budget, 60, first_release, started))
+    await asyncio.sleep(0)
+    large = asyncio.create_task(hold(budget, 70, rest_release, started))
+    await asyncio.sleep(0)
+    small = asyncio.create_task(hold(budget, 10, rest_release, started))
+    await asyncio.sleep(0)
+
+    # The small request fits but must not overtake the large one
+    assert started == [60]
+    assert budget.reserved_kib == 60
+
+    first_release.set()
+    await first
+    await asyncio.sleep(0.01)
+    assert started == [60, 70, 10]
+    assert budget.reserved_kib == 80
+
+    rest_release.set()
+    await asyncio.gather(large, small)
+    assert budget.reserved_kib == 0
+
+
+@pytest.mark.asyncio
+async def test_memory_budget_timeout():
+    budget = MemoryBudget(budget_kib=100, wait_timeout=0.05)
+    release = asyncio.Event()
+    running = asyncio.create_task(hold(budget, 100, release, []))
+    await asyncio.sleep(0)
+
+    with pytest.raises(HTTPException) as exc_info:
+        async with budget.reserve(1):
+            pass
+    assert exc_info.value.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+
+    release.set()
+    await running
+    assert budget.reserved_kib == 0
+
+
+@pytest.mark.asyncio
+async def test_memory_budget_rejects_oversized_request():
+    budget = MemoryBudget(budget_kib=100, wait_timeout=5)
+    with pytest.raises(HTTPException):
+        async with budget.reserve(101):
+            pass
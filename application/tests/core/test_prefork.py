@@ -0,0 +1,77 @@
+import os
+import time
+
+import httpx
+import uvicorn
+
+from core.prefork import PreforkServer, rss_bytes
+
+
+async def _app(scope, receive, send):
+    if scope["type"] != "http":
+        return
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": str(os.getpid()).encode()})
+
+
+def _wait_for(condition, timeout: float = 10.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+
+
+def _get_pid(port: int) -> int:
+    # The worker answers with its pid, retried while the worker starts
+    pids = []
+
+    def answered() -> bool:
+        try:
+            pids.append(int(httpx.get(f"http://127.0.0.1:{port}/").text))
+        except httpx.TransportError:
+            return False
+        return True
+
+    _wait_for(answered)
+    return pids[-1]
+
+
+def test_rss_bytes():
+    assert rss_bytes(os.getpid()) > 0
+    assert rss_bytes(2**22 + 1) is None
+
+
+def test_worker_is_recycled_after_max_requests():
+    config = uvicorn.Config(_app, host="127.0.0.1", port=0, log_config=None)
+    server = PreforkServer(config, workers=1, max_requests=2, graceful_timeout=5)
+    server._socket = config.bind_socket()
+    port = server._socket.getsockname()[1]
+    try:
+        first = server.spawn()
+        assert _get_pid(port) == first
+        assert _get_pid(port) == first
+
+        _wait_for(lambda: server.reap() or first not in server.pids)
+
+        assert len(server.pids) == 1
+        assert _get_pid(port) != first
+    finally:
+        server.stop()
+        server._socket.close()
+    assert not server.pids
+
+
+def test_large_worker_is_replaced():
+    config = uvicorn.Config(_app, host="127.0.0.1", port=0, log_config=None)
+    server = PreforkServer(config, workers=1, max_rss=1, graceful_timeout=5)
+    server._socket = config.bind_socket()
+    try:
+        first = server.spawn()
+        server.recycle_large()
+
+        assert len(server.pids) == 2
+        _wait_for(lambda: server.reap() or first not in server.pids)
+        assert len(server.pids) == 1
+    finally:
+        server.stop()
+        server._socket.close()
@@ -0,0 +1,61 @@
+from pathlib import Path
+
+from core.resources import available_cpus, cpu_limit, default_workers, memory_limit
+
+
+def _write(path: Path, content: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content)
+
+
+def test_cgroup_v2_limits(tmp_path: Path):
+    _write(tmp_path / "cpu.max", "150000 100000\n")
+    _write(tmp_path / "memory.max", "1073741824\n")
+
+    assert cpu_limit(tmp_path) == 1.5
+    assert memory_limit(tmp_path) == 1 << 30
+
+
+def test_cgroup_v2_unlimited(tmp_path: Path):
+    _write(tmp_path / "cpu.max", "max 100000\n")
+    _write(tmp_path / "memory.max", "max\n")
+
+    assert cpu_limit(tmp_path) is None
+    assert memory_limit(tmp_path) is None
+
+
+def test_cgroup_v1_limits(tmp_path: Path):
+    _write(tmp_path / "cpu" / "cpu.cfs_quota_us", "200000\n")
+    _write(tmp_path / "cpu" / "cpu.cfs_period_us", "100000\n")
+    _write(tmp_path / "memory" / "memory.limit_in_bytes", "536870912\n")
+
+    assert cpu_limit(tmp_path) == 2.0
+    assert memory_limit(tmp_path) == 512 << 20
+
+
+def test_cgroup_v1_unlimited(tmp_path: Path):
+    _write(tmp_path / "cpu" / "cpu.cfs_quota_us", "-1\n")
+    _write(tmp_path / "cpu" / "cpu.cfs_period_us", "100000\n")
+    _write(tmp_path / "memory" / "memory.limit_in_bytes", "9223372036854771712\n")
+
+    assert cpu_limit(tmp_path) is None
+    assert memory_limit(tmp_path) is None
+
+
+def test_no_cgroup(tmp_path: Path):
+    assert cpu_limit(tmp_path) is None
+    assert memory_limit(tmp_path) is None
+    assert available_cpus(tmp_path) >= 1
+
+
+def test_default_workers(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr("os.sched_getaffinity", lambda pid: set(range(8)))
+    _write(tmp_path / "cpu.max", "250000 100000\n")
+    assert available_cpus(tmp_path) == 3
+    assert default_workers(memory_per_worker=256 << 20, root=tmp_path) == 3
+
+    _write(tmp_path / "memory.max", str(600 << 20))
+    assert default_workers(memory_per_worker=256 << 20, root=tmp_path) == 2
+
+    _write(tmp_path / "memory.max", str(100 << 20))
+    assert default_workers(memory_per_worker=256 << 20, root=tmp_path) == 1
@@ -0,0 +1,204 @@
+import asyncio
+import hashlib
+import threading
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from core.config import SessionsConfig
+from core.hashengine import MultiHash
+from core.sessions import (
+    SessionError,
+    SessionManager,
+    SessionStore,
+    SessionStoreServer,
+)
+
+
+def _store(**kwargs) -> SessionStore:
+    return SessionStore(
+        **{"max_sessions": 10, "idle_timeout": 60, "block_size": 4096, **kwargs}
+    )
+
+
+async def _pieces(*chunks: bytes):
+    for chunk in chunks:
+        yield chunk
+
+
+def test_multihash_copy_is_independent():
+    hasher = MultiHash(["sha256", "md5"], block_size=16)
+    hasher.update(b"a" * 40)
+    hasher.flush()
+
+    clone = hasher.copy()
+    clone.update(b"b" * 40)
+
+    assert hasher.hexdigests()["sha256"] == hashlib.sha256(b"a" * 40).hexdigest()
+    assert clone.hexdigests() == {
+        "sha256": hashlib.sha256(b"a" * 40 + b"b" * 40).hexdigest(),
+        "md5": hashlib.md5(b"a" * 40 + b"b" * 40).hexdigest(),
+    }
+
+
+def test_multihash_copy_needs_a_flush():
+    hasher = MultiHash(["sha256"], block_size=16)
+    hasher.update(b"a")
+
+    with pytest.raises(RuntimeError):
+        hasher.copy()
+
+
+def test_store_hashes_chunks_in_order():
+    store = _store()
+    store.create("s", ["sha256", "blake2b"], "big.iso")
+
+    store.append("s", 0, [b"hello ", b"wor"])
+    info = store.append("s", 9, [b"ld"])
+    assert info["offset"] == 11
+
+    finished = store.finish("s")
+    assert finished["hashes"] == {
+        "sha256": hashlib.sha256(b"hello world").hexdigest(),
+        "blake2b": hashlib.blake2b(b"hello world").hexdigest(),
+    }
+    assert store.info("s") is None
+
+
+def test_failed_chunk_leaves_the_session_at_its_checkpoint():
+    store = _store()
+    store.create("s", ["sha256"], "upload")
+    store.append("s", 0, [b"first"])
+
+    def broken():
+        yield b"garbage"
+        raise EOFError
+
+    with pytest.raises(EOFError):
+        store.append("s", 5, broken())
+
+    assert store.info("s")["offset"] == 5
+    store.append("s", 5, [b"second"])
+    digest = store.finish("s")["hashes"]["sha256"]
+    assert digest == hashlib.sha256(b"firstsecond").hexdigest()
+
+
+def test_store_rejects_wrong_offsets_and_concurrent_chunks():
+    store = _store()
+    store.create("s", ["sha256"], "upload")
+    store.append("s", 0, [b"abc"])
+
+    with pytest.raises(SessionError) as error:
+        store.append("s", 0, [b"abc"])
+    assert error.value.status_code == 409
+    assert "starts at 3" in error.value.detail
+
+    hasher = store.begin("s", 3)
+    with pytest.raises(SessionError) as error:
+        store.begin("s", 3)
+    assert error.value.status_code == 409
+    with pytest.raises(SessionError):
+        store.finish("s")
+    store.commit("s", hasher, 0)
+
+    with pytest.raises(SessionError) as error:
+        store.append("unknown", 0, [])
+    assert error.value.status_code == 404
+
+
+def test_store_is_bounded_and_expires_idle_sessions():
+    store = _store(max_sessions=2, idle_timeout=0.05)
+
+    assert store.create("a", ["md5"], "a") is not None
+    assert store.create("b", ["md5"], "b") is not None
+    assert store.create("c", ["md5"], "c") is None
+    assert store.delete("a")
+    assert store.create("c", ["md5"], "c") is not None
+
+    time.sleep(0.1)
+
+    assert len(store) == 0
+    assert store.info("c") is None
+
+
+@pytest.mark.asyncio
+async def test_local_manager_rejects_too_large_chunks():
+    manager = SessionManager(SessionsConfig(max_chunk_mib=1))
+    info = await manager.create(["sha256"], "upload")
+    session_id = info["session_id"]
+
+    with pytest.raises(HTTPException) as error:
+        await manager.append(session_id, 0, _pieces(b"a" * (1 << 20), b"a"))
+    assert error.value.status_code == 413
+
+    info = await manager.append(session_id, 0, _pieces(b"a" * (1 << 20)))
+    assert info["offset"] == 1 << 20
+
+
+@pytest.fixture
+def shared_sessions_config(tmp_path) -> SessionsConfig:
+    config = SessionsConfig(
+        address=str(tmp_path / "sessions.sock"),
+        authkey="test-authkey",
+    )
+    threading.Thread(
+        target=SessionStoreServer(config).serve_forever,
+        daemon=True,
+    ).start()
+    deadline = time.monotonic() + 5
+    while not (tmp_path / "sessions.sock").exists():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    return config
+
+
+@pytest.mark.asyncio
+async def test_sessions_shared_between_managers(shared_sessions_config):
+    first = SessionManager(shared_sessions_config)
+    second = SessionManager(shared_sessions_config)
+    data = bytes(range(256)) * 4096
+
+    info = await first.create(["sha256", "md5"], "upload")
+    session_id = info["session_id"]
+    await first.append(session_id, 0, _pieces(data[:300_000], data[300_000:600_000]))
+    await second.append(session_id, 600_000, _pieces(data[600_000:]))
+
+    with pytest.raises(HTTPException) as error:
+        await first.append(session_id, 0, _pieces(b"late"))
+    assert error.value.status_code == 409
+
+    finished = await second.finish(session_id)
+    assert finished["offset"] == len(data)
+    assert finished["hashes"]["sha256"] == hashlib.sha256(data).hexdigest()
+    assert finished["hashes"]["md5"] == hashlib.md5(data).hexdigest()
+    assert await first.info(session_id) is None
+
+
+@pytest.mark.asyncio
+async def test_interrupted_chunk_is_dropped_by_the_shared_store(
+    shared_sessions_config,
+):
+    manager = SessionManager(shared_sessions_config)
+    info = await manager.create(["sha256"], "upload")
+    session_id = info["session_id"]
+
+    async def disconnected():
+        yield b"partial"
+        raise OSError("client went away")
+
+    with pytest.raises(OSError):
+        await manager.append(session_id, 0, disconnected())
+
+    deadline = time.monotonic() + 5
+    while True:
+        try:
+            info = await manager.append(session_id, 0, _pieces(b"whole"))
+            break
+        except HTTPException as exc:
+            # The store notices the closed connection asynchronously
+            assert exc.status_code == 409 and time.monotonic() < deadline
+            await asyncio.sleep(0.01)
+    assert info["offset"] == 5
+    finished = await manager.finish(session_id)
+    assert finished["hashes"]["sha256"] == hashlib.sha256(b"whole").hexdigest()
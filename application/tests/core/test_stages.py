@@ -0,0 +1,117 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import (
+    InMemorySpanExporter,
+)
+from prometheus_client import REGISTRY
+
+from core import stages as stages_module
+from core.hashengine import run_password_task
+from core.stages import (
+    COMPUTE,
+    QUEUE,
+    WORKER_WAIT,
+    StageTimer,
+    argon2_class,
+    record_wait,
+)
+
+
+def _count(endpoint: str, param_class: str, stage: str) -> float:
+    return REGISTRY.get_sample_value(
+        "keyforge_stage_seconds_count",
+        {"endpoint": endpoint, "param_class": param_class, "stage": stage},
+    ) or 0.0
+
+
+@pytest.fixture
+def exporter(monkeypatch) -> InMemorySpanExporter:
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    monkeypatch.setattr(stages_module, "tracer", provider.get_tracer(__name__))
+    yield exporter
+    provider.shutdown()
+
+
+def test_argon2_class_is_bounded():
+    assert argon2_class(1) == "argon2-1mib"
+    assert argon2_class(1024) == "argon2-1mib"
+    assert argon2_class(1025) == "argon2-2mib"
+    assert argon2_class(65536) == "argon2-64mib"
+    assert argon2_class(65537) == "argon2-128mib"
+
+
+def test_stage_is_observed_without_span_when_not_sampled(exporter):
+    before = _count("test-unsampled", "class", COMPUTE)
+
+    with StageTimer("test-unsampled", "class") as stages:
+        assert not stages.recording
+        with stages.stage(COMPUTE):
+            pass
+
+    assert _count("test-unsampled", "class", COMPUTE) == before + 1
+    assert exporter.get_finished_spans() == ()
+
+
+def test_stages_are_child_spans_when_sampled(exporter):
+    tracer = stages_module.tracer
+    with tracer.start_as_current_span("request") as request_span:
+        with StageTimer("test-sampled", "class") as stages:
+            assert stages.recording
+            with stages.stage(COMPUTE):
+                record_wait(1_000, 2_000)
+
+    spans = {span.name: span for span in exporter.get_finished_spans()}
+    assert set(spans) == {"request", COMPUTE, WORKER_WAIT}
+    assert spans[COMPUTE].parent.span_id == request_span.get_span_context().span_id
+    assert spans[WORKER_WAIT].parent.span_id == spans[COMPUTE].context.span_id
+    assert spans[WORKER_WAIT].start_time == 1_000
+    assert spans[WORKER_WAIT].end_time == 2_000
+
+
+def test_record_wait_without_timer_is_a_noop():
+    record_wait(0, 1)
+
+
+@pytest.mark.asyncio
+async def test_queued_times_only_the_wait():
+    entered = asyncio.Event()
+
+    @asynccontextmanager
+    async def slot():
+        await asyncio.sleep(0.01)
+        entered.set()
+        yield
+
+    with StageTimer("test-queued", "class") as stages:
+        before = REGISTRY.get_sample_value(
+            "keyforge_stage_seconds_sum",
+            {"endpoint": "test-queued", "param_class": "class", "stage": QUEUE},
+        ) or 0.0
+        async with stages.queued(slot()):
+            assert entered.is_set()
+            await asyncio.sleep(0.05)
+
+    waited = REGISTRY.get_sample_value(
+        "keyforge_stage_seconds_sum",
+        {"endpoint": "test-queued", "param_class": "class", "stage": QUEUE},
+    ) - before
+    assert 0.01 <= waited < 0.05
+
+
+@pytest.mark.asyncio
+async def test_password_task_records_worker_wait():
+    before = _count("test-password", "class", WORKER_WAIT)
+
+    with StageTimer("test-password", "class"):
+        assert await run_password_task(dict, a=1) == {"a": 1}
+
+    assert _count("test-password", "class", WORKER_WAIT) == before + 1
+    assert REGISTRY.get_sample_value(
+        "keyforge_executor_tasks", {"executor": "password"}
+    ) == 0
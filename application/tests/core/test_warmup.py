@@ -0,0 +1,42 @@
+import asyncio
+
+import pytest
+
+from core.warmup import WarmUp
+
+
+@pytest.mark.asyncio
+async def test_warm_up_runs_steps_concurrently():
+    warm_up = WarmUp()
+    started = []
+
+    async def step(name: str) -> None:
+        started.append(name)
+        await asyncio.sleep(0.05)
+
+    warm_up.add("first", lambda: step("first"))
+    warm_up.add("second", lambda: step("second"))
+    assert not warm_up.ready
+
+    await warm_up.run()
+
+    assert warm_up.ready
+    assert sorted(started) == ["first", "second"]
+    assert set(warm_up.timings) == {"first", "second"}
+    assert all(seconds >= 0.05 for seconds in warm_up.timings.values())
+    assert warm_up.failed == []
+
+
+@pytest.mark.asyncio
+async def test_failed_step_does_not_block_readiness():
+    warm_up = WarmUp()
+
+    async def broken() -> None:
+        raise RuntimeError("boom")
+
+    warm_up.add("broken", broken)
+    await warm_up.run()
+
+    assert warm_up.ready
+    assert warm_up.failed == ["broken"]
+    assert "broken" in warm_up.timings
@@ -0,0 +1,109 @@
+import hashlib
+
+import orjson
+import pytest
+from fastapi import status
+from httpx import AsyncClient
+
+from tests.conftest import long_string
+
+
+def parse_lines(content: bytes) -> list[dict]:
+    return [orjson.loads(line) for line in content.splitlines()]
+
+
+@pytest.mark.asyncio
+async def test_hashlib_batch_json_array(client: AsyncClient):
+    response = await client.post(
+        "/api/hashlib/batch?algorithm=sha512",
+        content=orjson.dumps(
+            ["first", {"payload": 'se"co\\nd', "algorithm": "md5"}, {"payload": "x"}]
+        ),
+        headers={"Content-Type": "application/json"},
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert parse_lines(response.content) == [
+        {
+            "index": 0,
+            "algorithm": "sha512",
+            "hash": hashlib.sha512(b"first").hexdigest(),
+        },
+        {
+            "index": 1,
+            "algorithm": "md5",
+            "hash": hashlib.md5(b'se"co\\nd').hexdigest(),
+        },
+        {
+            "index": 2,
+            "algorithm": "sha512",
+            "hash": hashlib.sha512(b"x").hexdigest(),
+        },
+    ]
+
+
+@pytest.mark.asyncio
+async def test_hashlib_batch_ndjson_streamed(client: AsyncClient):
+    payloads = [f"payload-{i}" for i in range(10_000)]
+    body = b"".join(orjson.dumps(payload) + b"\n" for payload in payloads)
+
+    async def chunks():
+        for start in range(0, len(body), 1000):
+            yield body[start : start + 1000]
+
+    response = await client.post(
+        "/api/hashlib/batch",
+        content=chunks(),
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    results = parse_lines(response.content)
+    assert [result["index"] for result in results] == list(range(len(payloads)))
+    assert results[-1]["hash"] == hashlib.sha256(payloads[-1].encode()).hexdigest()
+
+
+@pytest.mark.asyncio
+async def test_hashlib_batch_item_errors(client: AsyncClient):
+    response = await client.post(
+        "/api/hashlib/batch",
+        content=orjson.dumps(
+            [
+                1,
+                long_string,
+                {"payload": "x", "algorithm": "md4"},
+                {"payload": "x", "algorithm": [1]},
+                {"payload": {"x": 1}},
+                "ok",
+            ]
+        ),
+        headers={"Content-Type": "application/json"},
+    )
+
+    results = parse_lines(response.content)
+    assert [("error" in result) for result in results] == [
+        True, True, True, True, True, False
+    ]
+    assert results[3] == {"index": 3, "error": "Algorithm must be a string."}
+    assert results[5]["index"] == 5
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "body",
+    [
+        b'{"payload": "x"}',
+        b'["a", "b"',
+    ],
+)
+async def test_hashlib_batch_malformed_body(client: AsyncClient, body: bytes):
+    response = await client.post(
+        "/api/hashlib/batch",
+        content=body,
+        headers={"Content-Type": "application/json"},
+    )
+
+    results = parse_lines(response.content)
+    assert results[-1]["index"] is None
+    assert "error" in results[-1]
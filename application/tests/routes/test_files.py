@@ -1,9 +1,12 @@
+import hashlib
 import os
 
+import orjson
 import pytest
 from io import BytesIO
 from httpx import AsyncClient
 from fastapi import status
+from prometheus_client import REGISTRY
 
 
 @pytest.mark.asyncio
@@ -68,3 +71,268 @@ async def test_upload_file_above_limit(
     )
 
     assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "algorithm",
+    [
+        "sha256",
+        "md5",
+    ],
+)
+async def test_upload_file_digest(
+    client: AsyncClient,
+    algorithm: str,
+):
+    binary_data = os.urandom(3 * 1024 * 1024 + 7)
+    files = {
+        "file": ("test.bin", BytesIO(binary_data), "application/octet-stream"),
+    }
+    response = await client.post(
+        f"/api/file-sum?algorithm={algorithm}",
+        data={"comment": "ignored"},
+        files=files,
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    json_data = response.json()
+    assert json_data["filename"] == "test.bin"
+    assert json_data["hash"] == hashlib.new(algorithm, binary_data).hexdigest()
+    assert json_data["size"] == len(binary_data)
+
+
+@pytest.mark.asyncio
+async def test_upload_raw_file(
+    client: AsyncClient,
+):
+    binary_data = b"\n".join(os.urandom(1000) for _ in range(100))
+    response = await client.post(
+        "/api/file-sum?algorithm=sha512&filename=raw.bin",
+        content=binary_data,
+        headers={"Content-Type": "application/octet-stream"},
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    json_data = response.json()
+    assert json_data["filename"] == "raw.bin"
+    assert json_data["hash"] == hashlib.sha512(binary_data).hexdigest()
+    assert json_data["size"] == len(binary_data)
+
+
+@pytest.mark.asyncio
+async def test_upload_file_missing_field(
+    client: AsyncClient,
+):
+    response = await client.post(
+        "/api/file-sum?algorithm=sha256",
+        files={"other": ("test.bin", BytesIO(b"data"), "application/octet-stream")},
+    )
+
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+@pytest.mark.asyncio
+async def test_upload_file_multiple_algorithms(
+    client: AsyncClient,
+):
+    binary_data = os.urandom(5 * 1024 * 1024 + 3)
+    response = await client.post(
+        "/api/file-sum?algorithm=sha256&algorithm=sha512&algorithm=md5&algorithm=md5",
+        files={"file": ("test.bin", BytesIO(binary_data), "application/octet-stream")},
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    json_data = response.json()
+    assert json_data["algorithm"] == "sha256"
+    assert json_data["hash"] == hashlib.sha256(binary_data).hexdigest()
+    assert json_data["hashes"] == {
+        algorithm: hashlib.new(algorithm, binary_data).hexdigest()
+        for algorithm in ("sha256", "sha512", "md5")
+    }
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "algorithm",
+    [
+        "blake2b",
+        "blake2s",
+        "sha3_256",
+        "sha3_512",
+    ],
+)
+async def test_upload_file_new_algorithms(
+    client: AsyncClient,
+    algorithm: str,
+):
+    binary_data = os.urandom(100_000)
+    response = await client.post(
+        f"/api/file-sum?algorithm={algorithm}",
+        files={"file": ("test.bin", BytesIO(binary_data), "application/octet-stream")},
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["hash"] == hashlib.new(algorithm, binary_data).hexdigest()
+    assert response.json()["mode"] == "sequential"
+
+
+@pytest.mark.asyncio
+async def test_upload_file_tree_mode(
+    client: AsyncClient,
+):
+    binary_data = os.urandom(3 * 1024 * 1024 + 5)
+    response = await client.post(
+        "/api/file-sum?algorithm=sha256&mode=tree",
+        files={"file": ("test.bin", BytesIO(binary_data), "application/octet-stream")},
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    json_data = response.json()
+    assert json_data["mode"] == "tree"
+    assert json_data["leaf_size"] == 1024 * 1024
+    leaves = [
+        hashlib.sha256(b"\x00" + binary_data[i : i + 1024 * 1024]).digest()
+        for i in range(0, len(binary_data), 1024 * 1024)
+    ]
+    left = hashlib.sha256(b"\x01" + leaves[0] + leaves[1]).digest()
+    right = hashlib.sha256(b"\x01" + leaves[2] + leaves[3]).digest()
+    assert json_data["hash"] == hashlib.sha256(b"\x01" + left + right).hexdigest()
+
+
+@pytest.mark.asyncio
+async def test_upload_file_metrics(
+    client: AsyncClient,
+):
+    def sample(name: str, labels: dict[str, str]) -> float:
+        return REGISTRY.get_sample_value(name, labels) or 0.0
+
+    binary_data = os.urandom(2 * 1024 * 1024)
+    hashed_before = sample("keyforge_file_sum_bytes_total", {"mode": "tree"})
+    observed_before = sample(
+        "keyforge_file_sum_throughput_bytes_per_second_count", {"mode": "tree"}
+    )
+
+    response = await client.post(
+        "/api/file-sum?algorithm=sha256&mode=tree",
+        content=binary_data,
+        headers={"Content-Type": "application/octet-stream"},
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert sample(
+        "keyforge_file_sum_bytes_total", {"mode": "tree"}
+    ) == hashed_before + len(binary_data)
+    assert sample(
+        "keyforge_file_sum_throughput_bytes_per_second_count", {"mode": "tree"}
+    ) == observed_before + 1
+    assert sample("keyforge_executor_tasks", {"executor": "digest"}) == 0
+    assert sample("keyforge_executor_workers", {"executor": "digest"}) >= 1
+    assert sample("keyforge_operations_in_flight", {"endpoint": "file-sum"}) == 0
+
+
+def _verify_files(manifest: str, files: dict[str, bytes]) -> list:
+    return [("manifest", ("SHA256SUMS", manifest.encode(), "text/plain"))] + [
+        ("files", (name, data, "application/octet-stream"))
+        for name, data in files.items()
+    ]
+
+
+@pytest.mark.asyncio
+async def test_verify_manifest(client: AsyncClient):
+    files = {"a.bin": os.urandom(300_000), "b.txt": b"hello", "extra": b"x"}
+    manifest = (
+        f"{hashlib.sha256(files['a.bin']).hexdigest()}  ./a.bin\n"
+        f"{hashlib.sha256(b'other').hexdigest()}  b.txt\n"
+        f"{hashlib.sha256(b'gone').hexdigest()}  missing.bin\n"
+    )
+
+    response = await client.post(
+        "/api/file-sum/verify",
+        files=_verify_files(manifest, files),
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/x-ndjson"
+    *results, summary = [orjson.loads(line) for line in response.text.splitlines()]
+    by_name = {result["filename"]: result for result in results}
+    assert by_name["a.bin"]["status"] == "ok"
+    assert by_name["a.bin"]["size"] == 300_000
+    assert by_name["b.txt"]["status"] == "mismatch"
+    assert by_name["b.txt"]["hash"] == hashlib.sha256(b"hello").hexdigest()
+    assert by_name["extra"]["status"] == "unexpected"
+    assert summary["summary"] == {
+        "ok": 1,
+        "mismatch": 1,
+        "unexpected": 1,
+        "missing": ["missing.bin"],
+        "aborted": False,
+        "passed": False,
+    }
+
+
+@pytest.mark.asyncio
+async def test_verify_manifest_fail_fast(client: AsyncClient):
+    files = {"a.bin": b"a", "b.bin": b"b", "c.bin": b"c"}
+    manifest = "\n".join(
+        f"MD5 ({name}) = {hashlib.md5(b'a').hexdigest()}" for name in files
+    )
+
+    response = await client.post(
+        "/api/file-sum/verify",
+        params={"fail_fast": True},
+        files=_verify_files(manifest, files),
+    )
+
+    assert response.headers["connection"] == "close"
+    lines = [orjson.loads(line) for line in response.text.splitlines()]
+    assert [line.get("status") for line in lines[:-1]] == ["ok", "mismatch"]
+    assert lines[-1]["summary"]["aborted"] is True
+    assert lines[-1]["summary"]["passed"] is False
+    in_flight = REGISTRY.get_sample_value(
+        "keyforge_admission_in_flight", {"cost_class": "file-sum"}
+    )
+    assert in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_verify_manifest_passes_with_keyforge_hash_output(
+    client: AsyncClient, tmp_path
+):
+    from core.bulkhash import hash_path
+
+    data = os.urandom(70_000)
+    (tmp_path / "a.bin").write_bytes(data)
+    result = hash_path(str(tmp_path / "a.bin"), ["sha512", "md5"])
+    manifest = orjson.dumps([result.model_dump()]).decode()
+
+    response = await client.post(
+        "/api/file-sum/verify",
+        files=_verify_files(manifest, {str(tmp_path / "a.bin"): data}),
+    )
+
+    *_, summary = response.text.splitlines()
+    assert orjson.loads(summary)["summary"]["passed"] is True
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "files, status_code",
+    [
+        ([("files", ("a.bin", b"a", "application/octet-stream"))], 422),
+        ([("manifest", ("SHA256SUMS", b"garbage", "text/plain"))], 422),
+    ],
+)
+async def test_verify_manifest_rejects_bad_manifests(
+    client: AsyncClient, files: list, status_code: int
+):
+    response = await client.post("/api/file-sum/verify", files=files)
+
+    assert response.status_code == status_code
+
+
+@pytest.mark.asyncio
+async def test_verify_manifest_needs_multipart(client: AsyncClient):
+    response = await client.post("/api/file-sum/verify", content=b"data")
+
+    assert response.status_code == status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
@@ -1,3 +1,6 @@
+import re
+
+import orjson
 from httpx import AsyncClient
 from fastapi import status
 from pydantic import ValidationError
@@ -14,6 +17,47 @@ async def test_random_token(client: AsyncClient):
     assert response.json() is not None
 
 
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "encoding, length, pattern",
+    [
+        ("hex", 16, r"[0-9a-f]{32}"),
+        ("base64url", 16, r"[A-Za-z0-9_-]{22}"),
+        ("base32", 20, r"[A-Z2-7]{32}"),
+    ],
+)
+async def test_random_token_encoding(
+    client: AsyncClient,
+    encoding: str,
+    length: int,
+    pattern: str,
+):
+    response = await client.get(
+        f"/api/random-token?length={length}&encoding={encoding}",
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert re.fullmatch(pattern, response.json())
+
+
+@pytest.mark.asyncio
+async def test_random_token_batch(client: AsyncClient):
+    response = await client.get("/api/random-token?length=16&count=5000")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/x-ndjson"
+
+    tokens = [orjson.loads(line) for line in response.content.splitlines()]
+    assert len(tokens) == 5000
+    assert len(set(tokens)) == 5000
+    assert all(len(token) == 32 for token in tokens)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("query", ["length=8", "length=513", "count=0", "encoding=b64"])
+async def test_random_token_wrong_params(client: AsyncClient, query: str):
+    response = await client.get(f"/api/random-token?{query}")
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
 @pytest.mark.asyncio
 @pytest.mark.parametrize(
     "length, memory_cost",
@@ -62,9 +106,8 @@ async def test_too_long_payload_argon2(
 @pytest.mark.parametrize(
     "payload, rounds",
     [
+        ("sometext", 8),
         ("sometext", 12),
-        ("sometext", 20),
-        ("sometext", 32),
     ],
 )
 async def test_bcrypt_hash(client: AsyncClient, payload: str, rounds: int):
@@ -77,15 +120,16 @@ async def test_bcrypt_hash(client: AsyncClient, payload: str, rounds: int):
         json=params.model_dump(),
     )
     assert response.status_code == status.HTTP_201_CREATED
+    assert response.json()["hash"].startswith(f"$2b${rounds:02d}$")
 
 
 @pytest.mark.asyncio
 @pytest.mark.parametrize(
     "payload, rounds",
     [
+        ("sometext", 8),
         ("sometext", 12),
-        ("sometext", 20),
-        ("sometext", 32),
+        ("sometext", 16),
     ],
 )
 async def test_too_long_payload_brypt(
@@ -106,6 +150,7 @@ async def test_too_long_payload_brypt(
     [
         ("sometext", 4),
         ("sometext", 7),
+        ("sometext", 17),
         ("sometext", 40),
     ],
 )
@@ -182,3 +227,117 @@ async def test_hashlib_hash_wrong_algorithm(
         json={"payload": payload},
     )
     assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+@pytest.mark.asyncio
+async def test_argon2_hash_time_cost(client: AsyncClient):
+    response = await client.post(
+        "/api/argon2-hash",
+        json={"payload": "sometext", "memory_cost": 1024, "time_cost": 2},
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+    assert ",t=2," in response.json()["hash"]
+
+
+@pytest.mark.asyncio
+async def test_hash_calibration(client: AsyncClient):
+    response = await client.get("/api/hash-calibration?target_ms=50")
+    assert response.status_code == status.HTTP_200_OK
+    recommended = response.json()["recommended"]
+    assert recommended["target_ms"] == 50
+
+    bcrypt_response = await client.post(
+        "/api/bcrypt-hash",
+        json={"payload": "sometext", "target_ms": 50},
+    )
+    rounds = recommended["bcrypt_rounds"]
+    assert bcrypt_response.json()["hash"].startswith(f"$2b${rounds:02d}$")
+
+    argon2_response = await client.post(
+        "/api/argon2-hash",
+        json={"payload": "sometext", "target_ms": 50},
+    )
+    memory_cost = recommended["argon2_memory_cost"]
+    time_cost = recommended["argon2_time_cost"]
+    assert f"m={memory_cost},t={time_cost}," in argon2_response.json()["hash"]
+
+
+@pytest.mark.asyncio
+async def test_run_hash_calibration(client: AsyncClient):
+    before = (await client.get("/api/hash-calibration")).json()
+    response = await client.post("/api/hash-calibration")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["measured_at"] > before["measured_at"]
+
+
+@pytest.mark.asyncio
+async def test_argon2_verify(client: AsyncClient):
+    recommended = (await client.get("/api/hash-calibration")).json()["recommended"]
+    current = await client.post(
+        "/api/argon2-hash",
+        json={
+            "payload": "sometext",
+            "memory_cost": recommended["argon2_memory_cost"],
+            "time_cost": recommended["argon2_time_cost"],
+        },
+    )
+    outdated = await client.post(
+        "/api/argon2-hash",
+        json={"payload": "sometext", "memory_cost": 1024, "time_cost": 1},
+    )
+
+    for hashed, payload, expected in [
+        (current.json()["hash"], "sometext", {"valid": True, "needs_rehash": False}),
+        (outdated.json()["hash"], "sometext", {"valid": True, "needs_rehash": True}),
+        (current.json()["hash"], "othertext", {"valid": False, "needs_rehash": False}),
+    ]:
+        response = await client.post(
+            "/api/argon2-verify",
+            json={"payload": payload, "hash": hashed},
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == expected
+
+
+@pytest.mark.asyncio
+async def test_bcrypt_verify(client: AsyncClient):
+    recommended = (await client.get("/api/hash-calibration")).json()["recommended"]
+    rounds = recommended["bcrypt_rounds"]
+    current = await client.post(
+        "/api/bcrypt-hash",
+        json={"payload": "sometext", "rounds": rounds},
+    )
+    outdated = await client.post(
+        "/api/bcrypt-hash",
+        json={"payload": "sometext", "rounds": rounds - 1 if rounds > 8 else rounds + 1},
+    )
+
+    for hashed, payload, expected in [
+        (current.json()["hash"], "sometext", {"valid": True, "needs_rehash": False}),
+        (outdated.json()["hash"], "sometext", {"valid": True, "needs_rehash": True}),
+        (current.json()["hash"], "othertext", {"valid": False, "needs_rehash": False}),
+    ]:
+        response = await client.post(
+            "/api/bcrypt-verify",
+            json={"payload": payload, "hash": hashed},
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == expected
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "endpoint, hashed",
+    [
+        ("/api/argon2-verify", "not-a-hash"),
+        ("/api/argon2-verify", "$argon2id$v=19$m=4194304,t=3,p=4$c29tZXNhbHQ$aGFzaA"),
+        ("/api/bcrypt-verify", "$argon2id$v=19$m=65536,t=3,p=4$c29tZXNhbHQ$aGFzaA"),
+        ("/api/bcrypt-verify", "$2b$31$" + "a" * 53),
+    ],
+)
+async def test_verify_rejected_hash(client: AsyncClient, endpoint: str, hashed: str):
+    response = await client.post(
+        endpoint,
+        json={"payload": "sometext", "hash": hashed},
+    )
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
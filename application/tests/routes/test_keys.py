@@ -1,5 +1,9 @@
+import asyncio
+
+import orjson
 from httpx import AsyncClient
 from fastapi import status
+from prometheus_client import REGISTRY
 import pytest
 from tests.conftest import long_string
 from core.schemas import PrivateKeyOut
@@ -146,3 +150,109 @@ async def test_gen_ed25519_public_key(
     )
     assert response.status_code == status.HTTP_201_CREATED
     assert response.json() is not None
+
+
+@pytest.mark.asyncio
+async def test_rsa_keygen_does_not_block_event_loop(
+    client: AsyncClient,
+):
+    keygen = asyncio.create_task(
+        client.post(
+            "/api/genrsa-private-key?key_size=4096",
+            json={"password": None},
+        )
+    )
+    await asyncio.sleep(0)
+    health = await client.get("/utils/health-check")
+
+    assert health.status_code == status.HTTP_200_OK
+    assert not keygen.done()
+    response = await keygen
+    assert response.status_code == status.HTTP_201_CREATED
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "params",
+    [
+        {"count": 100, "key_type": "ed25519"},
+        {"count": 3, "key_type": "rsa", "key_size": 1024, "password": "password"},
+        {"count": 2, "key_type": "ed25519", "passwords": ["password", None]},
+    ],
+)
+async def test_gen_key_pairs(
+    client: AsyncClient,
+    params: dict,
+):
+    response = await client.post("/api/gen-key-pairs", json=params)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/x-ndjson"
+
+    results = [orjson.loads(line) for line in response.content.splitlines()]
+    assert sorted(result["index"] for result in results) == list(range(params["count"]))
+    in_flight = REGISTRY.get_sample_value(
+        "keyforge_admission_in_flight", {"cost_class": "key-batch"}
+    )
+    assert in_flight == 0
+    passwords = params.get("passwords") or [params.get("password")] * params["count"]
+    for result in results:
+        password = passwords[result["index"]]
+        derived = await client.post(
+            "/api/gen-public-key",
+            json={"private_key": result["private_key"], "password": password},
+        )
+        assert derived.json()["public_key"] == result["public_key"]
+
+
+@pytest.mark.asyncio
+async def test_gen_public_key_cached(
+    client: AsyncClient,
+):
+    private_key = (
+        await client.post(
+            "/api/genrsa-private-key?key_size=1024",
+            json={"password": "password"},
+        )
+    ).json()["private_key"]
+
+    responses = [
+        await client.post(
+            url="/api/gen-public-key",
+            json={"private_key": private_key, "password": password},
+        )
+        for password in ["password", "password", "wrong_password"]
+    ]
+
+    assert responses[0].status_code == status.HTTP_201_CREATED
+    assert responses[1].json() == responses[0].json()
+    # A cached key is not returned for another password
+    assert responses[2].status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    metrics = (await client.get("/metrics")).text
+    assert 'keyforge_keycache_requests_total{result="hit"}' in metrics
+
+
+@pytest.mark.asyncio
+async def test_gen_key_pairs_passwords_count_mismatch(
+    client: AsyncClient,
+):
+    response = await client.post(
+        "/api/gen-key-pairs",
+        json={"count": 3, "passwords": ["password"]},
+    )
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+@pytest.mark.asyncio
+async def test_ed25519_keygen_stage_metrics(
+    client: AsyncClient,
+):
+    response = await client.post("/api/gened25519-private-key", json={})
+    assert response.status_code == status.HTTP_201_CREATED
+
+    metrics = (await client.get("/metrics")).text
+    for stage in ["queue", "worker-wait", "compute", "serialize"]:
+        assert (
+            'keyforge_stage_seconds_count{endpoint="gened25519-private-key",'
+            f'param_class="ed25519",stage="{stage}"}}'
+        ) in metrics
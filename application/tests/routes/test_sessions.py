@@ -0,0 +1,87 @@
+import hashlib
+
+import pytest
+from fastapi import status
+from httpx import AsyncClient
+
+
+async def _create(client: AsyncClient, *algorithms: str) -> dict:
+    response = await client.post(
+        "/api/file-sum/sessions",
+        params={"algorithm": list(algorithms), "filename": "big.iso"},
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+    session = response.json()
+    assert response.headers["Location"] == (
+        f"/api/file-sum/sessions/{session['session_id']}"
+    )
+    assert session["offset"] == 0
+    return session
+
+
+@pytest.mark.asyncio
+async def test_chunked_upload_matches_file_sum(client: AsyncClient):
+    data = bytes(range(256)) * 1024
+    session = await _create(client, "sha256", "md5")
+    url = f"/api/file-sum/sessions/{session['session_id']}"
+
+    for offset in range(0, len(data), 100_000):
+        response = await client.patch(
+            url,
+            params={"offset": offset},
+            content=data[offset : offset + 100_000],
+            headers={"Content-Type": "application/octet-stream"},
+        )
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["offset"] == min(offset + 100_000, len(data))
+
+    response = await client.post(f"{url}/finalize")
+    assert response.status_code == status.HTTP_200_OK
+    result = response.json()
+    assert result["filename"] == "big.iso"
+    assert result["size"] == len(data)
+    assert result["hash"] == hashlib.sha256(data).hexdigest()
+    assert result["hashes"]["md5"] == hashlib.md5(data).hexdigest()
+
+    file_sum = await client.post(
+        "/api/file-sum",
+        params={"algorithm": ["sha256", "md5"]},
+        content=data,
+        headers={"Content-Type": "application/octet-stream"},
+    )
+    assert file_sum.json()["hashes"] == result["hashes"]
+
+    response = await client.get(url)
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.asyncio
+async def test_retried_chunk_and_wrong_offset(client: AsyncClient):
+    session = await _create(client, "sha256")
+    url = f"/api/file-sum/sessions/{session['session_id']}"
+
+    await client.patch(url, params={"offset": 0}, content=b"abc")
+    # The answer of the first chunk was lost: the client resends it
+    response = await client.patch(url, params={"offset": 0}, content=b"abc")
+    assert response.status_code == status.HTTP_409_CONFLICT
+    assert "starts at 3" in response.json()["detail"]
+
+    response = await client.get(url)
+    assert response.json()["offset"] == 3
+    await client.patch(url, params={"offset": 3}, content=b"def")
+
+    response = await client.post(f"{url}/finalize")
+    assert response.json()["hash"] == hashlib.sha256(b"abcdef").hexdigest()
+
+
+@pytest.mark.asyncio
+async def test_delete_session(client: AsyncClient):
+    session = await _create(client, "sha256")
+    url = f"/api/file-sum/sessions/{session['session_id']}"
+
+    response = await client.delete(url)
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    response = await client.patch(url, params={"offset": 0}, content=b"abc")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    response = await client.delete(url)
+    assert response.status_code == status.HTTP_404_NOT_FOUND
@@ -0,0 +1,32 @@
+import pytest
+from fastapi import status
+from httpx import AsyncClient
+
+from core.warmup import warm_up
+
+
+@pytest.mark.asyncio
+async def test_health_check(client: AsyncClient):
+    response = await client.get("/utils/health-check")
+
+    assert response.status_code == status.HTTP_200_OK
+
+
+@pytest.mark.asyncio
+async def test_ready_after_warm_up(client: AsyncClient, monkeypatch):
+    async def noop() -> None:
+        pass
+
+    monkeypatch.setattr(warm_up, "_steps", {"noop": noop})
+    monkeypatch.setattr(warm_up, "ready", False)
+
+    response = await client.get("/utils/ready")
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.json()["ready"] is False
+
+    await warm_up.run()
+
+    response = await client.get("/utils/ready")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["ready"] is True
+    assert set(response.json()["steps"]) == {"noop"}
@@ -1,5 +1,8 @@
-from fastapi import APIRouter, Response
+from fastapi import APIRouter, Response, status
+from fastapi.responses import ORJSONResponse
+
 from core.config import settings
+from core.warmup import warm_up
 
 router = APIRouter(
     prefix=settings.prefix.utils,
@@ -15,3 +18,29 @@ async def health_check() -> Response:
     :returns Response: status code 200
     """
     return Response(status_code=200)
+
+
+@router.get("/ready")
+async def ready() -> Response:
+    """
+    Readiness endpoint for Docker/Kubernetes.
+
+    The worker serves requests as soon as it starts, while the warm-up
+    (compute engine processes, hasher calibration, OTLP exporter) runs in
+    the background. Route traffic to it once this endpoint answers 200.
+
+    :returns Response: status code 200 with the duration of every warm-up
+        step once the worker is warmed up, 503 before
+    """
+    return ORJSONResponse(
+        {
+            "ready": warm_up.ready,
+            "steps": warm_up.timings,
+            "failed": warm_up.failed,
+        },
+        status_code=(
+            status.HTTP_200_OK
+            if warm_up.ready
+            else status.HTTP_503_SERVICE_UNAVAILABLE
+        ),
+    )
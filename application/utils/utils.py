@@ -1,13 +1,62 @@
+import threading
+from functools import partial
+from typing import Sequence
+
+from fastapi.concurrency import run_in_threadpool
 from opentelemetry import trace
-from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
 from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
 from opentelemetry.instrumentation.logging import LoggingInstrumentor
 from opentelemetry.sdk.resources import Resource
-from opentelemetry.sdk.trace import TracerProvider
-from opentelemetry.sdk.trace.export import BatchSpanProcessor
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import (
+    BatchSpanProcessor,
+    SpanExporter,
+    SpanExportResult,
+)
 from opentelemetry.sdk.trace.sampling import ParentBased, ALWAYS_OFF, ALWAYS_ON
 from starlette.types import ASGIApp
 
+from core.warmup import warm_up
+
+
+class LazyOTLPSpanExporter(SpanExporter):
+    """OTLP gRPC span exporter created on first use.
+
+    Importing gRPC and the protobuf messages takes longer than the rest of
+    the OpenTelemetry setup. Spans are exported from the thread of the
+    BatchSpanProcessor, so deferring the import to the first export (or to
+    :meth:`warm_up` during the startup warm-up) keeps it off the critical
+    path of a starting worker.
+    """
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self._exporter: SpanExporter | None = None
+        self._lock = threading.Lock()
+
+    def warm_up(self) -> SpanExporter:
+        """Import and create the OTLP exporter if it does not exist yet."""
+        with self._lock:
+            if self._exporter is None:
+                from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import (
+                    OTLPSpanExporter,
+                )
+
+                self._exporter = OTLPSpanExporter(endpoint=self.endpoint)
+            return self._exporter
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        return self.warm_up().export(spans)
+
+    def shutdown(self) -> None:
+        if self._exporter is not None:
+            self._exporter.shutdown()
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        if self._exporter is None:
+            return True
+        return self._exporter.force_flush(timeout_millis)
+
 
 def setting_otlp(
     app: ASGIApp,
@@ -37,6 +86,8 @@ def setting_otlp(
           initiated by other systems will be recorded (no self-initiated traces).
         - Some common endpoints like health checks and documentation are excluded
           from tracing to reduce noise and unnecessary data.
+        - The OTLP exporter is imported on the first export, or earlier by the
+          startup warm-up of the worker.
         - This function does not return anything but modifies the global
           OpenTelemetry state and instruments the provided FastAPI application.
 
@@ -73,10 +124,10 @@ def setting_otlp(
 
     trace.set_tracer_provider(tracer)
 
+    span_exporter = LazyOTLPSpanExporter(endpoint=endpoint)
+    warm_up.add("otlp-exporter", partial(run_in_threadpool, span_exporter.warm_up))
     tracer.add_span_processor(
-        BatchSpanProcessor(
-            OTLPSpanExporter(endpoint=endpoint),
-        ),
+        BatchSpanProcessor(span_exporter),
     )
 
     if log_correlation:
@@ -87,5 +138,10 @@ def setting_otlp(
     FastAPIInstrumentor.instrument_app(
         app,
         tracer_provider=tracer,
-        excluded_urls="/api/file-sum,/docs,/redoc,/utils/health-check",
+        # Regular expressions searched in the URL (without the query string):
+        # anchored so that /api/file-sum/verify and the upload sessions stay
+        # traced
+        excluded_urls=(
+            "/api/file-sum$,/docs,/redoc,/utils/health-check,/utils/ready"
+        ),
     )